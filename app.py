@@ -1,12 +1,28 @@
 import dash
-from dash import dcc, html, Input, Output, State
+from dash import dcc, html, Input, Output, State, Patch, no_update
 import plotly.graph_objs as go
 from plotly.subplots import make_subplots
 import numpy as np
+import os
+import base64
+import hashlib
+import tempfile
+from flask import Response
 
-from vehicle_model import simulate_vehicle, VEHICLES, RHO
-from classic_pi import ClassicPIController
-from fuzzy_pi import FuzzyPIController
+from route_profile import RouteProfile
+from sim_cache import SimulationCache, scenario_key
+from sim_workers import run_parallel, run_parallel_route, warm_up, controller_pool_stats
+from route_file import parse_route, save_route, open_route
+from vehicle_model import plant_step
+from downsample import downsample
+from control_shading import shading_traces
+from metrics import score_runs, SUMMARY_METRICS, SEGMENT_METRICS
+from pi_tuner import tune_pi
+from monte_carlo import run_monte_carlo, BAND_QUANTILES
+from control_surface import control_surface, input_trajectory, rule_labels
+from live_runs import start_live_run, get_live_run, cancel_live_run
+from sim_jobs import JobQueue, DONE, FAILED, CANCELLED
+from instrumentation import REGISTRY, span, trace, summarize
 
 # Inicjalizacja
 app = dash.Dash(__name__)
@@ -19,6 +35,85 @@ VEHICLE_OPTIONS = [
     {"label": "Ciężarówka", "value": "ciezarowka"},
 ]
 
+# Maksymalny krok całkowania modelu pojazdu [s]; regulatory próbkowane są z własnym tp
+PLANT_DT = 0.01
+
+# Pamięć podręczna wyników symulacji (warstwa dyskowa włączana zmienną SIM_CACHE_DIR);
+# zmiana wersji unieważnia wyniki zapisane przez wcześniejszy model/format
+SIM_CACHE_VERSION = 5
+# Limity rozmiaru [B] pamięci i katalogu SIM_CACHE_DIR - wynik długiej trasy z pliku
+# zajmuje do ~1 GB; większy od limitu nie jest zapamiętywany (nie wypiera pozostałych)
+SIM_CACHE_BYTES = int(os.environ.get("SIM_CACHE_MB", 512)) << 20
+SIM_CACHE_DISK_BYTES = int(os.environ.get("SIM_CACHE_DISK_MB", 8192)) << 20
+SIM_CACHE = SimulationCache(maxsize=64, disk_dir=os.environ.get("SIM_CACHE_DIR"),
+                            max_bytes=SIM_CACHE_BYTES, max_disk_bytes=SIM_CACHE_DISK_BYTES)
+
+# Liczba punktów na przebieg wysyłana do przeglądarki i metoda decymacji ("lttb" lub "minmax")
+PLOT_POINTS = int(os.environ.get("PLOT_POINTS", 2000))
+PLOT_DOWNSAMPLE = os.environ.get("PLOT_DOWNSAMPLE", "lttb")
+
+# Tło wykresów sił: histereza progu kategorii sterowania i minimalny czas przedziału [s]
+SHADING_HYSTERESIS = 0.01
+SHADING_MIN_DURATION = 0.2
+
+# Tryb na żywo: odstęp odświeżania wykresów [ms] i maksymalna liczba nowych punktów
+# na przebieg w jednej aktualizacji
+LIVE_INTERVAL_MS = 500
+LIVE_POINTS_PER_TICK = 500
+
+# Przebiegi trasy w trybie na żywo liczone w chwilach nowych próbek: kolumna -> f(trasa, t)
+ROUTE_COLUMNS = {
+    "vref_kmh": lambda route, t: route.v_ref_at(t) * 3.6,
+    "alpha_deg": lambda route, t: route.alpha_at(t),
+}
+
+# Katalog tras importowanych z plików (.npy według skrótu zawartości pliku)
+ROUTE_DIR = os.environ.get("ROUTE_DIR") or os.path.join(tempfile.gettempdir(), "tempomat_routes")
+
+# Maksymalna liczba próbek symulacji trasy z pliku (dziennik ~90 B na próbkę i regulator)
+ROUTE_MAX_SAMPLES = int(os.environ.get("ROUTE_MAX_SAMPLES", 5_000_000))
+
+# Limit czasu automatycznego doboru nastaw PI [s]
+TUNER_TIME_BUDGET = 30
+
+# Kolejka zadań w tle (długie symulacje i dobór nastaw) i odstęp odpytywania jej stanu [ms]
+JOB_QUEUE = JobQueue(max_workers=int(os.environ.get("JOB_WORKERS", 2)))
+JOB_POLL_MS = 500
+
+# Udział etapu siatki w postępie doboru nastaw i liczba ewaluacji etapu optymalizacji
+TUNER_GRID_SHARE = 0.7
+TUNER_REFINE_EVALS = 200
+
+# Nazwy regulatorów w tabelach i komunikatach
+RUN_LABELS = {"classic": "Klasyczny PI", "fuzzy": "Rozmyty PI"}
+
+# Kolory regulatorów na wykresie pasm Monte Carlo (jak na wykresie prędkości)
+RUN_COLORS = {"classic": "65, 105, 225", "fuzzy": "255, 165, 0"}
+
+# Domyślna i maksymalna liczba scenariuszy analizy Monte Carlo
+MC_SAMPLES = 1000
+MC_MAX_SAMPLES = 20000
+
+# Wskaźnik -> (etykieta w tabeli, format liczby)
+METRIC_LABELS = {
+    "IAE": ("IAE [m]", "{:.2f}"),
+    "ISE": ("ISE [m²/s]", "{:.2f}"),
+    "ITAE": ("ITAE [m·s]", "{:.2f}"),
+    "ITAE_seg": ("ITAE odcinkowe [m·s]", "{:.2f}"),
+    "effort": ("Energia sterowania ∫u² [s]", "{:.2f}"),
+    "switches": ("Przełączenia trybu", "{:.0f}"),
+    "overshoot": ("Przeregulowanie [%]", "{:.1f}"),
+    "settling_time": ("Czas ustalania [s]", "{:.2f}"),
+}
+
+# Przebiegi na wykresach: id wykresu -> [(indeks śladu, kolumna wyników, skala)];
+# kolumna "regulator.pole" oznacza pole dziennika symulacji danego regulatora
+PLOT_TRACES = {
+    "velocity-graph": [(0, "classic.v", 3.6), (1, "fuzzy.v", 3.6), (2, "vref_kmh", 1), (3, "alpha_deg", 1)],
+    "classic-forces-graph": [(0, "classic.F_drive", 1), (1, "classic.u", 1), (2, "classic.F_aero", 1)],
+    "fuzzy-forces-graph": [(0, "fuzzy.F_drive", 1), (1, "fuzzy.u", 1), (2, "fuzzy.F_aero", 1)],
+}
+
 # Layout aplikacji
 app.layout = html.Div(style={'display': 'flex', 'flexDirection': 'row'}, children=[
     # Kolumna lewa 
@@ -49,6 +144,11 @@ app.layout = html.Div(style={'display': 'flex', 'flexDirection': 'row'}, childre
                     html.Label("tp:", style={'width': '30px', 'marginRight': '5px'}),
                     dcc.Input(id="classic-dt-value", type="number", value=0.01, min=0.001, step=0.001, style={'flex': 1})
                 ]),
+                html.Button("Dobierz Kp/Ti", id="tune-btn", n_clicks=0,
+                    style={'width': '100%', 'marginTop': '8px', 'padding': '4px', 'cursor': 'pointer'}),
+                html.Div(id="tuner-status", style={'fontSize': '12px', 'marginTop': '4px', 'textAlign': 'center'}),
+                dcc.Store(id="tune-job"),
+                dcc.Interval(id="tune-interval", interval=JOB_POLL_MS, disabled=True),
             ]),
             
             # Rozmyty PI
@@ -182,92 +282,69 @@ app.layout = html.Div(style={'display': 'flex', 'flexDirection': 'row'}, childre
             ]),
         ]),
         
+        # Trasa z pliku (zastępuje odcinki powyżej)
+        html.Div(style={'marginBottom': '15px', 'border': '1px solid #ddd', 'borderRadius': '5px', 'padding': '10px'}, children=[
+            html.H5("Trasa z pliku:", style={'marginTop': '0', 'marginBottom': '10px', 'textAlign': 'center'}),
+            dcc.Upload(id="route-upload", accept=".csv,.gpx", children=html.Div("Przeciągnij lub wybierz plik CSV/GPX"),
+                       style={'padding': '8px', 'border': '1px dashed #aaa', 'borderRadius': '5px', 'textAlign': 'center', 'cursor': 'pointer'}),
+            html.Div(id="route-file-info", style={'fontSize': '12px', 'marginTop': '4px', 'textAlign': 'center'}),
+            html.Button("Użyj odcinków z formularza", id="route-clear", n_clicks=0,
+                style={'width': '100%', 'marginTop': '4px', 'padding': '4px', 'cursor': 'pointer'}),
+            dcc.Store(id="route-file"),
+        ]),
+        
         # Przycisk symulacji
         html.Div(style={'textAlign': 'center'}, children=[
             html.Button("Uruchom symulację", id="simulate-btn", n_clicks=0, 
                 style={'padding': '10px 20px', 'backgroundColor': '#4CAF50', 'color': 'white', 'border': 'none', 'borderRadius': '5px', 
-                      'cursor': 'pointer', 'fontSize': '16px', 'boxShadow': '0 2px 4px rgba(0,0,0,0.2)'})
+                      'cursor': 'pointer', 'fontSize': '16px', 'boxShadow': '0 2px 4px rgba(0,0,0,0.2)'}),
+            dcc.Checklist(id="live-mode", options=[{"label": " Tryb na żywo", "value": "live"}], value=[],
+                          style={'marginTop': '8px'})
+        ]),
+        
+        # Analiza odporności (Monte Carlo)
+        html.Div(style={'marginTop': '15px', 'border': '1px solid #ddd', 'borderRadius': '5px', 'padding': '10px'}, children=[
+            html.H5("Analiza Monte Carlo:", style={'marginTop': '0', 'textAlign': 'center'}),
+            html.Div(style={'display': 'flex', 'alignItems': 'center', 'marginBottom': '5px'}, children=[
+                html.Label("scenariusze:", style={'marginRight': '5px'}),
+                dcc.Input(id="mc-samples", type="number", value=MC_SAMPLES, min=10, max=MC_MAX_SAMPLES, step=10, style={'flex': 1})
+            ]),
+            html.Button("Uruchom analizę", id="mc-btn", n_clicks=0,
+                style={'width': '100%', 'padding': '4px', 'cursor': 'pointer'}),
+            html.Div(id="mc-status", style={'fontSize': '12px', 'marginTop': '4px', 'textAlign': 'center'}),
+            dcc.Store(id="mc-job"),
+            dcc.Interval(id="mc-interval", interval=JOB_POLL_MS, disabled=True),
         ])
     ]),    
     # Kolumna prawa - wykresy 
     html.Div(style={'width': '75%', 'padding': '15px', 'boxSizing': 'border-box', 'backgroundColor': '#fafafa'}, children=[
+        dcc.Store(id="sim-key"),
+        dcc.Store(id="live-run"),
+        dcc.Interval(id="live-interval", interval=LIVE_INTERVAL_MS, disabled=True),
+        dcc.Store(id="sim-job"),
+        dcc.Interval(id="job-interval", interval=JOB_POLL_MS, disabled=True),
+        html.Div(id="job-status"),
         dcc.Graph(id="velocity-graph", style={'height': '33vh', 'marginBottom': '5px', 'backgroundColor': 'white', 'borderRadius': '5px', 'boxShadow': '0 1px 3px rgba(0,0,0,0.1)'}),
         dcc.Graph(id="classic-forces-graph", style={'height': '33vh', 'marginBottom': '5px', 'backgroundColor': 'white', 'borderRadius': '5px', 'boxShadow': '0 1px 3px rgba(0,0,0,0.1)'}),
-        dcc.Graph(id="fuzzy-forces-graph", style={'height': '33vh', 'backgroundColor': 'white', 'borderRadius': '5px', 'boxShadow': '0 1px 3px rgba(0,0,0,0.1)'})
+        dcc.Graph(id="fuzzy-forces-graph", style={'height': '33vh', 'backgroundColor': 'white', 'borderRadius': '5px', 'boxShadow': '0 1px 3px rgba(0,0,0,0.1)'}),
+        html.Div(id="metrics-table", style={'marginTop': '10px', 'padding': '10px', 'backgroundColor': 'white', 'borderRadius': '5px', 'boxShadow': '0 1px 3px rgba(0,0,0,0.1)'}),
+        html.Details(style={'marginTop': '10px', 'padding': '10px', 'backgroundColor': 'white', 'borderRadius': '5px', 'boxShadow': '0 1px 3px rgba(0,0,0,0.1)'}, children=[
+            html.Summary("Czasy obliczeń", style={'cursor': 'pointer'}),
+            html.Div(id="timing-table")
+        ]),
+        html.Details(style={'marginTop': '10px', 'padding': '10px', 'backgroundColor': 'white', 'borderRadius': '5px', 'boxShadow': '0 1px 3px rgba(0,0,0,0.1)'}, children=[
+            html.Summary("Powierzchnia sterowania regulatora rozmytego", style={'cursor': 'pointer'}),
+            dcc.RadioItems(id="surface-view", options=[{"label": " mapa", "value": "heatmap"}, {"label": " 3D", "value": "3d"}],
+                           value="heatmap", inline=True, style={'marginTop': '5px'}),
+            dcc.Graph(id="surface-graph", style={'height': '50vh'})
+        ]),
+        html.Div(id="mc-results")
     ])
 ])
 
-def segment_control_colors(time, control_values):
-    segments = []
-    colors = ["rgba(0,255,0,0.1)" if u > 0.05 else "rgba(255,0,0,0.1)" if u < -0.05 else "rgba(0,0,255,0.1)" for u in control_values]
-    start_idx = 0
-    for i in range(1, len(time)):
-        if colors[i] != colors[start_idx]:
-            segments.append((time[start_idx], time[i], colors[start_idx]))
-            start_idx = i
-    segments.append((time[start_idx], time[-1], colors[start_idx]))
-    return segments
-
-# Funkcja pomocnicza: buduje funkcje nachylenia i prędkości zadanej
-def build_alpha_func(segments):
-    time_bounds = np.cumsum([0] + [seg["time"] for seg in segments])
-    def alpha_func(t):
-        for i in range(len(segments)):
-            if time_bounds[i] <= t < time_bounds[i+1]:
-                return segments[i]["alpha"]
-        return segments[-1]["alpha"]
-    return alpha_func, time_bounds, [seg["alpha"] for seg in segments]
-
-def build_vref_func(segments):
-    time_bounds = np.cumsum([0] + [seg["time"] for seg in segments])
-    def v_ref_func(t):
-        for i in range(len(segments)):
-            if time_bounds[i] <= t < time_bounds[i+1]:
-                return segments[i]["v"] / 3.6
-        return segments[-1]["v"] / 3.6
-    return v_ref_func
-
-# Funkcja do obliczania sił działających na pojazd 
-def calculate_forces(vehicle_type, time, v, u):
-    params = VEHICLES[vehicle_type]
-    
-    F_drive = np.array([ui * params["F_max"] for ui in u])
-    F_aero = np.array([0.5 * RHO * params["Cd"] * params["A"] * vi**2 for vi in v])
-    
-    return F_drive, F_aero
-
-
-@app.callback(
-    [Output("velocity-graph", "figure"),
-     Output("classic-forces-graph", "figure"),
-     Output("fuzzy-forces-graph", "figure")],
-    Input("simulate-btn", "n_clicks"),
-    State("vehicle-dropdown", "value"),
-    State("seg1-time", "value"), State("seg1-alpha", "value"),
-    State("seg2-time", "value"), State("seg2-alpha", "value"),
-    State("seg3-time", "value"), State("seg3-alpha", "value"),
-    State("vseg1-time", "value"), State("vseg1-v", "value"),
-    State("vseg2-time", "value"), State("vseg2-v", "value"),
-    State("vseg3-time", "value"), State("vseg3-v", "value"),
-    State("kp-value", "value"), State("ti-value", "value"), 
-    State("classic-dt-value", "value"), State("fuzzy-dt-value", "value")
-)
-def update_simulation(n_clicks, vehicle_type,
-                      seg1_time, seg1_alpha, seg2_time, seg2_alpha, seg3_time, seg3_alpha,
-                      vseg1_time, vseg1_v, vseg2_time, vseg2_v, vseg3_time, vseg3_v,
-                      kp_value, ti_value, classic_dt, fuzzy_dt):
-    # Tworzenie regulatorów
-    classic_controller = ClassicPIController(Kp=kp_value, Ti=ti_value, output_limit=(-1, 1))
-    fuzzy_controller = FuzzyPIController()
-    
-    
-    def classic_controller_func(error, v_curr, t):
-        return classic_controller.compute(error, v_curr, t, classic_dt)
-    
-    def fuzzy_controller_func(error, v_curr, t):
-        return fuzzy_controller.compute(error, v_curr, t, fuzzy_dt)
-    
-    # Przygotowanie segmentów trasy
+def route_segments(seg1_time, seg1_alpha, seg2_time, seg2_alpha, seg3_time, seg3_alpha,
+                   vseg1_time, vseg1_v, vseg2_time, vseg2_v, vseg3_time, vseg3_v):
+    """Odcinki nachylenia i prędkości zadanej z pól formularza."""
     alpha_segments = [
         {"time": seg1_time, "alpha": seg1_alpha},
         {"time": seg2_time, "alpha": seg2_alpha},
@@ -278,64 +355,377 @@ def update_simulation(n_clicks, vehicle_type,
         {"time": vseg2_time, "v": vseg2_v},
         {"time": vseg3_time, "v": vseg3_v},
     ]
+    return alpha_segments, vref_segments
+
+
+def simulation_controllers(kp_value, ti_value, classic_dt, fuzzy_dt):
+    """Porównywane regulatory: nazwa -> (rodzaj, parametry)."""
+    return {
+        "classic": ("classic", {"Kp": kp_value, "Ti": ti_value, "dt": classic_dt}),
+        "fuzzy": ("fuzzy", {"dt": fuzzy_dt}),
+    }
+
+
+def simulation_key(vehicle_type, alpha_segments, vref_segments, kp_value, ti_value, classic_dt, fuzzy_dt):
+    """Klucz wyników scenariusza w SIM_CACHE."""
+    return scenario_key(version=SIM_CACHE_VERSION, vehicle_type=vehicle_type, alpha_segments=alpha_segments,
+                        vref_segments=vref_segments, kp=kp_value, ti=ti_value,
+                        classic_dt=classic_dt, fuzzy_dt=fuzzy_dt)
+
+
+def assemble_results(route, runs, fuzzy_dt):
+    """
+    Wyniki scenariusza: przebiegi trasy, dzienniki symulacji obu regulatorów
+    i okres próbkowania regulatora rozmytego (do odtworzenia jego wejść).
+    """
+    # Dzienniki symulacji zawierają już pełny rozkład sił
+    return {
+        "time": route.time,
+        "vref_kmh": route.v_ref * 3.6,
+        "alpha_deg": route.alpha_deg,
+        "vref_bounds": route.vref_bounds,
+        "classic": runs["classic"],
+        "fuzzy": runs["fuzzy"],
+        "fuzzy_dt": np.float64(fuzzy_dt),
+    }
+
+
+def run_simulations(vehicle_type, alpha_segments, vref_segments, kp_value, ti_value, classic_dt, fuzzy_dt,
+                    progress=None):
+    """
+    Symulacje dla obu regulatorów - wynik (przebiegi trasy i dzienniki symulacji)
+    zapamiętywany w SIM_CACHE pod kluczem z parametrów scenariusza.
+    Zwraca (klucz, wyniki). progress jak w run_parallel.
+    """
+    key = simulation_key(vehicle_type, alpha_segments, vref_segments, kp_value, ti_value, classic_dt, fuzzy_dt)
+    results = SIM_CACHE.get(key)
+    if results is not None:
+        return key, results
     
-    # Przygotowanie funkcji
-    alpha_func, alpha_time_bounds, alpha_values = build_alpha_func(alpha_segments)
-    v_ref_func = build_vref_func(vref_segments)
+    # Profil trasy stablicowany na siatce czasu symulacji; krok obiektu dzieli
+    # okresy próbkowania obu regulatorów
+    plant_dt = plant_step((classic_dt, fuzzy_dt), PLANT_DT)
+    route = RouteProfile(alpha_segments, vref_segments, dt=plant_dt)
     
-    # Przeprowadzenie symulacji dla obu regulatorów
-    t_final = sum([s["time"] for s in alpha_segments])
+    # Symulacje obu regulatorów równolegle w puli procesów (regulator rozmyty
+    # jest już zbudowany w każdym procesie roboczym)
+    with span("run_parallel"):
+        runs = run_parallel(vehicle_type, alpha_segments, vref_segments, plant_dt,
+                            simulation_controllers(kp_value, ti_value, classic_dt, fuzzy_dt), progress)
     
-    # Symulacja dla regulatora klasycznego
-    time_classic, v_classic, u_classic = simulate_vehicle(
-        vehicle_type, alpha_func, v_ref_func, classic_controller_func, t_final
-    )
+    results = assemble_results(route, runs, fuzzy_dt)
+    SIM_CACHE.put(key, results)
+    return key, results
+
+
+def route_simulation_key(vehicle_type, route_key, kp_value, ti_value, classic_dt, fuzzy_dt):
+    """Klucz wyników symulacji trasy z pliku w SIM_CACHE."""
+    return scenario_key(version=SIM_CACHE_VERSION, vehicle_type=vehicle_type, route=route_key,
+                        kp=kp_value, ti=ti_value, classic_dt=classic_dt, fuzzy_dt=fuzzy_dt)
+
+
+def assemble_route_results(route, runs, fuzzy_dt):
+    """
+    Wyniki symulacji trasy z pliku. Nachylenie i prędkość zadana zależą od
+    położenia pojazdu - przebiegi trasy na wykresie według regulatora
+    klasycznego, wskaźniki według własnej prędkości zadanej każdego przebiegu.
+    """
+    return {
+        "time": route.time,
+        "vref_kmh": runs["classic"]["v_ref"] * 3.6,
+        "alpha_deg": runs["classic"]["alpha_deg"],
+        "vref_bounds": np.array([0.0, route.t_final + route.dt]),
+        "classic": runs["classic"],
+        "fuzzy": runs["fuzzy"],
+        "fuzzy_dt": np.float64(fuzzy_dt),
+    }
+
+
+def run_route_simulations(vehicle_type, route_file, kp_value, ti_value, classic_dt, fuzzy_dt, progress=None):
+    """
+    run_simulations dla trasy z pliku (route_file jak w magazynie "route-file").
+    Regulator rozmyty korzysta z tablicowanej powierzchni sterowania - wnioskowanie
+    simpful w każdym kroku długiej trasy trwałoby godzinami.
+    """
+    key = route_simulation_key(vehicle_type, route_file["key"], kp_value, ti_value, classic_dt, fuzzy_dt)
+    results = SIM_CACHE.get(key)
+    if results is not None:
+        return key, results
     
-    # Symulacja dla regulatora rozmytego
-    time_fuzzy, v_fuzzy, u_fuzzy = simulate_vehicle(
-        vehicle_type, alpha_func, v_ref_func, fuzzy_controller_func, t_final
-    )
+    plant_dt = plant_step((classic_dt, fuzzy_dt), PLANT_DT)
+    route = open_route(route_file["path"], dt=plant_dt)
+    if route.n_samples > ROUTE_MAX_SAMPLES:
+        raise ValueError(f"Trasa wymaga {route.n_samples} próbek symulacji (limit {ROUTE_MAX_SAMPLES}) - "
+                         f"zwiększ okresy próbkowania regulatorów")
+    
+    controllers = simulation_controllers(kp_value, ti_value, classic_dt, fuzzy_dt)
+    controllers["fuzzy"][1]["compiled"] = True
+    with span("run_parallel"):
+        runs = run_parallel_route(vehicle_type, route_file["path"], plant_dt, controllers, progress)
+    
+    results = assemble_route_results(route, runs, fuzzy_dt)
+    SIM_CACHE.put(key, results)
+    return key, results
+
+
+def simulation_job(job, *args):
+    """
+    run_simulations jako zadanie JOB_QUEUE (postęp: ukończone symulacje regulatorów).
+    Zwraca (klucz, wyniki, zapisy instrumentacji zadania).
+    """
+    with trace() as records:
+        key, results = run_simulations(*args, progress=lambda done, total: job.set_progress(
+            done / total, f"Ukończono {done} z {total} symulacji"))
+    return key, results, records
+
+
+def route_simulation_job(job, *args):
+    """run_route_simulations jako zadanie JOB_QUEUE (wynik jak simulation_job)."""
+    with trace() as records:
+        key, results = run_route_simulations(*args, progress=lambda done, total: job.set_progress(
+            done / total, f"Ukończono {done} z {total} symulacji"))
+    return key, results, records
+
+
+def tuning_job(job, vehicle_type, alpha_segments, vref_segments, classic_dt, plant_dt):
+    """tune_pi jako zadanie JOB_QUEUE; anulowanie przerywa siatkę lub optymalizację."""
+    def progress(stage, done, total, best):
+        if stage == "grid":
+            job.set_progress(TUNER_GRID_SHARE * done / total, f"siatka {done}/{total}, koszt {best:.1f}")
+        else:
+            fraction = TUNER_GRID_SHARE + (1 - TUNER_GRID_SHARE) * min(done / TUNER_REFINE_EVALS, 1.0)
+            job.set_progress(fraction, f"optymalizacja, koszt {best:.1f}")
+    
+    return tune_pi(vehicle_type, alpha_segments, vref_segments,
+                   plant_dt=plant_dt, controller_dt=classic_dt,
+                   time_budget=TUNER_TIME_BUDGET, progress=progress)
+
+
+def monte_carlo_job(job, vehicle_type, alpha_segments, vref_segments, controllers, n_samples, plant_dt):
+    """run_monte_carlo jako zadanie JOB_QUEUE (postęp: policzone scenariusze)."""
+    return run_monte_carlo(vehicle_type, alpha_segments, vref_segments, controllers, n_samples=n_samples,
+                           plant_dt=plant_dt, progress=lambda done, total: job.set_progress(
+                               done / total, f"Policzono {done} z {total} scenariuszy"))
+
+
+def job_progress(status):
+    """Pasek postępu zadania w tle."""
+    return html.Div(style={'display': 'flex', 'alignItems': 'center', 'gap': '10px', 'marginBottom': '5px'}, children=[
+        html.Progress(value=str(status["progress"]), max="1", style={'flex': 1}),
+        html.Span(status["message"] or "W kolejce...", style={'fontSize': '12px'}),
+    ])
+
+
+def plot_series(results, column, scale=1, x_range=None):
+    """
+    Przebieg kolumny wyników do wykresu: opcjonalnie zawężony do x_range
+    i zdecymowany do PLOT_POINTS punktów.
+    """
+    time = results["time"]
+    if "." in column:
+        run, field = column.split(".")
+        values = results[run][field]
+    else:
+        values = results[column]
+    lo, hi = 0, len(time)
+    if x_range is not None:
+        lo = max(int(np.searchsorted(time, x_range[0])) - 1, 0)
+        hi = min(int(np.searchsorted(time, x_range[1])) + 1, len(time))
+    return downsample(time[lo:hi], values[lo:hi] * scale, PLOT_POINTS, PLOT_DOWNSAMPLE)
+
+
+def relayout_x_range(relayout_data):
+    """
+    Zakres osi X z relayoutData wykresu: (zakres lub None dla pełnego widoku,
+    czy zakres się zmienił).
+    """
+    if not relayout_data:
+        return None, False
+    if "xaxis.range[0]" in relayout_data:
+        return (float(relayout_data["xaxis.range[0]"]), float(relayout_data["xaxis.range[1]"])), True
+    if "xaxis.range" in relayout_data:
+        return tuple(float(x) for x in relayout_data["xaxis.range"]), True
+    if relayout_data.get("xaxis.autorange"):
+        return None, True
+    return None, False
+
+
+def run_v_ref(results, name):
+    """Prędkość zadana [m/s] przebiegu regulatora name (trasa z pliku - w położeniu tego pojazdu)."""
+    log = results[name]
+    return log["v_ref"] if "v_ref" in log.dtype.names else results["vref_kmh"] / 3.6
+
+
+def metrics_table(results, runs=tuple(RUN_LABELS.items())):
+    """Tabela wskaźników jakości regulacji (wiersze) dla obu regulatorów (kolumny)."""
+    time = results["time"]
+    v_ref = np.stack([run_v_ref(results, name) for name, _ in runs])
+    v = np.stack([results[name]["v"] for name, _ in runs])
+    u = np.stack([results[name]["u"] for name, _ in runs])
+    with span("score_runs"):
+        scores = score_runs(time, v, u, v_ref, results["vref_bounds"])
     
-    # Obliczenie prędkości w km/h i kąta nachylenia
-    v_classic_kmh = v_classic * 3.6
-    v_fuzzy_kmh = v_fuzzy * 3.6
-    vref_kmh_classic = np.array([v_ref_func(t)*3.6 for t in time_classic])
-    vref_kmh_fuzzy = np.array([v_ref_func(t)*3.6 for t in time_fuzzy])
-    alpha_deg_classic = np.array([alpha_func(t) for t in time_classic])
-    alpha_deg_fuzzy = np.array([alpha_func(t) for t in time_fuzzy])
+    cell = {'border': '1px solid #ddd', 'padding': '5px', 'textAlign': 'center'}
+    header = {**cell, 'backgroundColor': '#f2f2f2'}
     
-    # Obliczenie sił dla obu regulatorów
-    F_drive_classic, F_aero_classic = calculate_forces(vehicle_type, time_classic, v_classic, u_classic)
-    F_drive_fuzzy, F_aero_fuzzy = calculate_forces(vehicle_type, time_fuzzy, v_fuzzy, u_fuzzy)
+    def row(label, fmt, values):
+        return html.Tr([html.Td(label, style={**cell, 'textAlign': 'left'})] +
+                       [html.Td("-" if np.isnan(x) else fmt.format(x), style=cell) for x in values])
     
-    # Przygotowanie kolorów tła dla obu regulatorów
-    segments_classic = segment_control_colors(time_classic, u_classic)
-    segments_fuzzy = segment_control_colors(time_fuzzy, u_fuzzy)
+    rows = [row(*METRIC_LABELS[name], scores[name]) for name in SUMMARY_METRICS]
+    for name in SEGMENT_METRICS:
+        label, fmt = METRIC_LABELS[name]
+        for k in range(scores[name].shape[1]):
+            rows.append(row(f"{label}, odcinek {k + 1}", fmt, scores[name][:, k]))
     
+    return html.Table(style={'width': '100%', 'borderCollapse': 'collapse'}, children=[
+        html.Thead(html.Tr([html.Th("Wskaźnik", style=header)] + [html.Th(title, style=header) for _, title in runs])),
+        html.Tbody(rows),
+    ])
+
+
+def monte_carlo_figure(result):
+    """Pasma prędkości (kwantyle 5-95% i 25-75%) i mediana dla obu regulatorów."""
+    time = result["time"]
+    low, q1, median, q3, high = BAND_QUANTILES
+    fig = go.Figure()
+    for name, label in RUN_LABELS.items():
+        bands = result[name]["bands"]
+        color = RUN_COLORS[name]
+        for lower, upper, opacity, title in ((low, high, 0.15, "5-95%"), (q1, q3, 0.3, "25-75%")):
+            fig.add_trace(go.Scatter(x=time, y=bands[upper], mode="lines", line=dict(width=0),
+                                     showlegend=False, hoverinfo="skip"))
+            fig.add_trace(go.Scatter(x=time, y=bands[lower], mode="lines", line=dict(width=0),
+                                     fill="tonexty", fillcolor=f"rgba({color}, {opacity})",
+                                     name=f"{label} {title}"))
+        fig.add_trace(go.Scatter(x=time, y=bands[median], mode="lines", name=f"{label} mediana",
+                                 line=dict(color=f"rgb({color})")))
+    fig.add_trace(go.Scatter(x=time, y=result["vref_kmh"], mode="lines", name="Prędkość zadana [km/h]",
+                             line=dict(dash="dash", color="black")))
+    fig.update_layout(
+        title=f"Prędkość [km/h] - {result['n_samples']} scenariuszy (masa, opory, siła napędowa, szum nachylenia)",
+        xaxis_title="Czas [s]", yaxis_title="Prędkość [km/h]",
+        template="plotly_white", margin=dict(l=50, r=50, t=50, b=50),
+        legend=dict(orientation="h", y=-0.2)
+    )
+    return fig
+
+
+def monte_carlo_table(result):
+    """Rozkłady wskaźników: średnia ± 95% przedział ufności średniej oraz kwantyle 5% i 95%."""
+    cell = {'border': '1px solid #ddd', 'padding': '5px', 'textAlign': 'center'}
+    header = {**cell, 'backgroundColor': '#f2f2f2'}
+    rows = []
+    for metric in SUMMARY_METRICS:
+        label, fmt = METRIC_LABELS[metric]
+        cells = [html.Td(label, style={**cell, 'textAlign': 'left'})]
+        for name in RUN_LABELS:
+            s = result[name]["summary"][metric]
+            cells.append(html.Td(f"{fmt.format(s['mean'])} ± {fmt.format(s['ci'])} "
+                                 f"[{fmt.format(s['p5'])}; {fmt.format(s['p95'])}]", style=cell))
+        rows.append(html.Tr(cells))
+    return html.Table(style={'width': '100%', 'borderCollapse': 'collapse'}, children=[
+        html.Thead(html.Tr([html.Th("Wskaźnik", style=header)] +
+                           [html.Th(f"{title}: średnia ± 95% [5%; 95%]", style=header) for title in RUN_LABELS.values()])),
+        html.Tbody(rows),
+    ])
+
+
+def surface_figure(surface, view="heatmap", trajectory=None):
+    """
+    Powierzchnia Control(Error, DeltaError) jako mapa lub wykres 3D, z trajektorią
+    wejść regulatora z symulacji. Na mapie: wierzchołki zbiorów rozmytych (siatka
+    reguł) i udział każdej reguły w aktywacji podczas symulacji.
+    """
+    e_grid, de_grid, z = surface["e_grid"], surface["de_grid"], surface["surface"]
+    fig = go.Figure()
+    if view == "3d":
+        fig.add_trace(go.Surface(x=de_grid, y=e_grid, z=z, colorscale="RdBu", reversescale=True,
+                                 cmin=-1, cmax=1, colorbar=dict(title="Control")))
+        if trajectory is not None:
+            fig.add_trace(go.Scatter3d(x=trajectory["d_error"], y=trajectory["error"], z=trajectory["control"],
+                                       mode="lines+markers", name="Trajektoria symulacji",
+                                       marker=dict(size=2, color=trajectory["time"], colorscale="Viridis"),
+                                       line=dict(color="black", width=2)))
+        fig.update_layout(scene=dict(xaxis_title="DeltaError", yaxis_title="Error", zaxis_title="Control"))
+    else:
+        fig.add_trace(go.Heatmap(x=de_grid, y=e_grid, z=z, colorscale="RdBu", reversescale=True,
+                                 zmin=-1, zmax=1, colorbar=dict(title="Control")))
+        # Siatka reguł i etykiety dodawane jednym update_layout (add_vline/add_annotation są wolne)
+        grid_line = dict(color="gray", width=1, dash="dot")
+        shapes = [dict(type="line", xref="x", yref="paper", x0=de, x1=de, y0=0, y1=1, line=grid_line)
+                  for de in surface["de_peaks"]] + \
+                 [dict(type="line", xref="paper", yref="y", x0=0, x1=1, y0=e, y1=e, line=grid_line)
+                  for e in surface["e_peaks"]]
+        labels = rule_labels()
+        activity = trajectory["activity"] if trajectory is not None else None
+        annotations = [
+            dict(x=de, y=e, showarrow=False, font=dict(size=9), bgcolor="rgba(255, 255, 255, 0.6)",
+                 text=labels[i][j] if activity is None else f"{labels[i][j]}<br>{100 * activity[i, j]:.0f}%")
+            for i, e in enumerate(surface["e_peaks"]) for j, de in enumerate(surface["de_peaks"])
+        ]
+        fig.update_layout(shapes=shapes, annotations=annotations)
+        if trajectory is not None:
+            fig.add_trace(go.Scatter(x=trajectory["d_error"], y=trajectory["error"], mode="lines+markers",
+                                     name="Trajektoria symulacji", line=dict(color="black", width=1),
+                                     marker=dict(size=4, color=trajectory["time"], colorscale="Viridis",
+                                                 colorbar=dict(title="t [s]", x=1.15))))
+        fig.update_layout(xaxis_title="DeltaError", yaxis_title="Error")
+    fig.update_layout(template="plotly_white", margin=dict(l=50, r=50, t=30, b=50), showlegend=False)
+    return fig
+
+
+def timing_table(records):
+    """Rozkład czasu obsługi żądania z zapisów instrumentacji (summarize)."""
+    cell = {'border': '1px solid #ddd', 'padding': '3px 5px', 'fontSize': '12px'}
+    rows = [html.Tr([html.Td(label, style=cell), html.Td(str(n), style={**cell, 'textAlign': 'right'}),
+                     html.Td(f"{1000 * seconds:.2f} ms", style={**cell, 'textAlign': 'right'})])
+            for label, n, seconds in summarize(records)]
+    if not rows:
+        return html.Div("Brak pomiarów (wyniki z pamięci podręcznej bez obliczeń).", style={'fontSize': '12px'})
+    return html.Table(style={'width': '100%', 'borderCollapse': 'collapse'}, children=[
+        html.Thead(html.Tr([html.Th(title, style=cell) for title in ("Etap", "Liczba", "Czas")])),
+        html.Tbody(rows),
+    ])
+
+
+def render_timed(results, records=()):
+    """Wykresy, tabela wskaźników i rozkład czasu (zapisy records plus budowa wykresów)."""
+    with trace() as render_records:
+        figures = render_results(results)
+        table = metrics_table(results)
+    return (*figures, table, timing_table(list(records) + render_records))
+
+
+def build_figures(xs, ys, shading_classic=(), shading_fuzzy=()):
+    """
+    Wykresy prędkości i sił obu regulatorów z przebiegów xs/ys (kolumna ->
+    tablica, jak w PLOT_TRACES) i śladów tła sterowania.
+    """
     # Przygotowanie wykresów
     # 1. Wykres prędkości (regulator klasyczny, rozmyty i zadana)
     fig_velocity = go.Figure()
     
     # Prędkości
     fig_velocity.add_trace(go.Scatter(
-        x=time_classic, y=v_classic_kmh, 
+        x=xs["classic.v"], y=ys["classic.v"], 
         mode="lines", name="Prędkość (klasyczny) [km/h]",
         line=dict(color="royalblue")
     ))
     fig_velocity.add_trace(go.Scatter(
-        x=time_fuzzy, y=v_fuzzy_kmh, 
+        x=xs["fuzzy.v"], y=ys["fuzzy.v"], 
         mode="lines", name="Prędkość (rozmyty) [km/h]",
         line=dict(color="orange")
     ))
     fig_velocity.add_trace(go.Scatter(
-        x=time_classic, y=vref_kmh_classic, 
+        x=xs["vref_kmh"], y=ys["vref_kmh"], 
         mode="lines", name="Prędkość zadana [km/h]",
         line=dict(dash="dash", color="black")
     ))
     
     # Nachylenie
     fig_velocity.add_trace(go.Scatter(
-        x=time_classic, y=alpha_deg_classic, 
+        x=xs["alpha_deg"], y=ys["alpha_deg"], 
         mode="lines", name="Nachylenie [°]",
         line=dict(color="green"),
         yaxis="y2"
@@ -356,29 +746,28 @@ def update_simulation(n_clicks, vehicle_type,
     
     # Siła ciągu na pierwszej (lewej) osi Y
     fig_classic.add_trace(go.Scatter(
-        x=time_classic, y=F_drive_classic, 
+        x=xs["classic.F_drive"], y=ys["classic.F_drive"], 
         mode="lines", name="Siła ciągu [N]",
         line=dict(color="green")
     ), secondary_y=False)
     
     # Sygnał sterujący na drugiej osi Y (środkowej)
     fig_classic.add_trace(go.Scatter(
-        x=time_classic, y=u_classic, 
+        x=xs["classic.u"], y=ys["classic.u"], 
         mode="lines", name="Sygnał sterujący",
         line=dict(color="blue")
     ), secondary_y=True)
     
     # Siła oporu na trzeciej osi Y (dodatkowa oś po prawej)
     fig_classic.add_trace(go.Scatter(
-        x=time_classic, y=F_aero_classic, 
+        x=xs["classic.F_aero"], y=ys["classic.F_aero"], 
         mode="lines", name="Siła oporu [N]",
         line=dict(color="red"),
         yaxis="y3"
     ))
     
-    # Kolorowe tło
-    for x0, x1, color in segments_classic:
-        fig_classic.add_vrect(x0=x0, x1=x1, fillcolor=color, layer="below", line_width=0)
+    # Kolorowe tło (jeden ślad na kategorię, pełni też rolę legendy)
+    fig_classic.add_traces(shading_classic)
       # Układ wykresu klasycznego z trzema osiami Y
     fig_classic.update_layout(
         title="Regulator klasyczny PI - siły i sterowanie",
@@ -394,6 +783,7 @@ def update_simulation(n_clicks, vehicle_type,
             tickmode='auto',
             tickfont=dict(color="red")
         ),
+        yaxis4=dict(range=[0, 1], overlaying="y", visible=False, fixedrange=True),
         legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
         margin=dict(l=50, r=60, t=50, b=50),  
         template="plotly_white",
@@ -411,58 +801,33 @@ def update_simulation(n_clicks, vehicle_type,
         ]
     )
     
-    # Legenda kolorów tła
-    fig_classic.add_trace(go.Scatter(
-        x=[None], y=[None],
-        mode='markers',
-        marker=dict(size=15, color='rgba(0,255,0,0.5)'),
-        name='Przyspieszanie',
-        showlegend=True
-    ))
-    
-    fig_classic.add_trace(go.Scatter(
-        x=[None], y=[None],
-        mode='markers',
-        marker=dict(size=15, color='rgba(255,0,0,0.5)'),
-        name='Hamowanie',
-        showlegend=True
-    ))
-    
-    fig_classic.add_trace(go.Scatter(
-        x=[None], y=[None],
-        mode='markers',
-        marker=dict(size=15, color='rgba(0,0,255,0.5)'),
-        name='Utrzymanie',
-        showlegend=True
-    ))
       # 3. Wykres sił dla regulatora rozmytego (z trzema osiami Y)
     fig_fuzzy = make_subplots(specs=[[{"secondary_y": True}]])
     
     # Siła ciągu na pierwszej (lewej) osi Y
     fig_fuzzy.add_trace(go.Scatter(
-        x=time_fuzzy, y=F_drive_fuzzy, 
+        x=xs["fuzzy.F_drive"], y=ys["fuzzy.F_drive"], 
         mode="lines", name="Siła ciągu [N]",
         line=dict(color="green")
     ), secondary_y=False)
     
     # Sygnał sterujący na drugiej osi Y (środkowej)
     fig_fuzzy.add_trace(go.Scatter(
-        x=time_fuzzy, y=u_fuzzy, 
+        x=xs["fuzzy.u"], y=ys["fuzzy.u"], 
         mode="lines", name="Sygnał sterujący",
         line=dict(color="blue")
     ), secondary_y=True)
     
     # Siła oporu na trzeciej osi Y (dodatkowa oś po prawej)
     fig_fuzzy.add_trace(go.Scatter(
-        x=time_fuzzy, y=F_aero_fuzzy, 
+        x=xs["fuzzy.F_aero"], y=ys["fuzzy.F_aero"], 
         mode="lines", name="Siła oporu [N]",
         line=dict(color="red"),
         yaxis="y3"
     ))
     
-    # Kolorowe tło
-    for x0, x1, color in segments_fuzzy:
-        fig_fuzzy.add_vrect(x0=x0, x1=x1, fillcolor=color, layer="below", line_width=0)
+    # Kolorowe tło (jeden ślad na kategorię, pełni też rolę legendy)
+    fig_fuzzy.add_traces(shading_fuzzy)
       # Układ wykresu rozmytego z trzema osiami Y
     fig_fuzzy.update_layout(
         title="Regulator rozmyty PI - siły i sterowanie",
@@ -478,6 +843,7 @@ def update_simulation(n_clicks, vehicle_type,
             tickmode='auto',
             tickfont=dict(color="red")
         ),
+        yaxis4=dict(range=[0, 1], overlaying="y", visible=False, fixedrange=True),
         legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
         margin=dict(l=50, r=60, t=50, b=50),  
         template="plotly_white",
@@ -495,32 +861,473 @@ def update_simulation(n_clicks, vehicle_type,
         ]
     )
     
-    # Legenda kolorów tła
-    fig_fuzzy.add_trace(go.Scatter(
-        x=[None], y=[None],
-        mode='markers',
-        marker=dict(size=15, color='rgba(0,255,0,0.5)'),
-        name='Przyspieszanie',
-        showlegend=True
-    ))
+    return fig_velocity, fig_classic, fig_fuzzy
+
+
+@app.server.route("/cache-stats")
+def cache_stats():
+    """Liczniki trafień/chybień pamięci podręcznej symulacji (JSON)."""
+    return SIM_CACHE.stats()
+
+
+@app.server.route("/job-stats")
+def job_stats():
+    """Liczba zadań w tle według stanu i liczba zgłoszeń zdeduplikowanych (JSON)."""
+    return JOB_QUEUE.stats()
+
+
+@app.server.route("/metrics")
+def prometheus_metrics():
+    """Liczniki i histogramy instrumentacji w formacie tekstowym Prometheus."""
+    return Response(REGISTRY.exposition(), mimetype="text/plain; version=0.0.4")
+
+
+@app.server.route("/controller-stats")
+def controller_stats():
+    """Koszt budowy regulatora rozmytego względem resetu (JSON)."""
+    return controller_pool_stats()
+
+
+@app.callback(
+    [Output("velocity-graph", "figure"),
+     Output("classic-forces-graph", "figure"),
+     Output("fuzzy-forces-graph", "figure"),
+     Output("sim-key", "data"),
+     Output("metrics-table", "children"),
+     Output("live-run", "data"),
+     Output("live-interval", "disabled"),
+     Output("sim-job", "data"),
+     Output("job-interval", "disabled"),
+     Output("job-status", "children"),
+     Output("timing-table", "children")],
+    Input("simulate-btn", "n_clicks"),
+    State("vehicle-dropdown", "value"),
+    State("seg1-time", "value"), State("seg1-alpha", "value"),
+    State("seg2-time", "value"), State("seg2-alpha", "value"),
+    State("seg3-time", "value"), State("seg3-alpha", "value"),
+    State("vseg1-time", "value"), State("vseg1-v", "value"),
+    State("vseg2-time", "value"), State("vseg2-v", "value"),
+    State("vseg3-time", "value"), State("vseg3-v", "value"),
+    State("kp-value", "value"), State("ti-value", "value"), 
+    State("classic-dt-value", "value"), State("fuzzy-dt-value", "value"),
+    State("live-mode", "value"),
+    State("sim-job", "data"),
+    State("route-file", "data"),
+    State("live-run", "data")
+)
+def update_simulation(n_clicks, vehicle_type,
+                      seg1_time, seg1_alpha, seg2_time, seg2_alpha, seg3_time, seg3_alpha,
+                      vseg1_time, vseg1_v, vseg2_time, vseg2_v, vseg3_time, vseg3_v,
+                      kp_value, ti_value, classic_dt, fuzzy_dt, live_mode=None, previous_job=None,
+                      route_file=None, previous_live=None):
+    # Nowe zgłoszenie zastępuje przebieg na żywo tej sesji - jego wątki nie
+    # konkurują dalej o GIL z serwerem
+    if previous_live:
+        cancel_live_run(previous_live["id"])
     
-    fig_fuzzy.add_trace(go.Scatter(
-        x=[None], y=[None],
-        mode='markers',
-        marker=dict(size=15, color='rgba(255,0,0,0.5)'),
-        name='Hamowanie',
-        showlegend=True
-    ))
+    alpha_segments, vref_segments = route_segments(seg1_time, seg1_alpha, seg2_time, seg2_alpha,
+                                                   seg3_time, seg3_alpha, vseg1_time, vseg1_v,
+                                                   vseg2_time, vseg2_v, vseg3_time, vseg3_v)
+    # Okresy próbkowania spoza siatki kroku obiektu - komunikat zamiast błędu serwera
+    try:
+        plant_dt = plant_step((classic_dt, fuzzy_dt), PLANT_DT)
+    except ValueError as exc:
+        return (*[no_update] * len(PLOT_TRACES), no_update, no_update, None, True, None, True,
+                f"Błąd parametrów: {exc}", no_update)
     
-    fig_fuzzy.add_trace(go.Scatter(
-        x=[None], y=[None],
-        mode='markers',
-        marker=dict(size=15, color='rgba(0,0,255,0.5)'),
-        name='Utrzymanie',
-        showlegend=True
-    ))
+    if route_file:
+        # Trasa z pliku zastępuje odcinki z formularza (tylko w kolejce zadań, bez trybu na żywo)
+        args = (vehicle_type, route_file, kp_value, ti_value, classic_dt, fuzzy_dt)
+        key = route_simulation_key(vehicle_type, route_file["key"], kp_value, ti_value, classic_dt, fuzzy_dt)
+        job_func = route_simulation_job
+    else:
+        args = (vehicle_type, alpha_segments, vref_segments, kp_value, ti_value, classic_dt, fuzzy_dt)
+        key = simulation_key(*args)
+        job_func = simulation_job
     
-    return fig_velocity, fig_classic, fig_fuzzy
+    # Zmienione parametry - poprzednie zadanie tego klienta nie jest już potrzebne
+    if previous_job and previous_job["key"] != key:
+        JOB_QUEUE.cancel(previous_job["id"])
+    
+    results = SIM_CACHE.get(key)
+    if results is not None:
+        *figures, table, timing = render_timed(results)
+        return (*figures, key, table, None, True, None, True, None, timing)
+    
+    # Tryb na żywo: symulacja w tle, wykresy uzupełniane przez stream_live
+    if live_mode and "live" in live_mode and not route_file:
+        controllers = simulation_controllers(kp_value, ti_value, classic_dt, fuzzy_dt)
+        run_id = start_live_run(vehicle_type, alpha_segments, vref_segments, plant_dt, controllers)
+        empty = {column: np.zeros(0) for traces in PLOT_TRACES.values() for _, column, _ in traces}
+        figures = build_figures(empty, empty)
+        live = {"id": run_id, "key": key, "cursors": {name: 0 for name in controllers}}
+        return (*figures, None, "Symulacja w toku...", live, False, None, True, None, no_update)
+    
+    # Zadanie w kolejce (identyczne zadanie w toku jest współdzielone); wynik odbiera poll_simulation_job
+    job = JOB_QUEUE.get(previous_job["id"]) if previous_job and previous_job["key"] == key else None
+    job_id = job.id if job is not None and not job.finished() else JOB_QUEUE.submit(key, job_func, *args)
+    return (no_update, no_update, no_update, no_update, no_update, None, True,
+            {"id": job_id, "key": key}, False, job_progress(JOB_QUEUE.get(job_id).status()), no_update)
+
+
+@app.callback(
+    [Output(graph_id, "figure", allow_duplicate=True) for graph_id in PLOT_TRACES] +
+    [Output("sim-key", "data", allow_duplicate=True),
+     Output("metrics-table", "children", allow_duplicate=True),
+     Output("sim-job", "data", allow_duplicate=True),
+     Output("job-interval", "disabled", allow_duplicate=True),
+     Output("job-status", "children", allow_duplicate=True),
+     Output("timing-table", "children", allow_duplicate=True)],
+    Input("job-interval", "n_intervals"),
+    State("sim-job", "data"),
+    prevent_initial_call=True
+)
+def poll_simulation_job(n_intervals, job_data):
+    """Postęp zadania symulacji; po zakończeniu - wykresy i tabela wskaźników."""
+    job = JOB_QUEUE.get(job_data["id"]) if job_data else None
+    unchanged = [no_update] * (len(PLOT_TRACES) + 2)
+    if job is None:
+        return unchanged + [None, True, None, no_update]
+    
+    status = job.status()
+    if job.state == DONE:
+        result = JOB_QUEUE.take_result(job.id)
+        if result is None:
+            return unchanged + [None, True, None, no_update]
+        key, results, records = result
+        *figures, table, timing = render_timed(results, records)
+        return [*figures, key, table, None, True, None, timing]
+    if job.state == FAILED:
+        return unchanged + [None, True, f"Błąd symulacji: {status['error']}", no_update]
+    if job.state == CANCELLED:
+        return unchanged + [None, True, None, no_update]
+    return unchanged + [no_update, False, job_progress(status), no_update]
+
+
+def render_results(results):
+    """Pełne wykresy dla wyników scenariusza (zdecymowane przebiegi i tło sterowania)."""
+    time_classic = time_fuzzy = results["time"]
+    u_classic, u_fuzzy = results["classic"]["u"], results["fuzzy"]["u"]
+    
+    # Przebiegi zdecymowane do PLOT_POINTS punktów (pełna rozdzielczość po przybliżeniu)
+    xs, ys = {}, {}
+    with span("downsample"):
+        for traces in PLOT_TRACES.values():
+            for _, column, scale in traces:
+                xs[column], ys[column] = plot_series(results, column, scale)
+    
+    # Tło według kategorii sterowania (serie wyznaczone z pełnej rozdzielczości)
+    with span("shading"):
+        shading_classic = shading_traces(time_classic, u_classic, hysteresis=SHADING_HYSTERESIS,
+                                         min_duration=SHADING_MIN_DURATION)
+        shading_fuzzy = shading_traces(time_fuzzy, u_fuzzy, hysteresis=SHADING_HYSTERESIS,
+                                       min_duration=SHADING_MIN_DURATION)
+    
+    with span("build_figures"):
+        return build_figures(xs, ys, shading_classic, shading_fuzzy)
+
+
+def live_series(run, new, column, scale=1):
+    """
+    Nowe próbki kolumny PLOT_TRACES z przebiegu na żywo, zdecymowane do
+    LIVE_POINTS_PER_TICK punktów. Przebiegi trasy (ROUTE_COLUMNS) podążają
+    za pierwszym regulatorem.
+    """
+    if "." in column:
+        name, field = column.split(".")
+        x, y = new[name]["time"], new[name][field]
+    else:
+        x = new[next(iter(run.controllers))]["time"]
+        y = ROUTE_COLUMNS[column](run.route, x)
+    return downsample(x, y * scale, LIVE_POINTS_PER_TICK, PLOT_DOWNSAMPLE)
+
+
+@app.callback(
+    [Output(graph_id, "extendData") for graph_id in PLOT_TRACES] +
+    [Output(graph_id, "figure", allow_duplicate=True) for graph_id in PLOT_TRACES] +
+    [Output("sim-key", "data", allow_duplicate=True),
+     Output("metrics-table", "children", allow_duplicate=True),
+     Output("live-run", "data", allow_duplicate=True),
+     Output("live-interval", "disabled", allow_duplicate=True)],
+    Input("live-interval", "n_intervals"),
+    State("live-run", "data"),
+    prevent_initial_call=True
+)
+def stream_live(n_intervals, live):
+    """
+    Tryb na żywo: dopisuje do wykresów tylko próbki policzone od poprzedniej
+    aktualizacji (extendData). Po zakończeniu symulacji wyniki trafiają do
+    SIM_CACHE, a wykresy są zastępowane pełną wersją (z tłem sterowania).
+    """
+    graphs = list(PLOT_TRACES)
+    run = get_live_run(live["id"]) if live else None
+    if run is None:
+        return [no_update] * (2 * len(graphs)) + [no_update, no_update, None, True]
+    
+    # Stan sprawdzany przed odczytem - ostatni odczyt obejmuje wszystkie porcje
+    finished = run.finished()
+    if run.error is not None:
+        return [no_update] * (2 * len(graphs)) + [no_update, f"Błąd symulacji: {run.error}", None, True]
+    
+    if finished:
+        runs = run.results()
+        results = assemble_results(run.route, runs, run.controllers["fuzzy"][1]["dt"])
+        SIM_CACHE.put(live["key"], results)
+        return [no_update] * len(graphs) + list(render_results(results)) + \
+            [live["key"], metrics_table(results), None, True]
+    
+    new = {name: run.read(name, start) for name, start in live["cursors"].items()}
+    extend = []
+    for graph_id in graphs:
+        indices, xs, ys = [], [], []
+        for index, column, scale in PLOT_TRACES[graph_id]:
+            x, y = live_series(run, new, column, scale)
+            indices.append(index)
+            xs.append(x)
+            ys.append(y)
+        extend.append((dict(x=xs, y=ys), indices))
+    
+    cursors = {name: start + len(new[name]) for name, start in live["cursors"].items()}
+    done, total = run.progress()
+    status = "Symulacja w toku: " + ", ".join(f"{RUN_LABELS[name]} {100 * count / total:.0f}%" for name, count in done.items())
+    return extend + [no_update] * len(graphs) + [no_update, status, dict(live, cursors=cursors), False]
+
+
+@app.callback(
+    [Output("tune-job", "data"),
+     Output("tune-interval", "disabled"),
+     Output("tuner-status", "children")],
+    Input("tune-btn", "n_clicks"),
+    State("vehicle-dropdown", "value"),
+    State("seg1-time", "value"), State("seg1-alpha", "value"),
+    State("seg2-time", "value"), State("seg2-alpha", "value"),
+    State("seg3-time", "value"), State("seg3-alpha", "value"),
+    State("vseg1-time", "value"), State("vseg1-v", "value"),
+    State("vseg2-time", "value"), State("vseg2-v", "value"),
+    State("vseg3-time", "value"), State("vseg3-v", "value"),
+    State("classic-dt-value", "value"),
+    State("tune-job", "data"),
+    prevent_initial_call=True
+)
+def auto_tune(n_clicks, vehicle_type,
+              seg1_time, seg1_alpha, seg2_time, seg2_alpha, seg3_time, seg3_alpha,
+              vseg1_time, vseg1_v, vseg2_time, vseg2_v, vseg3_time, vseg3_v, classic_dt, previous_job=None):
+    """Zgłasza dobór Kp i Ti (ITAE odcinkowe + energia sterowania) dla bieżącego pojazdu i trasy."""
+    alpha_segments, vref_segments = route_segments(seg1_time, seg1_alpha, seg2_time, seg2_alpha,
+                                                   seg3_time, seg3_alpha, vseg1_time, vseg1_v,
+                                                   vseg2_time, vseg2_v, vseg3_time, vseg3_v)
+    try:
+        plant_dt = plant_step((classic_dt,), PLANT_DT)
+    except ValueError as exc:
+        return None, True, f"Błąd parametrów: {exc}"
+    key = scenario_key(task="tune_pi", vehicle_type=vehicle_type, alpha_segments=alpha_segments,
+                       vref_segments=vref_segments, classic_dt=classic_dt)
+    if previous_job and previous_job["key"] != key:
+        JOB_QUEUE.cancel(previous_job["id"])
+    job = JOB_QUEUE.get(previous_job["id"]) if previous_job and previous_job["key"] == key else None
+    job_id = job.id if job is not None and not job.finished() else \
+        JOB_QUEUE.submit(key, tuning_job, vehicle_type, alpha_segments, vref_segments, classic_dt, plant_dt)
+    return {"id": job_id, "key": key}, False, "Dobór nastaw w kolejce..."
+
+
+@app.callback(
+    [Output("kp-value", "value"),
+     Output("ti-value", "value"),
+     Output("tuner-status", "children", allow_duplicate=True),
+     Output("tune-job", "data", allow_duplicate=True),
+     Output("tune-interval", "disabled", allow_duplicate=True)],
+    Input("tune-interval", "n_intervals"),
+    State("tune-job", "data"),
+    prevent_initial_call=True
+)
+def poll_tuning_job(n_intervals, job_data):
+    """Postęp doboru nastaw; po zakończeniu wpisuje Kp i Ti do formularza."""
+    job = JOB_QUEUE.get(job_data["id"]) if job_data else None
+    if job is None or job.state == CANCELLED:
+        return no_update, no_update, None, None, True
+    if job.state == FAILED:
+        return no_update, no_update, f"Błąd doboru nastaw: {job.error}", None, True
+    if job.state != DONE:
+        return no_update, no_update, job_progress(job.status()), no_update, False
+    
+    result = JOB_QUEUE.take_result(job.id)
+    if result is None:
+        return no_update, no_update, None, None, True
+    if result["Kp"] is None:
+        return no_update, no_update, "Brak wyniku w limicie czasu", None, True
+    
+    status = f"koszt {result['cost']:.1f}, {result['evaluations']} symulacji w {result['elapsed']:.1f} s"
+    if not result["completed"]:
+        status += " (przerwano po limicie czasu)"
+    return round(result["Kp"], 2), round(result["Ti"], 2), status, None, True
+
+
+@app.callback(
+    [Output("route-file", "data"),
+     Output("route-file-info", "children")],
+    Input("route-upload", "contents"),
+    State("route-upload", "filename"),
+    prevent_initial_call=True
+)
+def import_route(contents, filename):
+    """
+    Import trasy z pliku CSV/GPX: punkty zapisywane w ROUTE_DIR (.npy, float32)
+    pod skrótem zawartości - ten sam plik nie jest przetwarzany ponownie.
+    """
+    if contents is None:
+        return no_update, no_update
+    data = base64.b64decode(contents.split(",", 1)[1])
+    key = hashlib.sha256(data).hexdigest()
+    path = os.path.join(ROUTE_DIR, key + ".npy")
+    try:
+        if not os.path.exists(path):
+            points = parse_route(data.decode("utf-8-sig"), filename)
+            os.makedirs(ROUTE_DIR, exist_ok=True)
+            save_route(points, path)
+        route = open_route(path)
+    except (ValueError, UnicodeDecodeError) as exc:
+        return None, f"Błąd importu {filename}: {exc}"
+    
+    info = {"key": key, "path": path, "name": filename}
+    return info, (f"{filename}: {route.n_segments} odcinków, {route.length / 1000:.1f} km, "
+                  f"przejazd z ograniczeniami {route.travel_time() / 60:.0f} min")
+
+
+@app.callback(
+    [Output("route-file", "data", allow_duplicate=True),
+     Output("route-file-info", "children", allow_duplicate=True),
+     Output("route-upload", "contents")],
+    Input("route-clear", "n_clicks"),
+    prevent_initial_call=True
+)
+def clear_route(n_clicks):
+    """Powrót do odcinków z formularza."""
+    return None, None, None
+
+
+@app.callback(
+    [Output("mc-job", "data"),
+     Output("mc-interval", "disabled"),
+     Output("mc-status", "children")],
+    Input("mc-btn", "n_clicks"),
+    State("vehicle-dropdown", "value"),
+    State("seg1-time", "value"), State("seg1-alpha", "value"),
+    State("seg2-time", "value"), State("seg2-alpha", "value"),
+    State("seg3-time", "value"), State("seg3-alpha", "value"),
+    State("vseg1-time", "value"), State("vseg1-v", "value"),
+    State("vseg2-time", "value"), State("vseg2-v", "value"),
+    State("vseg3-time", "value"), State("vseg3-v", "value"),
+    State("kp-value", "value"), State("ti-value", "value"),
+    State("classic-dt-value", "value"), State("fuzzy-dt-value", "value"),
+    State("mc-samples", "value"),
+    State("mc-job", "data"),
+    prevent_initial_call=True
+)
+def start_monte_carlo(n_clicks, vehicle_type,
+                      seg1_time, seg1_alpha, seg2_time, seg2_alpha, seg3_time, seg3_alpha,
+                      vseg1_time, vseg1_v, vseg2_time, vseg2_v, vseg3_time, vseg3_v,
+                      kp_value, ti_value, classic_dt, fuzzy_dt, n_samples, previous_job=None):
+    """Zgłasza analizę Monte Carlo dla bieżącego pojazdu, trasy i nastaw."""
+    alpha_segments, vref_segments = route_segments(seg1_time, seg1_alpha, seg2_time, seg2_alpha,
+                                                   seg3_time, seg3_alpha, vseg1_time, vseg1_v,
+                                                   vseg2_time, vseg2_v, vseg3_time, vseg3_v)
+    n_samples = int(min(max(n_samples or MC_SAMPLES, 10), MC_MAX_SAMPLES))
+    controllers = simulation_controllers(kp_value, ti_value, classic_dt, fuzzy_dt)
+    try:
+        plant_dt = plant_step((classic_dt, fuzzy_dt), PLANT_DT)
+    except ValueError as exc:
+        return None, True, f"Błąd parametrów: {exc}"
+    key = scenario_key(task="monte_carlo", vehicle_type=vehicle_type, alpha_segments=alpha_segments,
+                       vref_segments=vref_segments, controllers=controllers, n_samples=n_samples)
+    if previous_job and previous_job["key"] != key:
+        JOB_QUEUE.cancel(previous_job["id"])
+    job = JOB_QUEUE.get(previous_job["id"]) if previous_job and previous_job["key"] == key else None
+    job_id = job.id if job is not None and not job.finished() else \
+        JOB_QUEUE.submit(key, monte_carlo_job, vehicle_type, alpha_segments, vref_segments,
+                         controllers, n_samples, plant_dt)
+    return {"id": job_id, "key": key}, False, "Analiza w kolejce..."
+
+
+@app.callback(
+    [Output("mc-results", "children"),
+     Output("mc-status", "children", allow_duplicate=True),
+     Output("mc-job", "data", allow_duplicate=True),
+     Output("mc-interval", "disabled", allow_duplicate=True)],
+    Input("mc-interval", "n_intervals"),
+    State("mc-job", "data"),
+    prevent_initial_call=True
+)
+def poll_monte_carlo(n_intervals, job_data):
+    """Postęp analizy Monte Carlo; po zakończeniu - pasma prędkości i rozkłady wskaźników."""
+    job = JOB_QUEUE.get(job_data["id"]) if job_data else None
+    if job is None or job.state == CANCELLED:
+        return no_update, None, None, True
+    if job.state == FAILED:
+        return no_update, f"Błąd analizy: {job.error}", None, True
+    if job.state != DONE:
+        return no_update, job_progress(job.status()), no_update, False
+    
+    result = JOB_QUEUE.take_result(job.id)
+    if result is None:
+        return no_update, None, None, True
+    panel = html.Div(style={'marginTop': '10px', 'padding': '10px', 'backgroundColor': 'white', 'borderRadius': '5px', 'boxShadow': '0 1px 3px rgba(0,0,0,0.1)'}, children=[
+        dcc.Graph(figure=monte_carlo_figure(result), style={'height': '40vh'}),
+        monte_carlo_table(result),
+    ])
+    return panel, f"{result['n_samples']} scenariuszy w {result['elapsed']:.1f} s", None, True
+
+
+@app.callback(
+    Output("surface-graph", "figure"),
+    Input("surface-view", "value"),
+    Input("sim-key", "data")
+)
+def update_surface(view, sim_key):
+    """
+    Powierzchnia sterowania (z pamięci podręcznej) z trajektorią ostatniej symulacji
+    - okres próbkowania z wyników, nie z formularza (mógł zostać zmieniony po symulacji).
+    """
+    results = SIM_CACHE.peek(sim_key) if sim_key else None
+    trajectory = None
+    if results is not None:
+        trajectory = input_trajectory(results["fuzzy"], run_v_ref(results, "fuzzy"), float(results["fuzzy_dt"]))
+    return surface_figure(control_surface(), view, trajectory)
+
+
+def register_zoom_callback(graph_id):
+    """
+    Po przybliżeniu wykresu podmienia jego przebiegi na dane z pełnej
+    rozdzielczości w widocznym zakresie (ponownie zdecymowane).
+    """
+    @app.callback(
+        Output(graph_id, "figure", allow_duplicate=True),
+        Input(graph_id, "relayoutData"),
+        State("sim-key", "data"),
+        prevent_initial_call=True
+    )
+    def refine_on_zoom(relayout_data, key):
+        x_range, changed = relayout_x_range(relayout_data)
+        results = SIM_CACHE.peek(key) if (changed and key) else None
+        if results is None:
+            return no_update
+        
+        patched = Patch()
+        for index, column, scale in PLOT_TRACES[graph_id]:
+            x, y = plot_series(results, column, scale, x_range)
+            patched["data"][index]["x"] = x
+            patched["data"][index]["y"] = y
+        return patched
+    
+    return refine_on_zoom
+
+
+for graph_id in PLOT_TRACES:
+    register_zoom_callback(graph_id)
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    debug = True
+    # W trybie debug skrypt działa w dwóch procesach (nadzorca przeładowania
+    # i serwer) - pula procesów roboczych tylko w procesie serwera
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        warm_up()
+    app.run(debug=debug)
\ No newline at end of file
@@ -0,0 +1,226 @@
+"""
+Wsadowe uruchamianie scenariuszy bez interfejsu Dash.
+
+    python batch_runner.py scenariusze.json wyniki.parquet
+    python batch_runner.py scenariusze.json wyniki.npz --workers 8
+
+Plik scenariuszy (JSON) to lista scenariuszy albo {"scenarios": [...]}:
+
+    {"name": "gorka", "vehicle": "ciezarowka",
+     "alpha_segments": [{"time": 10, "alpha": 0}, {"time": 20, "alpha": 8}],
+     "vref_segments": [{"time": 30, "v": 60}],
+     "controllers": {"classic": {"Kp": 2, "Ti": 5, "dt": 0.01}, "fuzzy": {"dt": 0.1, "Ke": 2}}}
+
+Brak "controllers" - oba regulatory z parametrami domyślnymi aplikacji.
+Wyniki są zapisywane porcjami w miarę kończenia symulacji: wiersz = próbka
+dziennika symulacji (SIM_LOG_DTYPE) z numerem scenariusza i regulatora.
+"""
+import argparse
+import json
+import sys
+import time as clock
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import numpy as np
+
+from sim_workers import get_pool, pool_size, run_controller
+from vehicle_model import SIM_LOG_DTYPE, plant_step
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAVE_PYARROW = True
+except ImportError:
+    HAVE_PYARROW = False
+
+# Parametry regulatorów, gdy scenariusz ich nie podaje (jak w aplikacji)
+DEFAULT_CONTROLLERS = {
+    "classic": {"Kp": 1, "Ti": 1, "dt": 0.01},
+    "fuzzy": {"dt": 0.1},
+}
+
+# Maksymalny krok całkowania modelu pojazdu [s]; w scenariuszu dobierany
+# tak, by dzielił okresy próbkowania jego regulatorów (plant_step)
+PLANT_DT = 0.01
+
+# Liczba wierszy w jednej porcji zapisu
+CHUNK_ROWS = 100_000
+
+
+def load_scenarios(path):
+    """Lista scenariuszy z pliku JSON z uzupełnionymi nazwami i regulatorami."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    scenarios = data["scenarios"] if isinstance(data, dict) else data
+
+    for i, scenario in enumerate(scenarios):
+        for key in ("vehicle", "alpha_segments", "vref_segments"):
+            if key not in scenario:
+                raise ValueError(f"Scenariusz {i}: brak pola '{key}'")
+        scenario.setdefault("name", f"scenariusz_{i}")
+        scenario.setdefault("controllers", DEFAULT_CONTROLLERS)
+    return scenarios
+
+
+def scenario_plant_dt(scenario, max_dt=PLANT_DT):
+    """Krok obiektu scenariusza - dzieli okresy próbkowania wszystkich jego regulatorów."""
+    dts = [params["dt"] for params in scenario["controllers"].values() if params.get("dt")]
+    if not dts:
+        return max_dt
+    try:
+        return plant_step(dts, max_dt)
+    except ValueError as exc:
+        raise ValueError(f"Scenariusz {scenario['name']}: {exc}") from exc
+
+
+def chunk_dtype():
+    """Typ wiersza wyniku: numer scenariusza i regulatora + pola dziennika symulacji."""
+    return np.dtype([("scenario", np.int32), ("controller", np.int8)] + SIM_LOG_DTYPE.descr)
+
+
+class NpzChunkWriter:
+    """
+    Zapis porcji do archiwum .npz bez składania całości w pamięci: każda porcja
+    to osobna tablica chunk_NNNNNN (zipfile + np.lib.format). Nazwy scenariuszy
+    i regulatorów trafiają do tablic scenarios i controllers przy zamknięciu.
+    Odczyt: np.load(path) albo iter_npz_chunks(path).
+    """
+    def __init__(self, path, scenario_names, controller_names):
+        self.scenario_names = scenario_names
+        self.controller_names = controller_names
+        self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED, allowZip64=True)
+        self._count = 0
+
+    def _write_array(self, name, array):
+        with self._zip.open(name + ".npy", "w", force_zip64=True) as f:
+            np.lib.format.write_array(f, np.ascontiguousarray(array), allow_pickle=False)
+
+    def write(self, chunk):
+        self._write_array(f"chunk_{self._count:06d}", chunk)
+        self._count += 1
+
+    def close(self):
+        self._write_array("scenarios", np.array(self.scenario_names, dtype=str))
+        self._write_array("controllers", np.array(self.controller_names, dtype=str))
+        self._zip.close()
+
+
+class ParquetChunkWriter:
+    """Zapis porcji jako kolejnych grup wierszy pliku Parquet (wymaga pyarrow)."""
+    def __init__(self, path, scenario_names, controller_names):
+        if not HAVE_PYARROW:
+            raise RuntimeError("Zapis Parquet wymaga pakietu pyarrow (albo użyj formatu npz)")
+        self.scenario_names = scenario_names
+        self.controller_names = controller_names
+        self._scenario_dict = pa.array(scenario_names, type=pa.string())
+        self._controller_dict = pa.array(controller_names, type=pa.string())
+        self._writer = None
+        self._path = path
+
+    def write(self, chunk):
+        columns = {
+            "scenario": pa.DictionaryArray.from_arrays(pa.array(chunk["scenario"]), self._scenario_dict),
+            "controller": pa.DictionaryArray.from_arrays(pa.array(chunk["controller"]), self._controller_dict),
+        }
+        columns.update({name: pa.array(chunk[name]) for name in SIM_LOG_DTYPE.names})
+        table = pa.table(columns)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self._path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+WRITERS = {
+    "npz": NpzChunkWriter,
+    "parquet": ParquetChunkWriter,
+}
+
+
+def iter_npz_chunks(path):
+    """Kolejne porcje wyników z pliku .npz zapisanego przez NpzChunkWriter."""
+    with np.load(path) as data:
+        for name in sorted(n for n in data.files if n.startswith("chunk_")):
+            yield data[name]
+
+
+def run_batch(scenarios, writer, plant_dt=PLANT_DT, chunk_rows=CHUNK_ROWS, max_in_flight=None, progress=None):
+    """
+    Wszystkie pary (scenariusz, regulator) w puli procesów (krok obiektu
+    scenariusza z scenario_plant_dt, najwyżej plant_dt); wyniki zapisywane
+    porcjami po chunk_rows wierszy w kolejności ukończenia. W pamięci jest
+    najwyżej max_in_flight dzienników naraz (domyślnie 2 na proces).
+    Zwraca liczbę zapisanych wierszy.
+    """
+    tasks = []
+    for i, scenario in enumerate(scenarios):
+        scenario_dt = scenario_plant_dt(scenario, plant_dt)
+        tasks += [(i, writer.controller_names.index(kind), kind, scenario, scenario_dt, params)
+                  for kind, params in scenario["controllers"].items()]
+    pool = get_pool()
+    max_in_flight = max_in_flight or 2 * pool_size()
+    dtype = chunk_dtype()
+
+    pending = {}
+    rows = 0
+    done = 0
+    while tasks or pending:
+        # Dokładanie zadań tylko do limitu - wyniki nie gromadzą się w pamięci
+        while tasks and len(pending) < max_in_flight:
+            i, controller_id, kind, scenario, scenario_dt, params = tasks.pop(0)
+            future = pool.submit(run_controller, kind, scenario["vehicle"], scenario["alpha_segments"],
+                                 scenario["vref_segments"], scenario_dt, params)
+            pending[future] = (i, controller_id)
+
+        finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in finished:
+            i, controller_id = pending.pop(future)
+            log = future.result()
+            for start in range(0, len(log), chunk_rows):
+                part = log[start:start + chunk_rows]
+                chunk = np.empty(len(part), dtype=dtype)
+                chunk["scenario"] = i
+                chunk["controller"] = controller_id
+                for name in SIM_LOG_DTYPE.names:
+                    chunk[name] = part[name]
+                writer.write(chunk)
+            rows += len(log)
+            done += 1
+            if progress is not None:
+                progress(done, done + len(pending) + len(tasks), rows)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Wsadowe symulacje tempomatu (regulator klasyczny i rozmyty).")
+    parser.add_argument("scenarios", help="plik JSON ze scenariuszami")
+    parser.add_argument("output", help="plik wynikowy (.parquet lub .npz)")
+    parser.add_argument("--format", choices=sorted(WRITERS), help="format wyniku (domyślnie z rozszerzenia)")
+    parser.add_argument("--workers", type=int, help="liczba procesów roboczych")
+    parser.add_argument("--plant-dt", type=float, default=PLANT_DT, help="maksymalny krok całkowania modelu pojazdu [s]")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="liczba wierszy w porcji zapisu")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("parquet" if args.output.endswith(".parquet") else "npz")
+    scenarios = load_scenarios(args.scenarios)
+    kinds = sorted({kind for scenario in scenarios for kind in scenario["controllers"]})
+
+    get_pool(args.workers)
+    writer = WRITERS[fmt](args.output, [scenario["name"] for scenario in scenarios], kinds)
+    start = clock.perf_counter()
+
+    def progress(done, total, rows):
+        print(f"\r{done}/{total} symulacji, {rows} wierszy", end="", file=sys.stderr, flush=True)
+
+    try:
+        rows = run_batch(scenarios, writer, args.plant_dt, args.chunk_rows, progress=progress)
+    finally:
+        writer.close()
+    print(f"\nZapisano {rows} wierszy do {args.output} w {clock.perf_counter() - start:.1f} s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
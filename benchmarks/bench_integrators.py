@@ -0,0 +1,57 @@
+"""
+Dokładność względem czasu obliczeń dla metod całkowania simulate_vehicle.
+Odniesienie: metoda adaptive z bardzo małymi tolerancjami na tej samej siatce
+(te same chwile próbkowania regulatora). Błąd to maksymalna różnica
+prędkości [m/s] w chwilach próbkowania regulatora.
+
+Uruchomienie: python benchmarks/bench_integrators.py [--vehicle ciezarowka] [--tp 0.1]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classic_pi import ClassicPIController
+from route_profile import RouteProfile
+from vehicle_model import VEHICLES, INTEGRATORS, simulate_vehicle
+
+ALPHA_SEGMENTS = [{"time": 10, "alpha": 0}, {"time": 10, "alpha": 10}, {"time": 10, "alpha": -5}]
+VREF_SEGMENTS = [{"time": 10, "v": 70}, {"time": 10, "v": 50}, {"time": 10, "v": 60}]
+
+
+def run(vehicle_type, dt, tp, method, **kwargs):
+    route = RouteProfile(ALPHA_SEGMENTS, VREF_SEGMENTS, dt=dt)
+    controller = ClassicPIController(Kp=1, Ti=1)
+    start = time.perf_counter()
+    log = simulate_vehicle(vehicle_type, route,
+                           lambda error, v_curr, t: controller.compute(error, v_curr, t, tp),
+                           controller_dt=tp, method=method, **kwargs)
+    elapsed = time.perf_counter() - start
+    # Wartości w chwilach próbkowania regulatora
+    hold = max(1, int(round(tp / dt)))
+    return log["v"][::hold], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vehicle", default="ciezarowka", choices=list(VEHICLES))
+    parser.add_argument("--tp", type=float, default=0.1)
+    args = parser.parse_args()
+
+    print(f"pojazd={args.vehicle}, tp={args.tp} s")
+    print(f"{'metoda':<10}{'dt [s]':>10}{'błąd max [m/s]':>18}{'czas [ms]':>12}")
+    for method in INTEGRATORS:
+        for dt in [args.tp, args.tp / 2, args.tp / 10, args.tp / 100]:
+            reference, _ = run(args.vehicle, dt, args.tp, "adaptive", rtol=1e-10, atol=1e-12)
+            v, elapsed = run(args.vehicle, dt, args.tp, method)
+            n = min(len(v), len(reference))
+            error = np.max(np.abs(v[:n] - reference[:n]))
+            print(f"{method:<10}{dt:>10.4g}{error:>18.2e}{elapsed * 1e3:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
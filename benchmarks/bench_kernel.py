@@ -0,0 +1,72 @@
+"""
+Porównanie szybkości pętli symulacji z klasycznym PI (kroki na sekundę):
+simulate_vehicle + ClassicPIController, kernel w czystym Pythonie i kernel JIT.
+
+Uruchomienie: python benchmarks/bench_kernel.py [--dt 0.01] [--t-final 300]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classic_pi import ClassicPIController
+from route_profile import RouteProfile
+from vehicle_model import VEHICLES, HAVE_NUMBA, simulate_vehicle, simulate_classic_pi, _classic_pi_kernel
+import vehicle_model
+
+
+def steps_per_second(func, n_steps, repeat=3):
+    best = min(_timed(func) for _ in range(repeat))
+    return n_steps / best
+
+
+def _timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dt", type=float, default=0.01)
+    parser.add_argument("--t-final", type=float, default=300)
+    args = parser.parse_args()
+
+    third = args.t_final / 3
+    route = RouteProfile(
+        [{"time": third, "alpha": 0}, {"time": third, "alpha": 10}, {"time": third, "alpha": -5}],
+        [{"time": third, "v": 70}, {"time": third, "v": 50}, {"time": third, "v": 60}],
+        dt=args.dt,
+    )
+    n_steps = len(route.time) - 1
+    python_kernel = getattr(_classic_pi_kernel, "py_func", _classic_pi_kernel)
+
+    print(f"dt={args.dt}, t_final={args.t_final}, kroków={n_steps}, numba={'tak' if HAVE_NUMBA else 'nie'}")
+    print(f"{'pojazd':<12}{'simulate_vehicle':>18}{'kernel (Python)':>18}{'kernel (JIT)':>18}")
+
+    for vehicle_type in VEHICLES:
+        def scalar():
+            controller = ClassicPIController(Kp=1, Ti=1)
+            simulate_vehicle(vehicle_type, route,
+                             lambda error, v_curr, t: controller.compute(error, v_curr, t, args.dt))
+
+        def kernel_python():
+            vehicle_model._classic_pi_kernel = python_kernel
+            try:
+                simulate_classic_pi(vehicle_type, route, controller_dt=args.dt)
+            finally:
+                vehicle_model._classic_pi_kernel = _classic_pi_kernel
+
+        def kernel_jit():
+            simulate_classic_pi(vehicle_type, route, controller_dt=args.dt)
+
+        kernel_jit()  # kompilacja poza pomiarem
+        row = [steps_per_second(scalar, n_steps, repeat=1), steps_per_second(kernel_python, n_steps)]
+        row.append(steps_per_second(kernel_jit, n_steps) if HAVE_NUMBA else float("nan"))
+        print(f"{vehicle_type:<12}" + "".join(f"{value:>18,.0f}" for value in row))
+
+
+if __name__ == "__main__":
+    main()
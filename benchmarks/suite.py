@@ -0,0 +1,236 @@
+"""
+Zestaw pomiarów wydajności gorących ścieżek z zapisanym punktem odniesienia.
+
+Każdy pomiar to najkrótszy czas jednego wywołania z kilku serii (timeit);
+liczba wywołań w serii jest dobierana tak, by seria trwała co najmniej
+MIN_SERIES_TIME - pojedyncze wywołania są zbyt podatne na szum. Serie są
+wykonywane na przemian dla wszystkich pomiarów, więc okresowe spowolnienie
+maszyny (np. maszyny wirtualnej) nie obejmuje wszystkich serii jednego pomiaru.
+Wyniki są porównywane z benchmarks/baseline.json; pomiar wolniejszy od
+odniesienia więcej niż --threshold razy jest regresją (kod wyjścia 1).
+
+Uruchomienie:
+    python benchmarks/suite.py                  # pomiar i porównanie z odniesieniem
+    python benchmarks/suite.py --save           # zapis wyników jako nowe odniesienie
+    python benchmarks/suite.py -k simulate      # tylko pomiary zawierające "simulate"
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from classic_pi import ClassicPIController
+from control_shading import shading_traces
+from fuzzy_pi import FuzzyPIController
+from metrics import score_runs
+from route_profile import RouteProfile
+from vehicle_model import VEHICLES, fill_forces, simulate_classic_pi, simulate_vehicle
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Domyślny próg regresji: czas bieżący / czas odniesienia
+THRESHOLD = 1.25
+
+# Minimalny czas jednej serii pomiaru [s]
+MIN_SERIES_TIME = 0.2
+
+ALPHA_SEGMENTS = [{"time": 10, "alpha": 0}, {"time": 10, "alpha": 10}, {"time": 10, "alpha": -5}]
+VREF_SEGMENTS = [{"time": 10, "v": 70}, {"time": 10, "v": 50}, {"time": 10, "v": 60}]
+
+# Kroki całkowania dla pomiarów simulate_vehicle [s]
+SIM_DTS = (0.1, 0.01)
+
+# Pomiary: nazwa -> (przygotowanie zwracające mierzoną funkcję, najmniejsza liczba wywołań w serii)
+BENCHMARKS = {}
+
+
+def benchmark(name, number=1):
+    """Rejestruje funkcję przygotowującą pomiar (jej czas nie jest mierzony)."""
+    def register(setup):
+        BENCHMARKS[name] = (setup, number)
+        return setup
+    return register
+
+
+def _classic_func(dt):
+    controller = ClassicPIController(Kp=1, Ti=1)
+    return lambda error, v_curr, t: controller.compute(error, v_curr, t, dt)
+
+
+for _vehicle in VEHICLES:
+    for _dt in SIM_DTS:
+        def _setup(vehicle_type=_vehicle, dt=_dt):
+            route = RouteProfile(ALPHA_SEGMENTS, VREF_SEGMENTS, dt=dt)
+            return lambda: simulate_vehicle(vehicle_type, route, _classic_func(dt))
+        benchmark(f"simulate_vehicle[{_vehicle}-dt{_dt}]")(_setup)
+
+
+@benchmark("simulate_classic_pi[osobowy-dt0.01]", number=10)
+def _():
+    route = RouteProfile(ALPHA_SEGMENTS, VREF_SEGMENTS, dt=0.01)
+    simulate_classic_pi("osobowy", route)  # kompilacja JIT poza pomiarem
+    return lambda: simulate_classic_pi("osobowy", route)
+
+
+@benchmark("ClassicPIController.compute", number=10000)
+def _():
+    controller = ClassicPIController(Kp=1, Ti=1)
+    return lambda: controller.compute(0.5, 20.0, 0.0, 0.01)
+
+
+@benchmark("FuzzyPIController.compute", number=20)
+def _():
+    controller = FuzzyPIController()
+    return lambda: controller.compute(0.2, 20.0, 0.0, 0.1)
+
+
+@benchmark("FuzzyPIController.compute[compiled]", number=10000)
+def _():
+    controller = FuzzyPIController(compiled=True)
+    return lambda: controller.compute(0.2, 20.0, 0.0, 0.1)
+
+
+@benchmark("FuzzyPIController._build_system", number=5)
+def _():
+    controller = FuzzyPIController()
+    return controller._build_system
+
+
+@benchmark("RouteProfile[dt0.01]", number=20)
+def _():
+    return lambda: RouteProfile(ALPHA_SEGMENTS, VREF_SEGMENTS, dt=0.01)
+
+
+@benchmark("RouteProfile.alpha_at+v_ref_at", number=10000)
+def _():
+    route = RouteProfile(ALPHA_SEGMENTS, VREF_SEGMENTS, dt=0.01)
+    return lambda: (route.alpha_at(12.3), route.v_ref_at(12.3))
+
+
+def _classic_log():
+    route = RouteProfile(ALPHA_SEGMENTS, VREF_SEGMENTS, dt=0.01)
+    return route, simulate_classic_pi("osobowy", route)
+
+
+@benchmark("fill_forces", number=100)
+def _():
+    route, log = _classic_log()
+    return lambda: fill_forces(log, VEHICLES["osobowy"], route.alpha)
+
+
+@benchmark("shading_traces", number=20)
+def _():
+    route, log = _classic_log()
+    return lambda: shading_traces(route.time, log["u"], hysteresis=0.01, min_duration=0.2)
+
+
+@benchmark("score_runs", number=20)
+def _():
+    route, log = _classic_log()
+    return lambda: score_runs(route.time, log["v"], log["u"], route.v_ref, route.vref_bounds)
+
+
+@benchmark("update_simulation[figures]", number=5)
+def _():
+    # Budowa wykresów i tabeli wskaźników z gotowych wyników (bez symulacji)
+    import app
+    route = RouteProfile(ALPHA_SEGMENTS, VREF_SEGMENTS, dt=0.01)
+    log = simulate_classic_pi("osobowy", route)
+    results = app.assemble_results(route, {"classic": log, "fuzzy": log}, 0.01)
+    return lambda: (app.render_results(results), app.metrics_table(results))
+
+
+def calibrate(setup, number, min_time=MIN_SERIES_TIME):
+    """
+    (timer, liczba wywołań w serii) - co najmniej number wywołań i co najmniej
+    min_time na serię (kalibracja na czasie wywołania rozgrzewkowego).
+    """
+    timer = timeit.Timer(setup())
+    single = timer.timeit(number=1)  # rozgrzewka i kalibracja
+    return timer, max(number, int(np.ceil(min_time / max(single, 1e-9))))
+
+
+def measure(benchmarks, repeat=5, min_time=MIN_SERIES_TIME):
+    """
+    Najkrótszy czas jednego wywołania [s] dla każdego pomiaru (nazwa -> (setup, number))
+    z repeat serii wykonywanych na przemian. Minimum zamiast mediany - zakłócenia
+    (inne procesy, zegar) tylko wydłużają czas.
+    """
+    timers = {name: calibrate(setup, number, min_time) for name, (setup, number) in benchmarks.items()}
+    best = dict.fromkeys(timers, np.inf)
+    for _ in range(repeat):
+        for name, (timer, number) in timers.items():
+            best[name] = min(best[name], timer.timeit(number=number) / number)
+    return best
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    data = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def format_time(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="pattern", help="tylko pomiary, których nazwa zawiera ten tekst")
+    parser.add_argument("--save", action="store_true", help="zapisz wyniki jako odniesienie")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="dopuszczalny stosunek czasu do odniesienia")
+    parser.add_argument("--repeat", type=int, default=7, help="liczba serii na pomiar")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="plik odniesienia (JSON)")
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.baseline)
+    reference = baseline["results"] if baseline else {}
+    regressions = []
+
+    selected = {name: entry for name, entry in BENCHMARKS.items() if not args.pattern or args.pattern in name}
+    results = measure(selected, args.repeat)
+    print(f"{'pomiar':<42}{'czas':>12}{'odniesienie':>14}{'stosunek':>10}")
+    for name in selected:
+        line = f"{name:<42}{format_time(results[name]):>12}"
+        if name in reference:
+            ratio = results[name] / reference[name]
+            flag = "  REGRESJA" if ratio > args.threshold else ""
+            line += f"{format_time(reference[name]):>14}{ratio:>10.2f}{flag}"
+            if flag:
+                regressions.append(name)
+        print(line)
+
+    if args.save:
+        # Zapis częściowy (-k) aktualizuje tylko zmierzone pozycje
+        save_baseline(dict(reference, **results), args.baseline)
+        print(f"Zapisano odniesienie: {args.baseline}")
+    elif regressions:
+        print(f"Regresje (> {args.threshold:.2f}x): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
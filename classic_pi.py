@@ -1,3 +1,5 @@
+import numpy as np
+
 class ClassicPIController:
     def __init__(self, Kp=1, Ti=1, output_limit=(-1, 1)):
         
@@ -6,6 +8,10 @@ class ClassicPIController:
         self.output_min, self.output_max = output_limit
         self.integral = 0.0
 
+    def reset(self):
+        self.integral = 0.0
+        return self
+
     def compute(self, error, v_curr, t, dt=0.01):
         
         # Dynamiczne obliczenie Ki na podstawie wzoru: Ki = Kp * dt / Ti
@@ -16,4 +22,28 @@ class ClassicPIController:
 
         # Saturacja sygnału wyjściowego
         u = max(min(u, self.output_max), self.output_min)
-        return u
\ No newline at end of file
+        return u
+
+class ClassicPIBatch:
+    """
+    Wektorowa wersja ClassicPIController - N niezależnych regulatorów PI
+    (każdy z własnymi Kp, Ti i okresem próbkowania) liczonych naraz na tablicach.
+    """
+    def __init__(self, Kp=1, Ti=1, output_limit=(-1, 1), n=None):
+
+        self.Kp = np.asarray(Kp, dtype=float)
+        self.Ti = np.asarray(Ti, dtype=float)
+        self.output_min, self.output_max = output_limit
+        shape = np.broadcast_shapes(self.Kp.shape, self.Ti.shape, () if n is None else (n,))
+        self.integral = np.zeros(shape)
+
+    def compute(self, error, v_curr, t, dt=0.01):
+
+        # Ki = Kp * dt / Ti, z tym samym zabezpieczeniem Ti == 0 co w wersji skalarnej
+        safe_Ti = np.where(self.Ti != 0, self.Ti, 1.0)
+        Ki = np.where(self.Ti != 0, self.Kp * dt / safe_Ti, 0.0)
+
+        self.integral = self.integral + error * dt
+        u = self.Kp * error + Ki * self.integral
+
+        return np.clip(u, self.output_min, self.output_max)
@@ -0,0 +1,94 @@
+import numpy as np
+import plotly.graph_objs as go
+
+# Kategorie sygnału sterującego
+BRAKE, HOLD, ACCEL = 0, 1, 2
+
+# Kategoria -> (nazwa w legendzie, kolor tła)
+REGIONS = {
+    ACCEL: ("Przyspieszanie", "rgba(0,255,0,0.1)"),
+    BRAKE: ("Hamowanie", "rgba(255,0,0,0.1)"),
+    HOLD: ("Utrzymanie", "rgba(0,0,255,0.1)"),
+}
+
+
+def _forward_fill(values, missing=-1, default=HOLD):
+    """
+    Zastępuje wartości missing ostatnią wcześniejszą poprawną wzdłuż ostatniej
+    osi (przed pierwszą poprawną: default).
+    """
+    valid = values != missing
+    idx = np.maximum.accumulate(np.where(valid, np.arange(values.shape[-1]), 0), axis=-1)
+    filled = np.take_along_axis(values, idx, axis=-1)
+    filled[(idx == 0) & ~valid[..., :1]] = default
+    return filled
+
+
+def classify_control(u, threshold=0.05, hysteresis=0.0):
+    """
+    Kategoria każdej próbki sterowania: przyspieszanie (u > threshold),
+    hamowanie (u < -threshold), utrzymanie (pozostałe). Z histerezą zmiana
+    kategorii wymaga przekroczenia progu o hysteresis; próbki w paśmie
+    histerezy zachowują poprzednią kategorię. u - tablica 1-D lub (N, T).
+    """
+    u = np.asarray(u, dtype=float)
+    category = np.full(u.shape, -1)
+    category[np.abs(u) <= threshold - hysteresis] = HOLD
+    category[u > threshold + hysteresis] = ACCEL
+    category[u < -(threshold + hysteresis)] = BRAKE
+    return _forward_fill(category)
+
+
+def control_runs(time, u, threshold=0.05, hysteresis=0.0, min_duration=0.0):
+    """
+    Kodowanie długości serii kategorii sterowania: tablice (początek, koniec,
+    kategoria) kolejnych przedziałów. Przedziały krótsze niż min_duration [s]
+    są dołączane do poprzedniego (pierwszy - do następnego).
+    """
+    time = np.asarray(time, dtype=float)
+    category = classify_control(u, threshold, hysteresis)
+
+    change = np.flatnonzero(np.diff(category)) + 1
+    starts = np.concatenate(([0], change))
+    ends = np.concatenate((change, [len(time) - 1]))
+    run_category = category[starts]
+
+    if min_duration > 0 and len(starts) > 1:
+        short = (time[ends] - time[starts]) < min_duration
+        if short.all():
+            short[np.argmax(time[ends] - time[starts])] = False
+        run_category = np.where(short, -1, run_category)
+        # Pierwszy krótki przedział przejmuje kategorię pierwszego długiego
+        first_long = np.argmax(~short)
+        run_category[:first_long] = run_category[first_long]
+        run_category = _forward_fill(run_category)
+
+        keep = np.concatenate(([True], run_category[1:] != run_category[:-1]))
+        starts = starts[keep]
+        run_category = run_category[keep]
+        ends = np.concatenate((starts[1:], [len(time) - 1]))
+
+    return time[starts], time[ends], run_category
+
+
+def shading_traces(time, u, yaxis="y4", **run_kwargs):
+    """
+    Tło wykresu według kategorii sterowania jako jeden wypełniony ślad na
+    kategorię (prostokąty rozdzielone None) zamiast osobnego kształtu na każdy
+    przedział. Ślady leżą na osi yaxis o zakresie [0, 1] i pełnią rolę legendy.
+    """
+    t0, t1, category = control_runs(time, u, **run_kwargs)
+    traces = []
+    for region, (name, color) in REGIONS.items():
+        mask = category == region
+        n = int(mask.sum())
+        x = np.full((n, 6), np.nan)
+        y = np.tile([0.0, 0.0, 1.0, 1.0, 0.0, np.nan], (n, 1))
+        x[:, 0], x[:, 1], x[:, 2], x[:, 3], x[:, 4] = t0[mask], t1[mask], t1[mask], t0[mask], t0[mask]
+        traces.append(go.Scatter(
+            x=x.ravel(), y=y.ravel(),
+            mode="lines", fill="toself", fillcolor=color,
+            line=dict(width=0), name=name, yaxis=yaxis,
+            hoverinfo="skip", showlegend=True,
+        ))
+    return traces
@@ -0,0 +1,90 @@
+import os
+import threading
+
+import numpy as np
+
+from fuzzy_pi import FuzzyPIController, E_SETS, DE_SETS, U_SETS, RULE_TABLE, TERMS, interpolate_surface
+from sim_cache import SimulationCache, scenario_key
+from vehicle_model import controller_errors
+
+# Rozdzielczość siatki powierzchni sterowania w widoku (węzły na oś)
+SURFACE_RESOLUTION = 81
+
+# Powierzchnie sterowania według konfiguracji bazy reguł i siatki; warstwa dyskowa
+# w podkatalogu SIM_CACHE_DIR z własnym limitem [B] (poza zasięgiem przycinania SIM_CACHE)
+SURFACE_CACHE_DISK_BYTES = 16 << 20
+SURFACE_CACHE = SimulationCache(
+    maxsize=8, max_disk_bytes=SURFACE_CACHE_DISK_BYTES,
+    disk_dir=os.path.join(os.environ["SIM_CACHE_DIR"], "surface") if os.environ.get("SIM_CACHE_DIR") else None)
+
+# Regulator (bez tablicowania) do oceny aktywności reguł i skalowania wejść
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def _get_controller():
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = FuzzyPIController()
+    return _controller
+
+
+def surface_key(grid_resolution=SURFACE_RESOLUTION):
+    """Klucz powierzchni: zbiory rozmyte, tabela reguł i siatka."""
+    return scenario_key(task="control_surface", grid_resolution=grid_resolution, e_sets=E_SETS,
+                        de_sets=DE_SETS, u_sets=U_SETS, rules=RULE_TABLE)
+
+
+def control_surface(grid_resolution=SURFACE_RESOLUTION):
+    """
+    Powierzchnia Control(Error, DeltaError) z wnioskowania wsadowego
+    (infer_batch) na siatce, zapamiętywana w SURFACE_CACHE. Zwraca słownik:
+    e_grid, de_grid, surface (n_E, n_dE) i wierzchołki zbiorów e_peaks, de_peaks.
+    """
+    key = surface_key(grid_resolution)
+    result = SURFACE_CACHE.get(key)
+    if result is not None:
+        return result
+
+    controller = _get_controller()
+    e_grid = np.linspace(controller.E_range[0], controller.E_range[1], grid_resolution)
+    de_grid = np.linspace(controller.dE_range[0], controller.dE_range[1], grid_resolution)
+    result = {
+        "e_grid": e_grid,
+        "de_grid": de_grid,
+        "surface": controller.infer_batch(e_grid[:, None], de_grid[None, :]),
+        "e_peaks": np.array([b for _, b, _ in E_SETS], dtype=float),
+        "de_peaks": np.array([b for _, b, _ in DE_SETS], dtype=float),
+    }
+    SURFACE_CACHE.put(key, result)
+    return result
+
+
+def input_trajectory(log, v_ref, controller_dt=None):
+    """
+    Trajektoria wejść regulatora rozmytego odtworzona z dziennika symulacji
+    (błędy w chwilach próbkowania, skalowanie jak w compute, wzmocnienia
+    domyślne jak w aplikacji) - bez ponownego wnioskowania. Zwraca słownik:
+    time, error, d_error (wejścia systemu), control (odczyt z control_surface)
+    i activity (5, 5) - udział reguł RULE_TABLE w sumie stopni aktywacji.
+    """
+    controller = _get_controller()
+    time, errors = controller_errors(log, v_ref, controller_dt)
+    e_in, d_error = controller.scaled_inputs(errors)
+    surface = control_surface()
+
+    firing = controller.rule_firing(e_in, d_error).sum(axis=0)
+    total = firing.sum()
+    return {
+        "time": time,
+        "error": e_in,
+        "d_error": d_error,
+        "control": interpolate_surface(surface["e_grid"], surface["de_grid"], surface["surface"], e_in, d_error),
+        "activity": firing / total if total > 0 else firing,
+    }
+
+
+def rule_labels():
+    """Etykiety reguł (5, 5): "Error/DeltaError → Control"."""
+    return [[f"{e}/{de} → {RULE_TABLE[i][j]}" for j, de in enumerate(TERMS)] for i, e in enumerate(TERMS)]
@@ -0,0 +1,91 @@
+import numpy as np
+
+
+def minmax_indices(y, n_out):
+    """
+    Indeksy punktów zachowanych przez decymację min/max: y dzielone jest na
+    n_out // 2 równych koszyków i z każdego zostaje minimum i maksimum
+    (w kolejności czasu) - piki i doliny przebiegu są zachowane.
+    """
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+
+    n_buckets = max(1, n_out // 2)
+    size = -(-n // n_buckets)  # zaokrąglenie w górę
+    padded = np.pad(y, (0, n_buckets * size - n), mode="edge").reshape(n_buckets, size)
+    offsets = np.arange(n_buckets) * size
+
+    idx = np.concatenate((offsets + padded.argmin(axis=1), offsets + padded.argmax(axis=1), [0, n - 1]))
+    return np.unique(np.minimum(idx, n - 1))
+
+
+def _triangle_argmax(xs, ys, mask, anchor_x, anchor_y, next_x, next_y):
+    """Pozycja w koszyku (wiersze xs, ys) punktu o największym trójkącie z kotwicą i średnią następnego."""
+    area = np.abs((anchor_x[:, None] - next_x[:, None]) * (ys - anchor_y[:, None])
+                  - (anchor_x[:, None] - xs) * (next_y[:, None] - anchor_y[:, None]))
+    area[~mask] = -1.0
+    return area.argmax(axis=1)
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Indeksy punktów wybranych algorytmem Largest-Triangle-Three-Buckets:
+    z każdego koszyka punkt tworzący największy trójkąt z punktem wybranym
+    w poprzednim koszyku i średnią następnego koszyka.
+
+    Wersja wektorowa (wszystkie koszyki naraz, dopełnione do równej długości):
+    punkt poprzedniego koszyka pochodzi z pierwszego przebiegu, w którym
+    kotwicą jest średnia poprzedniego koszyka. W części koszyków wybrany jest
+    inny punkt niż w sekwencyjnym LTTB (o zbliżonym polu trójkąta).
+    """
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # Koszyki [edges[k], edges[k + 1]) między pierwszym i ostatnim punktem
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[:n - 1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(y[:n - 1], edges[:-1]) / counts
+
+    # Średnia następnego koszyka (dla ostatniego - ostatni punkt)
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    offsets = np.arange(counts.max())
+    idx = edges[:-1, None] + offsets[None, :]
+    mask = offsets[None, :] < counts[:, None]
+    idx = np.minimum(idx, n - 2)
+    xs, ys = x[idx], y[idx]
+
+    # Przebieg 1: kotwica - średnia poprzedniego koszyka; przebieg 2: punkt wybrany w przebiegu 1
+    anchor_x = np.concatenate(([x[0]], mean_x[:-1]))
+    anchor_y = np.concatenate(([y[0]], mean_y[:-1]))
+    first = edges[:-1] + _triangle_argmax(xs, ys, mask, anchor_x, anchor_y, next_x, next_y)
+    anchor = np.concatenate(([0], first[:-1]))
+    chosen = edges[:-1] + _triangle_argmax(xs, ys, mask, x[anchor], y[anchor], next_x, next_y)
+
+    return np.concatenate(([0], chosen, [n - 1]))
+
+
+DOWNSAMPLERS = {
+    "minmax": lambda x, y, n_out: minmax_indices(y, n_out),
+    "lttb": lttb_indices,
+}
+
+
+def downsample(x, y, n_out, method="minmax"):
+    """
+    Zwraca (x, y) ograniczone do około n_out punktów wybraną metodą. Przebiegi
+    krótsze niż 2 * n_out są zwracane w całości - decymacja kosztowałaby więcej
+    niż przesłanie dodatkowych punktów.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if len(y) < 2 * n_out:
+        return x, y
+    idx = DOWNSAMPLERS[method](x, y, n_out)
+    return x[idx], y[idx]
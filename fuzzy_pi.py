@@ -1,130 +1,347 @@
 from simpful import *
+import copy
+import threading
+import time
 import numpy as np
 
+# Nazwy zbiorów rozmytych (wspólne dla wszystkich zmiennych)
+TERMS = ["NB", "NS", "ZE", "PS", "PB"]
+
+# Parametry (a, b, c) trójkątnych funkcji przynależności
+E_SETS = [(-0.5, -0.5, -0.2), (-0.5, -0.2, 0), (-0.2, 0, 0.2), (0, 0.2, 0.5), (0.2, 0.5, 0.5)]
+DE_SETS = [(-5, -5, -2), (-5, -2, 0), (-2, 0, 2), (0, 2, 5), (2, 5, 5)]
+U_SETS = [(-1, -1, -0.5), (-1, -0.5, 0), (-0.5, 0, 0.5), (0, 0.5, 1), (0.5, 1, 1)]
+
+# Tabela reguł: wiersze - Error, kolumny - DeltaError, wartości - Control
+#
+# |      | NB  | NS  | ZE  | PS  | PB  |
+# |------|-----|-----|-----|-----|-----|
+# | NB   | NB  | NB  | NB  | NS  | ZE  |
+# | NS   | NB  | NB  | NS  | ZE  | PS  |
+# | ZE   | NB  | NS  | ZE  | PS  | PB  |
+# | PS   | NS  | ZE  | PS  | PB  | PB  |
+# | PB   | ZE  | PS  | PB  | PB  | PB  |
+RULE_TABLE = [
+    ["NB", "NB", "NB", "NS", "ZE"],
+    ["NB", "NB", "NS", "ZE", "PS"],
+    ["NB", "NS", "ZE", "PS", "PB"],
+    ["NS", "ZE", "PS", "PB", "PB"],
+    ["ZE", "PS", "PB", "PB", "PB"],
+]
+
+# Liczba punktów całkowania przy defuzyfikacji (jak domyślnie w simpful)
+MAMDANI_SUBDIVISIONS = 1000
+
+# Domyślna siatka powierzchni sterowania w trybie compiled. Krawędzie min(mu_E, mu_dE)
+# nie leżą na liniach siatki, więc błąd interpolacji maleje jak 1/n
+# (estimate_max_error: 41 - 0.040, 201 - 0.0069 przy zakresie sterowania 2)
+SURFACE_GRID = 201
+
+
+def triangular_mf(x, params):
+    """
+    Trójkątna funkcja przynależności zgodna z simpful (Triangular_MF),
+    params[..., :] = (a, b, c); zdegenerowane zbocza (a == b lub b == c)
+    dają nasycenie do 1.
+    """
+    a, b, c = params[..., 0], params[..., 1], params[..., 2]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        left = np.where(a == b, 1.0, (x - a) / (b - a))
+        right = np.where(b == c, 1.0, 1.0 - (x - b) / (c - b))
+    return np.clip(np.where(x < b, left, right), 0.0, 1.0)
+
+
+def interpolate_surface(e_grid, de_grid, surface, error, d_error):
+    """
+    Interpolacja dwuliniowa powierzchni sterowania na równomiernej siatce.
+    Wejścia spoza siatki są przycinane do jej brzegów (funkcje przynależności
+    skrajnych zbiorów i tak nasycają się poza uniwersum).
+    """
+    e0, e1 = e_grid[0], e_grid[-1]
+    de0, de1 = de_grid[0], de_grid[-1]
+    n_e, n_de = len(e_grid), len(de_grid)
+
+    x = (np.clip(error, e0, e1) - e0) / (e1 - e0) * (n_e - 1)
+    y = (np.clip(d_error, de0, de1) - de0) / (de1 - de0) * (n_de - 1)
+    i = np.minimum(np.floor(x).astype(int), n_e - 2)
+    j = np.minimum(np.floor(y).astype(int), n_de - 2)
+    fx = x - i
+    fy = y - j
+
+    return ((1 - fx) * (1 - fy) * surface[i, j] + fx * (1 - fy) * surface[i + 1, j]
+            + (1 - fx) * fy * surface[i, j + 1] + fx * fy * surface[i + 1, j + 1])
+
+
+# Wzmocnienia skalujące regulatora rozmytego i ich wartości domyślne
+SCALING_GAINS = {"Ke": 1.0, "Kde": 1.0, "Ku": 1.0, "integral_weight": 0.1}
+
+
 class FuzzyPIController:
-    def __init__(self):
+    def __init__(self, compiled=False, grid_resolution=SURFACE_GRID, Ke=1.0, Kde=1.0, Ku=1.0, integral_weight=0.1):
+        """
+        compiled=True - zamiast wnioskowania simpful w każdym kroku, powierzchnia
+        sterowania jest liczona raz na siatce grid_resolution (int lub para
+        (n_E, n_dE)) i odczytywana interpolacją dwuliniową.
+
+        Ke, Kde - skalowanie błędu i jego zmiany do uniwersów zbiorów rozmytych,
+        Ku - skalowanie wyjścia, integral_weight - waga składnika całkującego
+        integral_weight * tanh(całka / 10). Wartości domyślne odpowiadają
+        samochodowi osobowemu.
+        """
+        self.Ke, self.Kde, self.Ku = Ke, Kde, Ku
+        self.integral_weight = integral_weight
         self._build_system()
         self.prev_error = 0.0
         self.integral = 0.0
         self.last_d_error = 0.0
 
+        self.compiled = compiled
+        self.surface = None
+        self.max_error = None
+        if compiled:
+            self._build_surface(grid_resolution)
+
+    def reset(self):
+        """Zeruje stan dynamiczny regulatora (bez przebudowy systemu rozmytego)."""
+        self.prev_error = 0.0
+        self.integral = 0.0
+        self.last_d_error = 0.0
+        return self
+
     def _build_system(self):
         self.FS = FuzzySystem()
 
         E_range = [-0.5, 0.5]  # błąd prędkości (m/s)
         dE_range = [-5, 5]  # zmiana błędu (m/s)
         U_range = [-1, 1] # sygnał sterujący (normalizowany)
+        self.E_range, self.dE_range, self.U_range = E_range, dE_range, U_range
 
         E = LinguisticVariable([
-            FuzzySet(function=Triangular_MF(a=-0.5, b=-0.5, c=-0.2), term="NB"),
-            FuzzySet(function=Triangular_MF(a=-0.5, b=-0.2, c=0), term="NS"),
-            FuzzySet(function=Triangular_MF(a=-0.2, b=0, c=0.2), term="ZE"),
-            FuzzySet(function=Triangular_MF(a=0, b=0.2, c=0.5), term="PS"),
-            FuzzySet(function=Triangular_MF(a=0.2, b=0.5, c=0.5), term="PB"),
+            FuzzySet(function=Triangular_MF(a=a, b=b, c=c), term=term)
+            for term, (a, b, c) in zip(TERMS, E_SETS)
         ], universe_of_discourse=E_range, concept="Error")
 
         dE = LinguisticVariable([
-            FuzzySet(function=Triangular_MF(a=-5, b=-5, c=-2), term="NB"),
-            FuzzySet(function=Triangular_MF(a=-5, b=-2, c=0), term="NS"),
-            FuzzySet(function=Triangular_MF(a=-2, b=0, c=2), term="ZE"),
-            FuzzySet(function=Triangular_MF(a=0, b=2, c=5), term="PS"),
-            FuzzySet(function=Triangular_MF(a=2, b=5, c=5), term="PB"),
+            FuzzySet(function=Triangular_MF(a=a, b=b, c=c), term=term)
+            for term, (a, b, c) in zip(TERMS, DE_SETS)
         ], universe_of_discourse=dE_range, concept="DeltaError")
 
         U = LinguisticVariable([
-            FuzzySet(function=Triangular_MF(a=-1, b=-1, c=-0.5), term="NB"),
-            FuzzySet(function=Triangular_MF(a=-1, b=-0.5, c=0), term="NS"),
-            FuzzySet(function=Triangular_MF(a=-0.5, b=0, c=0.5), term="ZE"),
-            FuzzySet(function=Triangular_MF(a=0, b=0.5, c=1), term="PS"),
-            FuzzySet(function=Triangular_MF(a=0.5, b=1, c=1), term="PB"),
+            FuzzySet(function=Triangular_MF(a=a, b=b, c=c), term=term)
+            for term, (a, b, c) in zip(TERMS, U_SETS)
         ], universe_of_discourse=U_range, concept="Control")
 
         self.FS.add_linguistic_variable("Error", E)
         self.FS.add_linguistic_variable("DeltaError", dE)
         self.FS.add_linguistic_variable("Control", U)
 
-        # tabela reguł:
-        # 
-        # |      | NB  | NS  | ZE  | PS  | PB  |
-        # |------|-----|-----|-----|-----|-----|
-        # | NB   | NB  | NB  | NS  | ZE  | ZE  |
-        # | NS   | NB  | NS  | NS  | ZE  | PS  |
-        # | ZE   | NS  | NS  | ZE  | PS  | PS  |
-        # | PS   | ZE  | PS  | PS  | PB  | PB  |
-        # | PB   | PS  | PS  | PB  | PB  | PB  |
-
-
         rules = [
-        # Pierwszy wiersz - Error = NB
-        "IF (Error IS NB) AND (DeltaError IS NB) THEN (Control IS NB)",
-        "IF (Error IS NB) AND (DeltaError IS NS) THEN (Control IS NB)",
-        "IF (Error IS NB) AND (DeltaError IS ZE) THEN (Control IS NB)",
-        "IF (Error IS NB) AND (DeltaError IS PS) THEN (Control IS NS)",
-        "IF (Error IS NB) AND (DeltaError IS PB) THEN (Control IS ZE)",
-        
-        # Drugi wiersz - Error = NS
-        "IF (Error IS NS) AND (DeltaError IS NB) THEN (Control IS NB)",
-        "IF (Error IS NS) AND (DeltaError IS NS) THEN (Control IS NB)",
-        "IF (Error IS NS) AND (DeltaError IS ZE) THEN (Control IS NS)",
-        "IF (Error IS NS) AND (DeltaError IS PS) THEN (Control IS ZE)",
-        "IF (Error IS NS) AND (DeltaError IS PB) THEN (Control IS PS)",
-        
-        # Trzeci wiersz - Error = ZE
-        "IF (Error IS ZE) AND (DeltaError IS NB) THEN (Control IS NB)",
-        "IF (Error IS ZE) AND (DeltaError IS NS) THEN (Control IS NS)",
-        "IF (Error IS ZE) AND (DeltaError IS ZE) THEN (Control IS ZE)",
-        "IF (Error IS ZE) AND (DeltaError IS PS) THEN (Control IS PS)",
-        "IF (Error IS ZE) AND (DeltaError IS PB) THEN (Control IS PB)",
-        
-        # Czwarty wiersz - Error = PS
-        "IF (Error IS PS) AND (DeltaError IS NB) THEN (Control IS NS)",
-        "IF (Error IS PS) AND (DeltaError IS NS) THEN (Control IS ZE)",
-        "IF (Error IS PS) AND (DeltaError IS ZE) THEN (Control IS PS)",
-        "IF (Error IS PS) AND (DeltaError IS PS) THEN (Control IS PB)",
-        "IF (Error IS PS) AND (DeltaError IS PB) THEN (Control IS PB)",
-        
-        # Piąty wiersz - Error = PB
-        "IF (Error IS PB) AND (DeltaError IS NB) THEN (Control IS ZE)",
-        "IF (Error IS PB) AND (DeltaError IS NS) THEN (Control IS PS)",
-        "IF (Error IS PB) AND (DeltaError IS ZE) THEN (Control IS PB)",
-        "IF (Error IS PB) AND (DeltaError IS PS) THEN (Control IS PB)",
-        "IF (Error IS PB) AND (DeltaError IS PB) THEN (Control IS PB)"
-    ]
+            f"IF (Error IS {e_term}) AND (DeltaError IS {de_term}) THEN (Control IS {RULE_TABLE[i][j]})"
+            for i, e_term in enumerate(TERMS)
+            for j, de_term in enumerate(TERMS)
+        ]
 
         self.FS.add_rules(rules)
 
+        # Ta sama baza reguł w postaci tablic dla wnioskowania w NumPy
+        self._e_params = np.array(E_SETS, dtype=float)
+        self._de_params = np.array(DE_SETS, dtype=float)
+        self._u_points = np.linspace(U_range[0], U_range[1], MAMDANI_SUBDIVISIONS)
+        self._u_mf = triangular_mf(self._u_points[None, :], np.array(U_SETS, dtype=float)[:, None, :])
+        rule_idx = np.array([[TERMS.index(term) for term in row] for row in RULE_TABLE])
+        self._rule_onehot = rule_idx[:, :, None] == np.arange(len(TERMS))
+
+    def rule_firing(self, errors, d_errors):
+        """Stopnie aktywacji reguł min(mu_E, mu_dE) dla tablic (N,) - kształt (N, 5, 5) jak RULE_TABLE."""
+        mu_e = triangular_mf(np.asarray(errors, dtype=float)[:, None], self._e_params)  # (N, 5)
+        mu_de = triangular_mf(np.asarray(d_errors, dtype=float)[:, None], self._de_params)  # (N, 5)
+        return np.minimum(mu_e[:, :, None], mu_de[:, None, :])
+
+    def scaled_inputs(self, errors):
+        """
+        Wejścia systemu rozmytego (Error, DeltaError) dla kolejnych błędów
+        podanych w chwilach próbkowania - jak w compute() od stanu po reset().
+        """
+        errors = np.asarray(errors, dtype=float)
+        d_errors = np.diff(errors, prepend=0.0)
+        return self.Ke * errors, np.clip(self.Kde * d_errors, self.dE_range[0], self.dE_range[1])
+
+    def infer_batch(self, errors, d_errors, chunk_size=1024):
+        """
+        Wnioskowanie Mamdaniego (min/max, środek ciężkości) w NumPy dla tablic
+        par (error, d_error). Odtwarza wynik simpful: te same funkcje
+        przynależności i ta sama dyskretyzacja uniwersum wyjścia.
+        """
+        errors, d_errors = np.broadcast_arrays(np.asarray(errors, dtype=float),
+                                               np.asarray(d_errors, dtype=float))
+        shape = errors.shape
+        errors, d_errors = errors.ravel(), d_errors.ravel()
+        out = np.empty(errors.size)
+
+        for start in range(0, errors.size, chunk_size):
+            sl = slice(start, start + chunk_size)
+            firing = self.rule_firing(errors[sl], d_errors[sl])  # (N, 5, 5)
+            # Stopień aktywacji każdego zbioru wyjściowego (max po regułach)
+            cuts = np.max(np.where(self._rule_onehot, firing[..., None], 0.0), axis=(1, 2))  # (N, 5)
+            aggregated = np.max(np.minimum(self._u_mf[None, :, :], cuts[:, :, None]), axis=1)  # (N, S)
+            total = aggregated.sum(axis=1)
+            weighted = aggregated @ self._u_points
+            out[sl] = np.divide(weighted, total, out=np.zeros_like(total), where=total != 0)
+
+        return out.reshape(shape)
+
+    def validate_native(self, n_samples=50, seed=0):
+        """Maksymalna różnica infer_batch względem simpful na losowych punktach."""
+        rng = np.random.default_rng(seed)
+        e = rng.uniform(self.E_range[0], self.E_range[1], n_samples)
+        de = rng.uniform(self.dE_range[0], self.dE_range[1], n_samples)
+        exact = np.array([self._infer_exact(ei, dei) for ei, dei in zip(e, de)])
+        return float(np.max(np.abs(self.infer_batch(e, de) - exact)))
+
+    def _infer_exact(self, error, d_error):
+        """Pojedyncze wnioskowanie Mamdaniego w simpful."""
+        self.FS.set_variable("Error", error)
+        self.FS.set_variable("DeltaError", d_error)
+        return float(self.FS.inference()["Control"])
+
+    def _build_surface(self, grid_resolution):
+        """Tablicuje powierzchnię sterowania Control(Error, DeltaError)."""
+        if np.isscalar(grid_resolution):
+            grid_resolution = (grid_resolution, grid_resolution)
+        n_e, n_de = grid_resolution
+        if n_e < 2 or n_de < 2:
+            raise ValueError("Siatka powierzchni sterowania musi mieć co najmniej 2x2 węzły")
+
+        self.e_grid = np.linspace(self.E_range[0], self.E_range[1], n_e)
+        self.de_grid = np.linspace(self.dE_range[0], self.dE_range[1], n_de)
+        self.surface = self.infer_batch(self.e_grid[:, None], self.de_grid[None, :])
+
+    def lookup(self, error, d_error):
+        """Odczyt powierzchni sterowania (skalar lub tablice)."""
+        return interpolate_surface(self.e_grid, self.de_grid, self.surface, error, d_error)
+
+    def estimate_max_error(self, use_simpful=True):
+        """
+        Maksymalny błąd bezwzględny tablicy względem dokładnego wnioskowania,
+        mierzony w środkach komórek siatki (tam interpolacja jest najsłabsza).
+        Z use_simpful=True kosztowne - jedno wnioskowanie simpful na komórkę;
+        use_simpful=False porównuje z infer_batch (zgodnym z simpful).
+        """
+        e_mid = 0.5 * (self.e_grid[:-1] + self.e_grid[1:])[:, None]
+        de_mid = 0.5 * (self.de_grid[:-1] + self.de_grid[1:])[None, :]
+        if use_simpful:
+            exact = np.array([[self._infer_exact(e, de) for de in de_mid[0]] for e in e_mid[:, 0]])
+        else:
+            exact = self.infer_batch(e_mid, de_mid)
+        self.max_error = float(np.max(np.abs(self.lookup(e_mid, de_mid) - exact)))
+        return self.max_error
+
     def compute(self, error, v_curr, t, dt=0.1):
         self.last_d_error = (error - self.prev_error)
         self.prev_error = error
 
-        # Filtracja d_error
-        d_error = np.clip(self.last_d_error, -5, 5)
+        # Skalowanie wejść do uniwersów i filtracja d_error
+        e_in = self.Ke * error
+        d_error = np.clip(self.Kde * self.last_d_error, self.dE_range[0], self.dE_range[1])
 
         # Uaktualnienie składnika całkującego
         self.integral += error * dt
 
-        self.FS.set_variable("Error", error)
-        self.FS.set_variable("DeltaError", d_error)
+        if self.compiled:
+            u = self.lookup(e_in, d_error)
+        else:
+            u = self._infer_exact(e_in, d_error)
 
-        output = self.FS.inference()
-        u = output["Control"]
-
-        # Dodanie lekkiego wpływu całki 
-        u += 0.1 * np.tanh(self.integral / 10.0)  # ograniczamy wpływ
+        # Skalowanie wyjścia i dodanie lekkiego wpływu całki
+        u = self.Ku * u + self.integral_weight * np.tanh(self.integral / 10.0)  # ograniczamy wpływ
         u = np.clip(u, -1, 1)
 
         #print(f"error={error:.2f}, d_error={d_error:.2f}, output={u:.2f}")
         return u
-    
-
-
-    def segment_control_colors(self, time, control_values):
-        segments = []
-        colors = ["rgba(0,255,0,0.1)" if u > 0.05 else "rgba(255,0,0,0.1)" if u < -0.05 else "rgba(0,0,255,0.1)" for u in control_values]
-        start_idx = 0
-        for i in range(1, len(time)):
-            if colors[i] != colors[start_idx]:
-                segments.append((time[start_idx], time[i], colors[start_idx]))
-                start_idx = i
-        segments.append((time[start_idx], time[-1], colors[start_idx]))
-        return segments
\ No newline at end of file
+
+
+class FuzzyPIBatch:
+    """
+    Wersja tablicowa FuzzyPIController (tryb compiled) dla N regulatorów
+    z własnymi wzmocnieniami skalującymi, liczona naraz na wspólnej
+    powierzchni sterowania - bez simpful w pętli symulacji.
+    controller - skompilowany FuzzyPIController, z którego brana jest powierzchnia.
+    """
+    def __init__(self, Ke=1.0, Kde=1.0, Ku=1.0, integral_weight=0.1, n=None, controller=None):
+        if controller is None or not controller.compiled:
+            controller = FuzzyPIController(compiled=True)
+        self.e_grid, self.de_grid, self.surface = controller.e_grid, controller.de_grid, controller.surface
+        self.dE_range = controller.dE_range
+
+        self.Ke = np.asarray(Ke, dtype=float)
+        self.Kde = np.asarray(Kde, dtype=float)
+        self.Ku = np.asarray(Ku, dtype=float)
+        self.integral_weight = np.asarray(integral_weight, dtype=float)
+        shape = np.broadcast_shapes(self.Ke.shape, self.Kde.shape, self.Ku.shape,
+                                    self.integral_weight.shape, () if n is None else (n,))
+        self.prev_error = np.zeros(shape)
+        self.integral = np.zeros(shape)
+
+    def compute(self, error, v_curr, t, dt=0.1):
+        d_error = np.clip(self.Kde * (error - self.prev_error), self.dE_range[0], self.dE_range[1])
+        self.prev_error = error
+        self.integral = self.integral + error * dt
+
+        u = interpolate_surface(self.e_grid, self.de_grid, self.surface, self.Ke * error, d_error)
+        u = self.Ku * u + self.integral_weight * np.tanh(self.integral / 10.0)
+        return np.clip(u, -1, 1)
+
+
+class FuzzyControllerPool:
+    """
+    Pula gotowych regulatorów rozmytych. System rozmyty jest budowany raz
+    (prototyp); kolejne egzemplarze to kopie prototypu, a zwrócone do puli
+    są ponownie wydawane po reset(). Mierzy koszt budowy i resetu.
+    """
+    def __init__(self, **controller_kwargs):
+        start = time.perf_counter()
+        self._prototype = FuzzyPIController(**controller_kwargs)
+        self.build_time = time.perf_counter() - start
+
+        self._free = []
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.copy_time = 0.0
+        self.reset_time = 0.0
+
+    def acquire(self):
+        """Wydaje regulator z wyzerowanym stanem."""
+        with self._lock:
+            controller = self._free.pop() if self._free else None
+
+        if controller is None:
+            start = time.perf_counter()
+            controller = copy.deepcopy(self._prototype)
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.created += 1
+                self.copy_time += elapsed
+            return controller.reset()
+
+        start = time.perf_counter()
+        controller.reset()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.reused += 1
+            self.reset_time += elapsed
+        return controller
+
+    def release(self, controller):
+        with self._lock:
+            self._free.append(controller)
+
+    def stats(self):
+        """Koszt budowy systemu względem kopii i resetu [s]."""
+        return {
+            "build_time": self.build_time,
+            "created": self.created,
+            "mean_copy_time": self.copy_time / self.created if self.created else 0.0,
+            "reused": self.reused,
+            "mean_reset_time": self.reset_time / self.reused if self.reused else 0.0,
+        }
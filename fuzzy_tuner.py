@@ -0,0 +1,153 @@
+import time as clock
+
+import numpy as np
+from scipy.optimize import minimize
+
+from fuzzy_pi import FuzzyPIController, FuzzyPIBatch, SCALING_GAINS
+from metrics import score_runs
+from pi_tuner import COSTS, BudgetExceeded, evaluate_candidates
+from route_profile import RouteProfile
+from vehicle_model import VEHICLES, simulate_batch
+
+# Zakresy wzmocnień skalujących (przeszukiwane w skali logarytmicznej),
+# w kolejności kluczy SCALING_GAINS
+GAIN_BOUNDS = {
+    "Ke": (0.1, 10.0),
+    "Kde": (0.05, 10.0),
+    "Ku": (0.2, 1.5),
+    "integral_weight": (0.01, 1.0),
+}
+
+# Regulator skompilowany raz na proces - źródło powierzchni sterowania dla FuzzyPIBatch
+_surface_controller = None
+
+
+def surface_controller():
+    """Skompilowany FuzzyPIController tego procesu (powierzchnia sterowania dla FuzzyPIBatch)."""
+    global _surface_controller
+    if _surface_controller is None:
+        _surface_controller = FuzzyPIController(compiled=True)
+    return _surface_controller
+
+
+def simulate_fuzzy_gains(gains, vehicle_type, route, controller_dt=0.1):
+    """
+    Symulacja partii regulatorów rozmytych o wzmocnieniach gains (N, 4)
+    w kolejności SCALING_GAINS. Zwraca (time, v, u) jak simulate_batch.
+    """
+    gains = np.asarray(gains, dtype=float)
+    batch = FuzzyPIBatch(*gains.T, controller=surface_controller())
+
+    def controller_func(error, v_curr, t):
+        return batch.compute(error, v_curr, t, controller_dt)
+
+    return simulate_batch([vehicle_type] * len(gains), route.alpha_deg, route.v_ref, controller_func,
+                          t_final=route.t_final, dt=route.dt, controller_dt=controller_dt)
+
+
+def evaluate_fuzzy_gains(gains, vehicle_type, alpha_segments, vref_segments,
+                         plant_dt=0.01, controller_dt=0.1, cost="itae_effort", effort_weight=1.0):
+    """Koszt dla partii wzmocnień gains (N, 4) - szybka ścieżka bez simpful. Zwraca tablicę (N,)."""
+    route = RouteProfile(alpha_segments, vref_segments, dt=plant_dt)
+    time, v, u = simulate_fuzzy_gains(gains, vehicle_type, route, controller_dt)
+    return COSTS[cost](score_runs(time, v, u, route.v_ref, route.vref_bounds), effort_weight)
+
+
+def tune_fuzzy(vehicle_type, alpha_segments, vref_segments, n_samples=128, seed=0,
+               cost="itae_effort", effort_weight=1.0, plant_dt=0.01, controller_dt=0.1,
+               refine=True, time_budget=None, progress=None):
+    """
+    Dobór wzmocnień skalujących regulatora rozmytego (Ke, Kde, Ku, integral_weight)
+    dla pojazdu i trasy.
+
+    Etap 1: n_samples losowych zestawów (log-równomiernie w GAIN_BOUNDS, plus
+    wartości domyślne) liczonych partiami w puli procesów. Etap 2 (refine):
+    Nelder-Mead w skali logarytmicznej od najlepszego zestawu. time_budget
+    i progress jak w pi_tuner.tune_pi.
+
+    Zwraca słownik: gains, cost, default_cost (koszt wzmocnień domyślnych),
+    metrics (score_runs dla najlepszych wzmocnień), evaluations, elapsed,
+    evals_per_second, completed.
+    """
+    start = clock.perf_counter()
+    deadline = None if time_budget is None else start + time_budget
+    names = list(SCALING_GAINS)
+    lower = np.log([GAIN_BOUNDS[name][0] for name in names])
+    upper = np.log([GAIN_BOUNDS[name][1] for name in names])
+
+    rng = np.random.default_rng(seed)
+    candidates = np.exp(rng.uniform(lower, upper, (n_samples, len(names))))
+    candidates = np.vstack(([SCALING_GAINS[name] for name in names], candidates))
+
+    kwargs = dict(vehicle_type=vehicle_type, alpha_segments=alpha_segments, vref_segments=vref_segments,
+                  plant_dt=plant_dt, controller_dt=controller_dt, cost=cost, effort_weight=effort_weight)
+    costs, evaluations, completed = evaluate_candidates(evaluate_fuzzy_gains, candidates, kwargs,
+                                                        deadline, progress, stage="sample")
+    if evaluations == 0:
+        return {"gains": None, "cost": np.nan, "default_cost": np.nan, "metrics": None, "evaluations": 0,
+                "elapsed": clock.perf_counter() - start, "evals_per_second": 0.0, "completed": False}
+
+    best_index = int(np.nanargmin(costs))
+    best = {"x": candidates[best_index], "cost": float(costs[best_index])}
+    route = RouteProfile(alpha_segments, vref_segments, dt=plant_dt)
+
+    if refine and completed:
+        sampled = evaluations
+
+        def objective(x):
+            nonlocal evaluations
+            if deadline is not None and clock.perf_counter() > deadline:
+                raise BudgetExceeded
+            gains = np.exp(np.clip(x, lower, upper))
+            time, v, u = simulate_fuzzy_gains(gains[None, :], vehicle_type, route, controller_dt)
+            value = float(COSTS[cost](score_runs(time, v, u, route.v_ref, route.vref_bounds), effort_weight)[0])
+            evaluations += 1
+            if value < best["cost"]:
+                best.update(x=gains, cost=value)
+            if progress is not None:
+                progress("refine", evaluations - sampled, None, best["cost"])
+            return value
+
+        try:
+            minimize(objective, np.log(best["x"]), method="Nelder-Mead",
+                     options={"xatol": 1e-3, "fatol": 1e-4, "maxfev": 150})
+        except BudgetExceeded:
+            completed = False
+
+    # Wskaźniki jakości dla najlepszych wzmocnień
+    time, v, u = simulate_fuzzy_gains(best["x"][None, :], vehicle_type, route, controller_dt)
+    scores = score_runs(time, v[0], u[0], route.v_ref, route.vref_bounds)
+
+    elapsed = clock.perf_counter() - start
+    return {
+        "gains": dict(zip(names, (float(x) for x in best["x"]))),
+        "cost": best["cost"],
+        "default_cost": float(costs[0]),
+        "metrics": scores,
+        "evaluations": evaluations,
+        "elapsed": elapsed,
+        "evals_per_second": evaluations / elapsed,
+        "completed": completed,
+    }
+
+
+def tune_fuzzy_per_vehicle(alpha_segments, vref_segments, vehicle_types=None, **kwargs):
+    """tune_fuzzy dla każdego typu pojazdu (domyślnie wszystkich z VEHICLES): typ -> wynik."""
+    return {vehicle_type: tune_fuzzy(vehicle_type, alpha_segments, vref_segments, **kwargs)
+            for vehicle_type in (vehicle_types or VEHICLES)}
+
+
+if __name__ == "__main__":
+    # Trasa domyślna z aplikacji
+    alpha_segments = [{"time": 10, "alpha": 0}, {"time": 10, "alpha": 10}, {"time": 10, "alpha": -5}]
+    vref_segments = [{"time": 10, "v": 70}, {"time": 10, "v": 50}, {"time": 10, "v": 60}]
+
+    for vehicle_type, result in tune_fuzzy_per_vehicle(alpha_segments, vref_segments, time_budget=60).items():
+        gains = ", ".join(f"{name}={value:.3f}" for name, value in result["gains"].items())
+        metrics = result["metrics"]
+        print(f"{vehicle_type:>11}: {gains}")
+        print(f"{'':>11}  koszt {result['cost']:.1f} (domyślne {result['default_cost']:.1f}), "
+              f"IAE {metrics['IAE']:.1f}, ITAE {metrics['ITAE']:.1f}, energia {metrics['effort']:.1f}, "
+              f"przełączenia {metrics['switches']}")
+        print(f"{'':>11}  {result['evaluations']} ewaluacji w {result['elapsed']:.1f} s "
+              f"({result['evals_per_second']:.1f}/s)")
@@ -0,0 +1,170 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Prefiks nazw metryk w eksporcie Prometheus
+PREFIX = "tempomat"
+
+# Granice koszyków histogramów czasu [s]
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+COUNTER, HISTOGRAM = "counter", "histogram"
+
+
+def _label_key(labels):
+    return tuple(sorted((str(k), str(v)) for k, v in labels.items()))
+
+
+class Registry:
+    """Liczniki i histogramy w pamięci procesu, eksportowane w formacie tekstowym Prometheus."""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1.0, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    hist["buckets"][i] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+
+    def exposition(self):
+        """Wszystkie metryki w formacie tekstowym Prometheus (text/plain; version=0.0.4)."""
+        def fmt_labels(labels, extra=()):
+            items = list(labels) + list(extra)
+            return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}" if items else ""
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, dict(hist, buckets=list(hist["buckets"])))
+                                for key, hist in self._histograms.items())
+
+        lines = []
+        for name in sorted({name for (name, _), _ in counters}):
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            lines += [f"{PREFIX}_{name}_total{fmt_labels(labels)} {value:g}"
+                      for (n, labels), value in counters if n == name]
+        for name in sorted({name for (name, _), _ in histograms}):
+            lines.append(f"# TYPE {PREFIX}_{name} histogram")
+            for (n, labels), hist in histograms:
+                if n != name:
+                    continue
+                for bound, count in zip(self.buckets, hist["buckets"]):
+                    lines.append(f"{PREFIX}_{name}_bucket{fmt_labels(labels, [('le', f'{bound:g}')])} {count}")
+                lines.append(f"{PREFIX}_{name}_bucket{fmt_labels(labels, [('le', '+Inf')])} {hist['count']}")
+                lines.append(f"{PREFIX}_{name}_sum{fmt_labels(labels)} {hist['sum']:g}")
+                lines.append(f"{PREFIX}_{name}_count{fmt_labels(labels)} {hist['count']}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Aktywne zbieranie zapisów dla bieżącego wątku (trace)
+_local = threading.local()
+
+
+def _emit(kind, name, value, labels):
+    if kind == COUNTER:
+        REGISTRY.inc(name, value, **labels)
+    else:
+        REGISTRY.observe(name, value, **labels)
+    for records in getattr(_local, "traces", ()):
+        records.append((kind, name, labels, value))
+
+
+def count(name, value=1.0, **labels):
+    """Zwiększa licznik name o value."""
+    _emit(COUNTER, name, value, labels)
+
+
+@contextmanager
+def span(name, **labels):
+    """Mierzy czas bloku jako histogram span_seconds{span=name, ...}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _emit(HISTOGRAM, "span_seconds", time.perf_counter() - start, dict(labels, span=name))
+
+
+@contextmanager
+def trace():
+    """
+    Zbiera zapisy (rodzaj, nazwa, etykiety, wartość) z bieżącego wątku -
+    np. rozkład czasu jednego żądania albo metryki do przekazania z procesu
+    roboczego (replay).
+    """
+    records = []
+    if not hasattr(_local, "traces"):
+        _local.traces = []
+    _local.traces.append(records)
+    try:
+        yield records
+    finally:
+        _local.traces.remove(records)
+
+
+def replay(records):
+    """Dodaje zapisy zebrane gdzie indziej (np. w procesie roboczym) do rejestru i aktywnych trace."""
+    for kind, name, labels, value in records:
+        _emit(kind, name, value, labels)
+
+
+class ControllerTimer:
+    """
+    Opakowanie controller_func zliczające wywołania i ich łączny czas;
+    flush() zapisuje liczniki controller_calls i controller_call_seconds.
+    """
+    def __init__(self, controller_func, controller):
+        self.controller_func = controller_func
+        self.controller = controller
+        self.calls = 0
+        self.seconds = 0.0
+
+    def __call__(self, error, v_curr, t):
+        start = time.perf_counter()
+        u = self.controller_func(error, v_curr, t)
+        self.seconds += time.perf_counter() - start
+        self.calls += 1
+        return u
+
+    def flush(self):
+        count("controller_calls", self.calls, controller=self.controller)
+        count("controller_call_seconds", self.seconds, controller=self.controller)
+        self.calls, self.seconds = 0, 0.0
+
+
+def summarize(records):
+    """
+    Rozkład czasu z zapisów trace: lista (nazwa, liczba, łączny czas [s])
+    dla bloków span oraz średni czas wywołania regulatorów.
+    """
+    spans = {}
+    calls = {}
+    for kind, name, labels, value in records:
+        if kind == HISTOGRAM and name == "span_seconds":
+            label = labels["span"] + "".join(f" [{v}]" for k, v in sorted(labels.items()) if k != "span")
+            n, total = spans.get(label, (0, 0.0))
+            spans[label] = (n + 1, total + value)
+        elif kind == COUNTER and name in ("controller_calls", "controller_call_seconds"):
+            entry = calls.setdefault(labels["controller"], {"controller_calls": 0, "controller_call_seconds": 0.0})
+            entry[name] += value
+
+    rows = [(label, n, total) for label, (n, total) in spans.items()]
+    for controller, entry in sorted(calls.items()):
+        if entry["controller_calls"]:
+            rows.append((f"wywołanie regulatora [{controller}] (średnio)", int(entry["controller_calls"]),
+                         entry["controller_call_seconds"] / entry["controller_calls"]))
+    return rows
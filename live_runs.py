@@ -0,0 +1,152 @@
+import threading
+import uuid
+
+import numpy as np
+
+from classic_pi import ClassicPIController
+from fuzzy_pi import FuzzyControllerPool
+from route_profile import RouteProfile
+from vehicle_model import SIM_LOG_DTYPE, simulate_vehicle_stream
+
+# Liczba próbek w jednej porcji symulacji strumieniowej
+LIVE_CHUNK = 200
+
+# Maksymalna liczba zapamiętanych przebiegów na żywo (najstarsze są usuwane)
+MAX_LIVE_RUNS = 8
+
+# Regulatory rozmyte dla przebiegów na żywo (system rozmyty budowany raz)
+_fuzzy_pool = None
+_pool_lock = threading.Lock()
+
+_runs = {}
+_runs_lock = threading.Lock()
+
+
+class LiveRunCancelled(Exception):
+    """Przebieg anulowany - zgłaszane przez regulator w trakcie symulacji."""
+
+
+def _get_fuzzy_pool():
+    global _fuzzy_pool
+    with _pool_lock:
+        if _fuzzy_pool is None:
+            _fuzzy_pool = FuzzyControllerPool()
+    return _fuzzy_pool
+
+
+class LiveRun:
+    """
+    Symulacja obu regulatorów w wątkach w tle (simulate_vehicle_stream).
+    Porcje dziennika są dopisywane w miarę postępu; read() zwraca próbki
+    dodane od podanej pozycji, results() - komplet wyników po zakończeniu.
+    """
+    def __init__(self, vehicle_type, alpha_segments, vref_segments, plant_dt, controllers, chunk_size=LIVE_CHUNK):
+        self.id = uuid.uuid4().hex
+        self.vehicle_type = vehicle_type
+        self.route = RouteProfile(alpha_segments, vref_segments, dt=plant_dt)
+        self.controllers = controllers
+        self.chunk_size = chunk_size
+
+        self._chunks = {name: [] for name in controllers}
+        self._counts = {name: 0 for name in controllers}
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._threads = [threading.Thread(target=self._run, args=(name,), daemon=True) for name in controllers]
+        self.error = None
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def _controller_func(self, name):
+        kind, params = self.controllers[name]
+        if kind == "classic":
+            controller = ClassicPIController(params["Kp"], params["Ti"], (-1, 1))
+            release = None
+        else:
+            pool = _get_fuzzy_pool()
+            controller = pool.acquire()
+            release = lambda: pool.release(controller)
+
+        def controller_func(error, v_curr, t):
+            # Sprawdzenie przy każdym próbkowaniu - krok regulatora rozmytego trwa
+            # dziesiątki ms, porcja simulate_vehicle_stream nawet kilka sekund
+            if self._cancelled.is_set():
+                raise LiveRunCancelled
+            return controller.compute(error, v_curr, t, params["dt"])
+
+        return controller_func, release
+
+    def _run(self, name):
+        controller_func, release = self._controller_func(name)
+        dt = self.controllers[name][1]["dt"]
+        try:
+            for chunk in simulate_vehicle_stream(self.vehicle_type, self.route, controller_func,
+                                                 controller_dt=dt, chunk_size=self.chunk_size):
+                if self._cancelled.is_set():
+                    return
+                with self._lock:
+                    self._chunks[name].append(chunk)
+                    self._counts[name] += len(chunk)
+        except LiveRunCancelled:
+            pass
+        except Exception as exc:
+            self.error = exc
+            self._cancelled.set()
+        finally:
+            if release is not None:
+                release()
+
+    def read(self, name, start):
+        """Próbki regulatora name od pozycji start (tablica SIM_LOG_DTYPE, może być pusta)."""
+        with self._lock:
+            chunks = list(self._chunks[name])
+        # Tylko porcje zawierające nowe próbki
+        new = []
+        offset = 0
+        for chunk in chunks:
+            if offset + len(chunk) > start:
+                new.append(chunk[max(start - offset, 0):])
+            offset += len(chunk)
+        return np.concatenate(new) if new else np.zeros(0, dtype=SIM_LOG_DTYPE)
+
+    def progress(self):
+        """Liczba policzonych próbek na regulator i łączna liczba próbek trasy."""
+        with self._lock:
+            return dict(self._counts), self.route.n_samples
+
+    def finished(self):
+        return all(not thread.is_alive() for thread in self._threads)
+
+    def results(self):
+        """Pełne dzienniki symulacji (nazwa -> tablica SIM_LOG_DTYPE)."""
+        with self._lock:
+            return {name: np.concatenate(chunks) for name, chunks in self._chunks.items()}
+
+
+def start_live_run(*args, **kwargs):
+    """Tworzy i uruchamia LiveRun; zwraca jego identyfikator."""
+    run = LiveRun(*args, **kwargs).start()
+    with _runs_lock:
+        _runs[run.id] = run
+        while len(_runs) > MAX_LIVE_RUNS:
+            oldest = next(iter(_runs))
+            _runs.pop(oldest).cancel()
+    return run.id
+
+
+def cancel_live_run(run_id):
+    """Przerywa przebieg i usuwa go z listy (np. po nowym zgłoszeniu z tej samej sesji)."""
+    with _runs_lock:
+        run = _runs.pop(run_id, None)
+    if run is not None:
+        run.cancel()
+
+
+def get_live_run(run_id):
+    with _runs_lock:
+        return _runs.get(run_id)
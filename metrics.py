@@ -0,0 +1,93 @@
+import numpy as np
+
+from control_shading import classify_control
+from route_profile import segment_index
+
+# Wskaźniki całkowe liczone dla całego przejazdu
+SUMMARY_METRICS = ("IAE", "ISE", "ITAE", "ITAE_seg", "effort", "switches")
+# Wskaźniki liczone osobno dla każdego odcinka prędkości zadanej
+SEGMENT_METRICS = ("overshoot", "settling_time")
+
+
+def _integrate(values, dt):
+    """Całka metodą trapezów wzdłuż ostatniej osi przy krokach dt (T-1,)."""
+    return np.sum(0.5 * (values[..., 1:] + values[..., :-1]) * dt, axis=-1)
+
+
+def score_runs(time, v, u, v_ref, segment_bounds=None, settling_band=0.02, min_band=0.1):
+    """
+    Wskaźniki jakości regulacji dla jednego lub wielu przebiegów naraz.
+
+    time (T,), v, u - tablice (T,) lub (N, T), v_ref [m/s] - (T,) lub (N, T),
+    segment_bounds - granice czasowe odcinków prędkości zadanej
+    (np. RouteProfile.vref_bounds); domyślnie jeden odcinek.
+
+    Zwraca słownik tablic:
+      IAE, ISE - całki |e| i e^2,
+      ITAE - całka t*|e| z czasem od początku przejazdu (definicja standardowa),
+      ITAE_seg - jak ITAE, ale z czasem od początku każdego odcinka prędkości
+        zadanej (każdy skok wartości zadanej ważony jak pierwszy),
+      effort - całka u^2, switches - liczba zmian kategorii sterowania
+        (przyspieszanie/utrzymanie/hamowanie),
+      overshoot [%] - przeregulowanie względem skoku na początku odcinka,
+      settling_time [s] - czas do trwałego wejścia w pasmo
+        max(settling_band * |v_ref|, min_band); nan gdy brak ustalenia.
+    Wskaźniki całkowe mają kształt (N,), odcinkowe (N, S); dla wejść 1-D bez osi N.
+    """
+    single = np.ndim(v) == 1
+    time = np.asarray(time, dtype=float)
+    v = np.atleast_2d(v)
+    u = np.atleast_2d(u)
+    v_ref = np.broadcast_to(v_ref, v.shape)
+    if segment_bounds is None:
+        segment_bounds = np.array([time[0], time[-1] + 1.0])
+    segment_bounds = np.asarray(segment_bounds, dtype=float)
+
+    dt = np.diff(time)
+    error = v_ref - v
+    abs_error = np.abs(error)
+
+    # Czas od początku bieżącego odcinka
+    seg = segment_index(segment_bounds, time)
+    local_time = time - segment_bounds[seg]
+
+    scores = {
+        "IAE": _integrate(abs_error, dt),
+        "ISE": _integrate(error**2, dt),
+        "ITAE": _integrate((time - time[0]) * abs_error, dt),
+        "ITAE_seg": _integrate(local_time * abs_error, dt),
+        "effort": _integrate(u**2, dt),
+        "switches": np.count_nonzero(np.diff(classify_control(u), axis=-1), axis=-1),
+    }
+
+    n_segments = len(segment_bounds) - 1
+    overshoot = np.full((v.shape[0], n_segments), np.nan)
+    settling = np.full((v.shape[0], n_segments), np.nan)
+    for k in range(n_segments):
+        idx = np.flatnonzero(seg == k)
+        if len(idx) == 0:
+            continue
+        r = v_ref[:, idx[0]]
+        v_seg = v[:, idx]
+        step = r - v[:, max(idx[0] - 1, 0)]
+        direction = np.sign(step)
+
+        # Przeregulowanie: największe przekroczenie wartości zadanej w kierunku skoku
+        excess = np.max(direction[:, None] * (v_seg - r[:, None]), axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            overshoot[:, k] = np.where(np.abs(step) > 1e-9, np.maximum(excess, 0.0) / np.abs(step) * 100, 0.0)
+
+        # Czas ustalania: ostatnia próbka poza pasmem tolerancji
+        band = np.maximum(settling_band * np.abs(r), min_band)
+        outside = np.abs(v_seg - r[:, None]) > band[:, None]
+        last_outside = len(idx) - 1 - np.argmax(outside[:, ::-1], axis=1)
+        t_seg = local_time[idx]
+        settled_at = np.where(outside.any(axis=1), t_seg[np.minimum(last_outside + 1, len(idx) - 1)], 0.0)
+        settling[:, k] = np.where(outside[:, -1], np.nan, settled_at)
+
+    scores["overshoot"] = overshoot
+    scores["settling_time"] = settling
+
+    if single:
+        scores = {name: values[0] for name, values in scores.items()}
+    return scores
@@ -0,0 +1,162 @@
+import time as clock
+from concurrent.futures import as_completed
+
+import numpy as np
+from scipy.signal import lfilter
+
+from classic_pi import ClassicPIBatch
+from fuzzy_pi import FuzzyPIBatch, SCALING_GAINS
+from fuzzy_tuner import surface_controller
+from metrics import score_runs, SUMMARY_METRICS
+from route_profile import RouteProfile
+from sim_workers import get_pool, pool_size
+from vehicle_model import VEHICLES, simulate_batch
+
+# Zakres mnożnika masy (od pojazdu pustego do załadowanego), losowany równomiernie
+MASS_RANGES = {
+    "osobowy": (0.9, 1.3),
+    "sportowy": (0.95, 1.15),
+    "van": (0.8, 1.6),
+    "ciezarowka": (0.5, 1.7),
+}
+
+# Względne odchylenie standardowe pozostałych parametrów (rozkład log-normalny)
+PARAM_SPREAD = {"A": 0.05, "Cd": 0.1, "F_max": 0.08}
+
+# Szum nachylenia drogi: odchylenie [°] i czas korelacji [s] (proces AR(1))
+GRADE_NOISE_DEG = 0.5
+GRADE_NOISE_TAU = 2.0
+
+# Kwantyle pasm ufności przebiegu prędkości
+BAND_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+# Liczba punktów czasu zapisywanych dla pasm (przebiegi są przerzedzane w procesach roboczych)
+BAND_POINTS = 600
+
+# Regulatory w wersji tablicowej: rodzaj -> (n, parametry) -> regulator partii
+BATCH_CONTROLLERS = {
+    "classic": lambda n, params: ClassicPIBatch(params["Kp"], params["Ti"], n=n),
+    "fuzzy": lambda n, params: FuzzyPIBatch(**{name: params.get(name, value) for name, value in SCALING_GAINS.items()},
+                                            n=n, controller=surface_controller()),
+}
+
+
+def sample_vehicles(vehicle_type, n, rng):
+    """n losowych wariantów pojazdu vehicle_type (lista słowników parametrów jak w VEHICLES)."""
+    base = VEHICLES[vehicle_type]
+    mass = base["mass"] * rng.uniform(*MASS_RANGES[vehicle_type], n)
+    spread = {key: base[key] * rng.lognormal(0.0, sigma, n) for key, sigma in PARAM_SPREAD.items()}
+    return [dict(base, mass=mass[i], **{key: values[i] for key, values in spread.items()}) for i in range(n)]
+
+
+def grade_noise(n, n_steps, dt, rng, std=GRADE_NOISE_DEG, tau=GRADE_NOISE_TAU):
+    """Skorelowany w czasie szum nachylenia [°] o kształcie (n, n_steps) - proces AR(1)."""
+    a = np.exp(-dt / tau)
+    white = rng.standard_normal((n, n_steps)) * std * np.sqrt(1 - a * a)
+    # Stan początkowy z rozkładu stacjonarnego
+    white[:, 0] = rng.standard_normal(n) * std
+    return lfilter([1.0], [1.0, -a], white, axis=1)
+
+
+def simulate_samples(n, seed, vehicle_type, alpha_segments, vref_segments, plant_dt, controllers, band_step):
+    """
+    Partia n losowych scenariuszy (parametry pojazdu i szum nachylenia z ziarna seed)
+    symulowana dla każdego regulatora na tych samych próbkach. Zwraca słownik
+    nazwa -> {"v": prędkość [km/h] co band_step próbek (n, P), "scores": score_runs}.
+    """
+    rng = np.random.default_rng(seed)
+    route = RouteProfile(alpha_segments, vref_segments, dt=plant_dt)
+    vehicles = sample_vehicles(vehicle_type, n, rng)
+    alpha_deg = route.alpha_deg + grade_noise(n, len(route.time), plant_dt, rng)
+
+    out = {}
+    for name, (kind, params) in controllers.items():
+        batch = BATCH_CONTROLLERS[kind](n, params)
+
+        def controller_func(error, v_curr, t):
+            return batch.compute(error, v_curr, t, params["dt"])
+
+        time, v, u = simulate_batch(vehicles, alpha_deg, route.v_ref, controller_func,
+                                    t_final=route.t_final, dt=plant_dt, controller_dt=params["dt"])
+        out[name] = {"v": (v[:, ::band_step] * 3.6).astype(np.float32),
+                     "scores": score_runs(time, v, u, route.v_ref, route.vref_bounds)}
+    return out
+
+
+def summarize_distribution(values):
+    """Średnia z 95% przedziałem ufności, odchylenie i kwantyle 5%/50%/95% (bez nan)."""
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return {"mean": np.nan, "ci": np.nan, "std": np.nan, "p5": np.nan, "p50": np.nan, "p95": np.nan}
+    std = float(np.std(values, ddof=1)) if len(values) > 1 else 0.0
+    p5, p50, p95 = np.percentile(values, [5, 50, 95])
+    return {"mean": float(np.mean(values)), "ci": 1.96 * std / np.sqrt(len(values)), "std": std,
+            "p5": float(p5), "p50": float(p50), "p95": float(p95)}
+
+
+def run_monte_carlo(vehicle_type, alpha_segments, vref_segments, controllers, n_samples=1000, seed=0,
+                    plant_dt=0.01, progress=None):
+    """
+    Analiza odporności: n_samples scenariuszy z losowymi parametrami pojazdu
+    (MASS_RANGES, PARAM_SPREAD) i szumem nachylenia, symulowanych wektorowo
+    (simulate_batch) partiami w puli procesów. controllers jak w run_parallel;
+    regulator rozmyty liczony na skompilowanej powierzchni sterowania (FuzzyPIBatch).
+    progress(wykonane, wszystkie) - po każdej partii.
+
+    Zwraca słownik: time (P,), vref_kmh (P,), n_samples, elapsed oraz dla każdego
+    regulatora bands (kwantyl -> prędkość [km/h] (P,)), metrics (wskaźnik ->
+    wartości (n_samples,)) i summary (wskaźnik -> summarize_distribution).
+    """
+    start = clock.perf_counter()
+    route = RouteProfile(alpha_segments, vref_segments, dt=plant_dt)
+    band_step = max(len(route.time) // BAND_POINTS, 1)
+
+    # Duże partie - narzut pętli kroku czasu rozkłada się na wiele scenariuszy
+    sizes = [len(idx) for idx in np.array_split(np.arange(n_samples), min(n_samples, 2 * pool_size()))]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    pool = get_pool()
+    futures = {pool.submit(simulate_samples, size, child, vehicle_type, alpha_segments, vref_segments,
+                           plant_dt, controllers, band_step): k
+               for k, (size, child) in enumerate(zip(sizes, seeds))}
+    parts = [None] * len(sizes)
+    done = 0
+    try:
+        for future in as_completed(futures):
+            parts[futures[future]] = future.result()
+            done += sizes[futures[future]]
+            if progress is not None:
+                progress(done, n_samples)
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+
+    result = {"time": route.time[::band_step], "vref_kmh": route.v_ref[::band_step] * 3.6,
+              "n_samples": n_samples}
+    for name in controllers:
+        v = np.concatenate([part[name]["v"] for part in parts])
+        metrics = {metric: np.concatenate([part[name]["scores"][metric] for part in parts])
+                   for metric in SUMMARY_METRICS}
+        result[name] = {
+            "bands": dict(zip(BAND_QUANTILES, np.quantile(v, BAND_QUANTILES, axis=0))),
+            "metrics": metrics,
+            "summary": {metric: summarize_distribution(values.astype(float)) for metric, values in metrics.items()},
+        }
+    result["elapsed"] = clock.perf_counter() - start
+    return result
+
+
+if __name__ == "__main__":
+    # Trasa domyślna z aplikacji
+    alpha_segments = [{"time": 10, "alpha": 0}, {"time": 10, "alpha": 10}, {"time": 10, "alpha": -5}]
+    vref_segments = [{"time": 10, "v": 70}, {"time": 10, "v": 50}, {"time": 10, "v": 60}]
+    controllers = {"classic": ("classic", {"Kp": 1.0, "Ti": 1.0, "dt": 0.01}), "fuzzy": ("fuzzy", {"dt": 0.1})}
+
+    for vehicle_type in VEHICLES:
+        result = run_monte_carlo(vehicle_type, alpha_segments, vref_segments, controllers)
+        print(f"{vehicle_type:>11}: {result['n_samples']} scenariuszy w {result['elapsed']:.1f} s")
+        for name in controllers:
+            summary = result[name]["summary"]
+            print(f"{'':>11}  {name:>7}: " + ", ".join(
+                f"{metric} {summary[metric]['mean']:.1f} ± {summary[metric]['ci']:.1f} "
+                f"[{summary[metric]['p5']:.1f}; {summary[metric]['p95']:.1f}]" for metric in ("IAE", "ITAE", "effort")))
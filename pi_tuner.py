@@ -0,0 +1,147 @@
+import time as clock
+from concurrent.futures import as_completed, TimeoutError
+
+import numpy as np
+from scipy.optimize import minimize
+
+from classic_pi import ClassicPIBatch
+from metrics import score_runs
+from route_profile import RouteProfile
+from sim_workers import get_pool, pool_size
+from vehicle_model import simulate_batch, simulate_classic_pi
+
+# Funkcje kosztu: nazwa -> f(wskaźniki z score_runs, waga energii sterowania);
+# itae_effort z ITAE odcinkowym - przy ITAE od początku przejazdu błędy na
+# ostatnich odcinkach trasy przeważałyby nad pierwszymi
+COSTS = {
+    "itae_effort": lambda scores, w: scores["ITAE_seg"] + w * scores["effort"],
+    "iae_effort": lambda scores, w: scores["IAE"] + w * scores["effort"],
+    "ise_effort": lambda scores, w: scores["ISE"] + w * scores["effort"],
+}
+
+# Dopuszczalny zakres nastaw podczas optymalizacji
+KP_BOUNDS = (0.05, 20.0)
+TI_BOUNDS = (0.05, 100.0)
+
+
+class BudgetExceeded(Exception):
+    """Przekroczono limit czasu optymalizacji."""
+
+
+def evaluate_gains(gains, vehicle_type, alpha_segments, vref_segments,
+                   plant_dt=0.01, controller_dt=0.01, cost="itae_effort", effort_weight=1.0):
+    """
+    Koszt dla partii nastaw gains (N, 2) = [Kp, Ti] - jedna symulacja
+    simulate_batch z ClassicPIBatch dla wszystkich kandydatów. Zwraca tablicę kosztów (N,).
+    """
+    route = RouteProfile(alpha_segments, vref_segments, dt=plant_dt)
+    gains = np.asarray(gains, dtype=float)
+    pi = ClassicPIBatch(gains[:, 0], gains[:, 1])
+
+    def controller_func(error, v_curr, t):
+        return pi.compute(error, v_curr, t, controller_dt)
+
+    time, v, u = simulate_batch([vehicle_type] * len(gains), route.alpha_deg, route.v_ref, controller_func,
+                                t_final=route.t_final, dt=route.dt, controller_dt=controller_dt)
+    scores = score_runs(time, v, u, route.v_ref, route.vref_bounds)
+    return COSTS[cost](scores, effort_weight)
+
+
+def evaluate_candidates(evaluate, candidates, kwargs, deadline=None, progress=None, stage="grid"):
+    """
+    Koszty kandydatów (wiersze candidates) liczone partiami w puli procesów
+    (sim_workers.get_pool): evaluate(candidates[partia], **kwargs) -> koszty partii.
+    Po przekroczeniu deadline (perf_counter) pozostałe partie są anulowane.
+    Zwraca (koszty z nan dla niepoliczonych, liczba policzonych, czy policzono wszystkie).
+    """
+    pool = get_pool()
+    costs = np.full(len(candidates), np.nan)
+    # Po kilka partii na proces, żeby postęp był raportowany na bieżąco
+    chunks = np.array_split(np.arange(len(candidates)), min(len(candidates), 4 * pool_size()))
+    futures = {pool.submit(evaluate, candidates[idx], **kwargs): idx for idx in chunks}
+    done = 0
+    try:
+        for future in as_completed(futures, timeout=None if deadline is None else max(deadline - clock.perf_counter(), 0)):
+            idx = futures[future]
+            costs[idx] = future.result()
+            done += len(idx)
+            if progress is not None:
+                progress(stage, done, len(candidates), np.nanmin(costs))
+    except TimeoutError:
+        for future in futures:
+            future.cancel()
+        return costs, done, False
+    except BaseException:
+        # Np. przerwanie zgłoszone przez progress - bez liczenia pozostałych partii
+        for future in futures:
+            future.cancel()
+        raise
+    return costs, done, True
+
+
+def tune_pi(vehicle_type, alpha_segments, vref_segments,
+            kp_grid=np.linspace(0.25, 5, 12), ti_grid=np.geomspace(0.25, 20, 12),
+            cost="itae_effort", effort_weight=1.0, plant_dt=0.01, controller_dt=0.01,
+            refine=True, time_budget=None, progress=None):
+    """
+    Automatyczny dobór Kp i Ti regulatora klasycznego PI dla pojazdu i trasy.
+
+    Etap 1: siatka kp_grid x ti_grid liczona partiami w puli procesów
+    (sim_workers.get_pool). Etap 2 (refine): minimalizacja Neldera-Meada
+    w skali logarytmicznej, startując z najlepszego punktu siatki.
+    time_budget [s] - po jego przekroczeniu zwracany jest najlepszy dotąd wynik.
+    progress(etap, wykonane, wszystkie, najlepszy_koszt) - wywoływana po każdej
+    partii siatki i każdej ewaluacji optymalizatora.
+
+    Zwraca słownik: Kp, Ti, cost, evaluations, elapsed, grid_cost (macierz
+    kosztów siatki, nan dla niepoliczonych), completed (czy zmieszczono się w budżecie).
+    """
+    start = clock.perf_counter()
+    deadline = None if time_budget is None else start + time_budget
+    kp_mesh, ti_mesh = np.meshgrid(kp_grid, ti_grid, indexing="ij")
+    kp_flat, ti_flat = kp_mesh.ravel(), ti_mesh.ravel()
+
+    # Etap 1: siatka w puli procesów
+    kwargs = dict(vehicle_type=vehicle_type, alpha_segments=alpha_segments, vref_segments=vref_segments,
+                  plant_dt=plant_dt, controller_dt=controller_dt, cost=cost, effort_weight=effort_weight)
+    grid_cost, done, completed = evaluate_candidates(evaluate_gains, np.column_stack((kp_flat, ti_flat)),
+                                                     kwargs, deadline, progress)
+
+    evaluations = done
+    if done == 0:
+        return {"Kp": None, "Ti": None, "cost": np.nan, "evaluations": 0,
+                "elapsed": clock.perf_counter() - start, "grid_cost": grid_cost.reshape(kp_mesh.shape),
+                "completed": False}
+
+    best_index = int(np.nanargmin(grid_cost))
+    best = {"Kp": float(kp_flat[best_index]), "Ti": float(ti_flat[best_index]), "cost": float(grid_cost[best_index])}
+
+    # Etap 2: optymalizacja lokalna pojedynczymi symulacjami (szybka ścieżka JIT)
+    if refine and completed:
+        route = RouteProfile(alpha_segments, vref_segments, dt=plant_dt)
+        lower = np.log([KP_BOUNDS[0], TI_BOUNDS[0]])
+        upper = np.log([KP_BOUNDS[1], TI_BOUNDS[1]])
+
+        def objective(x):
+            nonlocal evaluations
+            if deadline is not None and clock.perf_counter() > deadline:
+                raise BudgetExceeded
+            Kp, Ti = np.exp(np.clip(x, lower, upper))
+            log = simulate_classic_pi(vehicle_type, route, Kp=Kp, Ti=Ti, controller_dt=controller_dt)
+            scores = score_runs(route.time, log["v"], log["u"], route.v_ref, route.vref_bounds)
+            value = float(COSTS[cost](scores, effort_weight))
+            evaluations += 1
+            if value < best["cost"]:
+                best.update(Kp=float(Kp), Ti=float(Ti), cost=value)
+            if progress is not None:
+                progress("refine", evaluations - done, None, best["cost"])
+            return value
+
+        try:
+            minimize(objective, np.log([best["Kp"], best["Ti"]]), method="Nelder-Mead",
+                     options={"xatol": 1e-3, "fatol": 1e-4, "maxfev": 200})
+        except BudgetExceeded:
+            completed = False
+
+    return dict(best, evaluations=evaluations, elapsed=clock.perf_counter() - start,
+                grid_cost=grid_cost.reshape(kp_mesh.shape), completed=completed)
@@ -0,0 +1,146 @@
+"""
+Import tras z plików i zwarte przechowywanie (ROUTE_POINT_DTYPE, float32).
+
+CSV - nagłówek i kolumny (wielkość liter bez znaczenia, separator , lub ;):
+    droga: distance_m albo distance_km,
+    profil: grade_deg, grade_pct albo elevation_m (nachylenie z różnic wysokości),
+    opcjonalnie speed_kmh (ograniczenie prędkości; brak - default_speed).
+GPX - punkty trkpt/rtept (lat, lon, ele); droga z odległości po kole wielkim,
+    nachylenie z wysokości, ograniczenie prędkości stałe (default_speed).
+
+Trasy zapisywane są jako .npy; duże pliki są otwierane przez mapowanie pamięci
+(open_route), więc procesy robocze czytają ten sam plik bez kopiowania tras.
+"""
+import csv
+import io
+import os
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from route_profile import ROUTE_POINT_DTYPE, DistanceRoute
+
+# Ograniczenie prędkości [km/h], gdy plik go nie podaje
+DEFAULT_SPEED = 90.0
+
+# Pliki tras większe od tego progu [B] są mapowane w pamięci zamiast wczytywane
+MEMMAP_BYTES = 1 << 20
+
+# Promień Ziemi do odległości między punktami GPX [m]
+EARTH_RADIUS = 6371000.0
+
+# Przestrzenie nazw GPX 1.1 i 1.0 oraz brak przestrzeni nazw (jawnie - symbol
+# wieloznaczny {*} w ElementTree wymaga Pythona 3.8)
+GPX_NAMESPACES = ("{http://www.topografix.com/GPX/1/1}", "{http://www.topografix.com/GPX/1/0}", "")
+
+
+def route_points(distance, grade, speed_limit):
+    """
+    Tablica ROUTE_POINT_DTYPE z przebiegów w punktach trasy; punkty o zerowej
+    długości odcinka (powtórzona droga) są pomijane.
+    """
+    distance = np.asarray(distance, dtype=float)
+    keep = np.concatenate(([True], np.diff(distance) > 0))
+    if np.any(np.diff(distance) < 0):
+        raise ValueError("Droga wzdłuż trasy musi być niemalejąca")
+    points = np.zeros(int(keep.sum()), dtype=ROUTE_POINT_DTYPE)
+    points["distance"] = distance[keep] - distance[0]
+    points["grade"] = np.broadcast_to(grade, distance.shape)[keep]
+    points["speed_limit"] = np.broadcast_to(speed_limit, distance.shape)[keep]
+    return points
+
+
+def grade_from_elevation(distance, elevation):
+    """Nachylenie [°] odcinków między kolejnymi punktami (ostatni punkt powtarza poprzednie)."""
+    distance = np.asarray(distance, dtype=float)
+    elevation = np.asarray(elevation, dtype=float)
+    grade = np.degrees(np.arctan2(np.diff(elevation), np.maximum(np.diff(distance), 1e-9)))
+    return np.append(grade, grade[-1] if len(grade) else 0.0)
+
+
+def parse_csv(text, default_speed=DEFAULT_SPEED):
+    """Punkty trasy z tekstu CSV (kolumny jak w opisie modułu)."""
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;")
+    except csv.Error:
+        dialect = csv.excel
+    rows = list(csv.reader(io.StringIO(text), dialect))
+    if len(rows) < 3:
+        raise ValueError("Plik CSV musi zawierać nagłówek i co najmniej 2 punkty trasy")
+    header = [name.strip().lower() for name in rows[0]]
+    data = np.array([[float(x) for x in row] for row in rows[1:] if row], dtype=float)
+    columns = {name: data[:, i] for i, name in enumerate(header)}
+
+    if "distance_m" in columns:
+        distance = columns["distance_m"]
+    elif "distance_km" in columns:
+        distance = columns["distance_km"] * 1000.0
+    else:
+        raise ValueError("Brak kolumny distance_m lub distance_km")
+
+    if "grade_deg" in columns:
+        grade = columns["grade_deg"]
+    elif "grade_pct" in columns:
+        grade = np.degrees(np.arctan(columns["grade_pct"] / 100.0))
+    elif "elevation_m" in columns:
+        grade = grade_from_elevation(distance, columns["elevation_m"])
+    else:
+        raise ValueError("Brak kolumny grade_deg, grade_pct lub elevation_m")
+
+    return route_points(distance, grade, columns.get("speed_kmh", default_speed))
+
+
+def parse_gpx(text, default_speed=DEFAULT_SPEED):
+    """Punkty trasy z tekstu GPX (trkpt lub rtept z wysokością ele)."""
+    try:
+        root = ET.fromstring(text)
+    except ET.ParseError as exc:
+        raise ValueError(f"Niepoprawny plik GPX: {exc}") from exc
+    ns = next((ns for ns in GPX_NAMESPACES if root.tag == ns + "gpx"), GPX_NAMESPACES[0])
+    points = root.findall(f".//{ns}trkpt") or root.findall(f".//{ns}rtept")
+    if len(points) < 2:
+        raise ValueError("Plik GPX musi zawierać co najmniej 2 punkty trasy")
+    lat = np.radians([float(p.get("lat")) for p in points])
+    lon = np.radians([float(p.get("lon")) for p in points])
+    elevation = np.array([float(p.findtext(f"{ns}ele", default="0")) for p in points])
+
+    # Odległość po kole wielkim (haversine) między kolejnymi punktami
+    a = np.sin(np.diff(lat) / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2
+    step = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+    distance = np.concatenate(([0.0], np.cumsum(step)))
+    return route_points(distance, grade_from_elevation(distance, elevation), default_speed)
+
+
+# Rozszerzenie pliku -> parser tekstu
+PARSERS = {
+    ".csv": parse_csv,
+    ".gpx": parse_gpx,
+}
+
+
+def parse_route(text, filename, default_speed=DEFAULT_SPEED):
+    """Punkty trasy z zawartości pliku; format według rozszerzenia nazwy."""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in PARSERS:
+        raise ValueError(f"Nieobsługiwany format trasy: {ext or filename} (dostępne: {', '.join(PARSERS)})")
+    return PARSERS[ext](text, default_speed)
+
+
+def load_route_file(path, default_speed=DEFAULT_SPEED):
+    """Punkty trasy z pliku CSV lub GPX."""
+    with open(path, encoding="utf-8") as f:
+        return parse_route(f.read(), path, default_speed)
+
+
+def save_route(points, path):
+    """Zapis punktów trasy (.npy, float32) przez plik tymczasowy - bez częściowych plików przy współbieżności."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, np.ascontiguousarray(points, dtype=ROUTE_POINT_DTYPE))
+    os.replace(tmp_path, path)
+
+
+def open_route(path, dt=0.1, t_final=None, memmap_bytes=MEMMAP_BYTES):
+    """DistanceRoute z pliku .npy; pliki powyżej memmap_bytes są mapowane w pamięci."""
+    mmap_mode = "r" if os.path.getsize(path) > memmap_bytes else None
+    return DistanceRoute(np.load(path, mmap_mode=mmap_mode), dt=dt, t_final=t_final)
@@ -0,0 +1,107 @@
+import numpy as np
+
+
+def segment_index(bounds, t):
+    """
+    Indeks odcinka dla chwil t przy granicach bounds = [0, t1, t1+t2, ...].
+    Odcinek i obejmuje przedział [bounds[i], bounds[i+1]); poza trasą
+    obowiązuje ostatni odcinek.
+    """
+    n = len(bounds) - 1
+    idx = np.searchsorted(bounds, t, side="right") - 1
+    return np.where((idx < 0) | (idx >= n), n - 1, idx)
+
+
+class RouteProfile:
+    """
+    Profil trasy stablicowany na siatce czasu symulacji: nachylenie (w stopniach
+    i radianach) oraz prędkość zadana [m/s]. Dowolna liczba odcinków;
+    odcinki nachylenia i prędkości mogą mieć różne długości.
+
+    tabulate=False pomija tablice na siatce czasu (time, alpha, v_ref, ...) -
+    dla symulacji strumieniowej długich tras, która odczytuje profil porcjami
+    przez alpha_at i v_ref_at.
+    """
+    def __init__(self, alpha_segments, vref_segments, dt=0.1, t_final=None, tabulate=True):
+        self.alpha_bounds = np.cumsum([0] + [seg["time"] for seg in alpha_segments])
+        self.alpha_values = np.array([seg["alpha"] for seg in alpha_segments], dtype=float)
+        self.vref_bounds = np.cumsum([0] + [seg["time"] for seg in vref_segments])
+        self.vref_values = np.array([seg["v"] for seg in vref_segments], dtype=float) / 3.6
+
+        # Czas trwania wyznacza trasa (odcinki nachylenia)
+        self.t_final = self.alpha_bounds[-1] if t_final is None else t_final
+        self.dt = dt
+        # Liczba próbek siatki czasu (jak len(np.arange(0, t_final + dt, dt)))
+        self.n_samples = int(np.ceil((self.t_final + dt) / dt))
+        if not tabulate:
+            return
+
+        self.time = np.arange(0, self.t_final + dt, dt)
+        self.alpha_deg = self.alpha_at(self.time)
+        self.alpha = np.radians(self.alpha_deg)
+        self.v_ref = self.v_ref_at(self.time)
+
+    def alpha_at(self, t):
+        """Nachylenie [°] w chwilach t."""
+        return self.alpha_values[segment_index(self.alpha_bounds, t)]
+
+    def v_ref_at(self, t):
+        """Prędkość zadana [m/s] w chwilach t."""
+        return self.vref_values[segment_index(self.vref_bounds, t)]
+
+
+# Typ punktu trasy opisanej w funkcji drogi (float32 - zwarta reprezentacja długich tras):
+# początek odcinka [m], nachylenie [°], ograniczenie prędkości [km/h]
+ROUTE_POINT_DTYPE = np.dtype([
+    ("distance", np.float32),
+    ("grade", np.float32),
+    ("speed_limit", np.float32),
+])
+
+# Domyślny czas symulacji trasy odcinkowej: czas przejazdu z prędkością
+# równą ograniczeniom razy ten zapas
+TIME_MARGIN = 1.5
+
+
+class DistanceRoute:
+    """
+    Trasa opisana w funkcji przebytej drogi: tablica punktów ROUTE_POINT_DTYPE
+    (może być zmapowana w pamięci, route_file.open_route). Punkt i rozpoczyna
+    odcinek [distance[i], distance[i+1]); ostatni punkt to koniec trasy, za nim
+    obowiązuje ostatni odcinek. Nachylenie i prędkość zadana (ograniczenie
+    prędkości) zależą od położenia pojazdu, więc symulacja całkuje drogę
+    (vehicle_model.simulate_vehicle_distance). Siatka czasu jak w RouteProfile;
+    t_final domyślnie TIME_MARGIN * travel_time().
+    """
+    def __init__(self, points, dt=0.1, t_final=None):
+        if len(points) < 2:
+            raise ValueError("Trasa musi mieć co najmniej 2 punkty (początek i koniec)")
+        self.points = points
+        self.distance = points["distance"]
+        self.length = float(self.distance[-1])
+        self.n_segments = len(points) - 1
+
+        self.t_final = TIME_MARGIN * self.travel_time() if t_final is None else t_final
+        self.dt = dt
+        self.n_samples = int(np.ceil((self.t_final + dt) / dt))
+        self.time = np.arange(0, self.t_final + dt, dt)
+
+    def segment_arrays(self):
+        """Granice [m], nachylenie [rad] i prędkość zadana [m/s] odcinków (float64)."""
+        bounds = np.asarray(self.distance, dtype=float)
+        alpha = np.radians(np.asarray(self.points["grade"][:-1], dtype=float))
+        v_ref = np.asarray(self.points["speed_limit"][:-1], dtype=float) / 3.6
+        return bounds, alpha, v_ref
+
+    def travel_time(self):
+        """Czas przejazdu [s] z prędkością równą ograniczeniom na każdym odcinku."""
+        bounds, _, v_ref = self.segment_arrays()
+        return float(np.sum(np.diff(bounds) / np.maximum(v_ref, 0.1)))
+
+    def alpha_at_position(self, s):
+        """Nachylenie [°] w położeniach s [m]."""
+        return self.points["grade"][segment_index(self.distance, s)].astype(float)
+
+    def v_ref_at_position(self, s):
+        """Prędkość zadana [m/s] w położeniach s [m]."""
+        return self.points["speed_limit"][segment_index(self.distance, s)].astype(float) / 3.6
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def _canonical(value):
+    """Postać kanoniczna parametrów: liczby jako float, słowniki z posortowanymi kluczami."""
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, (bool, str)) or value is None:
+        return value
+    if isinstance(value, (int, float, np.number)):
+        return float(value)
+    raise TypeError(f"Nieobsługiwany typ parametru scenariusza: {type(value).__name__}")
+
+
+def scenario_key(**params):
+    """Skrót SHA-256 kanonicznej postaci parametrów scenariusza."""
+    payload = json.dumps(_canonical(params), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def result_nbytes(result):
+    """Rozmiar wyniku [B] - suma rozmiarów jego tablic."""
+    return sum(int(np.asarray(value).nbytes) for value in result.values())
+
+
+class SimulationCache:
+    """
+    Ograniczona pamięć podręczna wyników symulacji (LRU) z opcjonalną warstwą
+    dyskową. Wynik to słownik tablic NumPy; na dysku zapisywany jako .npz.
+    Pamięć ograniczona liczbą wyników (maxsize) i opcjonalnie łącznym rozmiarem
+    tablic (max_bytes); katalog disk_dir - łącznym rozmiarem plików (max_disk_bytes,
+    usuwane najdawniej używane). Wynik większy od limitu nie jest zapamiętywany.
+    Bezpieczna dla wielu wątków serwera.
+    """
+    def __init__(self, maxsize=64, disk_dir=None, max_bytes=None, max_disk_bytes=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key + ".npz")
+
+    def get(self, key):
+        """Wynik dla klucza lub None (pamięć, potem dysk)."""
+        return self._lookup(key, count=True)
+
+    def peek(self, key):
+        """
+        get bez zliczania trafień i chybień - dla ponownego odczytu wyników już
+        pokazanych (przybliżenie wykresu), żeby nie zawyżały statystyk.
+        """
+        return self._lookup(key, count=False)
+
+    def _lookup(self, key, count):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += count
+                return self._entries[key]
+
+        if self.disk_dir and os.path.exists(self._disk_path(key)):
+            with np.load(self._disk_path(key)) as data:
+                result = {name: data[name] for name in data.files}
+            # Czas modyfikacji pliku jako czas ostatniego użycia (kolejność usuwania w _prune_disk)
+            try:
+                os.utime(self._disk_path(key))
+            except OSError:
+                pass
+            with self._lock:
+                self.disk_hits += count
+                self._store(key, result)
+            return result
+
+        with self._lock:
+            self.misses += count
+        return None
+
+    def put(self, key, result):
+        nbytes = result_nbytes(result)
+        with self._lock:
+            self._store(key, result, nbytes)
+        if self.disk_dir and (self.max_disk_bytes is None or nbytes <= self.max_disk_bytes):
+            # Zapis do pliku tymczasowego i podmiana - brak częściowych plików przy współbieżności
+            tmp_path = self._disk_path(key) + f".{threading.get_ident()}.tmp.npz"
+            np.savez(tmp_path, **result)
+            os.replace(tmp_path, self._disk_path(key))
+            if self.max_disk_bytes is not None:
+                self._prune_disk()
+
+    def _store(self, key, result, nbytes=None):
+        if key in self._entries:
+            self._bytes -= self._sizes.pop(key)
+            del self._entries[key]
+        nbytes = result_nbytes(result) if nbytes is None else nbytes
+        if self.max_bytes is not None and nbytes > self.max_bytes:
+            return
+        self._entries[key] = result
+        self._sizes[key] = nbytes
+        self._bytes += nbytes
+        while len(self._entries) > self.maxsize or (self.max_bytes is not None and self._bytes > self.max_bytes):
+            old_key, _ = self._entries.popitem(last=False)
+            self._bytes -= self._sizes.pop(old_key)
+
+    def _prune_disk(self):
+        """Usuwa najdawniej używane pliki .npz, dopóki katalog przekracza max_disk_bytes."""
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith(".npz") and ".tmp." not in entry.name:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,149 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Stany zadania
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+
+class JobCancelled(Exception):
+    """Zadanie anulowane - zgłaszane przez Job.check() w trakcie obliczeń."""
+
+
+class Job:
+    """
+    Zadanie w tle. Funkcja zadania dostaje obiekt Job jako pierwszy argument:
+    set_progress() raportuje postęp, check() przerywa obliczenia po anulowaniu.
+    """
+    def __init__(self, key):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.state = QUEUED
+        self.progress = 0.0
+        self.message = ""
+        self.result = None
+        self.error = None
+        self.subscribers = 1
+        self.created = time.time()
+        self.future = None
+        self._cancelled = threading.Event()
+
+    def set_progress(self, fraction, message=""):
+        self.progress = min(max(float(fraction), 0.0), 1.0)
+        self.message = message
+        self.check()
+
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def check(self):
+        if self._cancelled.is_set():
+            raise JobCancelled
+
+    def finished(self):
+        return self.state in (DONE, FAILED, CANCELLED)
+
+    def status(self):
+        """Stan zadania jako słownik (JSON)."""
+        return {"id": self.id, "state": self.state, "progress": self.progress,
+                "message": self.message, "error": None if self.error is None else str(self.error)}
+
+
+class JobQueue:
+    """
+    Lokalna kolejka zadań w tle (pula wątków). Zadania o tym samym kluczu
+    są deduplikowane: kolejne zgłoszenie identycznego zadania w toku dostaje
+    jego identyfikator. Anulowanie zmniejsza liczbę zainteresowanych klientów
+    i przerywa zadanie, gdy nie został żaden. Zakończone zadania są trzymane
+    do odczytu (najwyżej max_finished ostatnich); wynik jest zwalniany, gdy
+    odbiorą go wszyscy zainteresowani klienci (take_result).
+    """
+    def __init__(self, max_workers=2, max_finished=32):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sim-job")
+        self._jobs = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.max_finished = max_finished
+        self.deduplicated = 0
+
+    def submit(self, key, func, *args, **kwargs):
+        """Zgłasza func(job, *args, **kwargs) pod kluczem key; zwraca identyfikator zadania."""
+        with self._lock:
+            job = self._in_flight.get(key)
+            if job is not None and not job.cancelled():
+                job.subscribers += 1
+                self.deduplicated += 1
+                return job.id
+
+            job = Job(key)
+            self._jobs[job.id] = job
+            self._in_flight[key] = job
+            self._prune()
+        job.future = self._executor.submit(self._run, job, func, args, kwargs)
+        return job.id
+
+    def _run(self, job, func, args, kwargs):
+        try:
+            job.check()
+            job.state = RUNNING
+            job.result = func(job, *args, **kwargs)
+            job.progress = 1.0
+            job.state = DONE
+        except JobCancelled:
+            job.state = CANCELLED
+        except Exception as exc:
+            job.error = exc
+            job.state = FAILED
+        finally:
+            with self._lock:
+                if self._in_flight.get(job.key) is job:
+                    del self._in_flight[job.key]
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished()]
+        for job_id in finished[:max(len(finished) - self.max_finished, 0)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def take_result(self, job_id):
+        """
+        Wynik zakończonego zadania dla jednego klienta (None, gdy brak). Po odebraniu
+        przez wszystkich klientów zadanie nie trzyma wyniku - wyniki tras z pliku
+        zajmują setki MB i nie mogą czekać na wypchnięcie przez max_finished.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state != DONE:
+                return None
+            result = job.result
+            job.subscribers -= 1
+            if job.subscribers <= 0:
+                job.result = None
+        return result
+
+    def cancel(self, job_id):
+        """Rezygnacja klienta z zadania; zadanie jest przerywane, gdy nikt już na nie nie czeka."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished():
+                return False
+            job.subscribers -= 1
+            if job.subscribers > 0:
+                return False
+            job._cancelled.set()
+            if self._in_flight.get(job.key) is job:
+                del self._in_flight[job.key]
+        if job.future is not None and job.future.cancel():
+            job.state = CANCELLED
+        return True
+
+    def stats(self):
+        with self._lock:
+            states = [job.state for job in self._jobs.values()]
+        counts = {state: states.count(state) for state in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+        return {**counts, "deduplicated": self.deduplicated}
@@ -0,0 +1,168 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import instrumentation
+from fuzzy_pi import FuzzyControllerPool, SCALING_GAINS
+from instrumentation import span, ControllerTimer
+from route_file import open_route
+from route_profile import RouteProfile, DistanceRoute
+from vehicle_model import simulate_vehicle, simulate_classic_pi, simulate_vehicle_distance, simulate_classic_pi_distance
+
+# Pula regulatorów rozmytych zbudowana raz na proces roboczy (inicjalizator puli)
+_fuzzy_pool = None
+# Pula regulatorów z tablicowaną powierzchnią sterowania (params["compiled"]), tworzona przy pierwszym użyciu
+_compiled_pool = None
+
+_pool = None
+_pool_size = 0
+
+
+def _init_worker():
+    global _fuzzy_pool
+    _fuzzy_pool = FuzzyControllerPool()
+
+
+def _run_classic(vehicle_type, route, params):
+    # Regulator w kernelu symulacji - bez osobnych wywołań do zliczania
+    simulate = simulate_classic_pi_distance if isinstance(route, DistanceRoute) else simulate_classic_pi
+    with span(simulate.__name__, vehicle=vehicle_type):
+        return simulate(vehicle_type, route, Kp=params["Kp"], Ti=params["Ti"], controller_dt=params["dt"])
+
+
+def _get_fuzzy_pool(compiled):
+    global _compiled_pool
+    if _fuzzy_pool is None:
+        _init_worker()
+    if compiled and _compiled_pool is None:
+        _compiled_pool = FuzzyControllerPool(compiled=True)
+    return _compiled_pool if compiled else _fuzzy_pool
+
+
+def _run_fuzzy(vehicle_type, route, params):
+    pool = _get_fuzzy_pool(params.get("compiled", False))
+    with span("controller_acquire", controller="fuzzy"):
+        controller = pool.acquire()
+    # Wzmocnienia skalujące z parametrów (brakujące - domyślne, także dla regulatorów z puli)
+    for name, default in SCALING_GAINS.items():
+        setattr(controller, name, params.get(name, default))
+
+    def controller_func(error, v_curr, t):
+        return controller.compute(error, v_curr, t, params["dt"])
+
+    simulate = simulate_vehicle_distance if isinstance(route, DistanceRoute) else simulate_vehicle
+    timer = ControllerTimer(controller_func, "fuzzy")
+    try:
+        with span(simulate.__name__, vehicle=vehicle_type):
+            return simulate(vehicle_type, route, timer, controller_dt=params["dt"])
+    finally:
+        timer.flush()
+        pool.release(controller)
+
+
+# Rodzaje regulatorów dostępne w procesach roboczych: nazwa -> funkcja symulacji
+CONTROLLERS = {
+    "classic": _run_classic,
+    "fuzzy": _run_fuzzy,
+}
+
+
+def run_controller(kind, vehicle_type, alpha_segments, vref_segments, plant_dt, params):
+    """Jedna symulacja w procesie roboczym; zwraca dziennik symulacji (SIM_LOG_DTYPE)."""
+    with span("route_profile"):
+        route = RouteProfile(alpha_segments, vref_segments, dt=plant_dt)
+    return CONTROLLERS[kind](vehicle_type, route, params)
+
+
+def run_route_controller(kind, vehicle_type, route_path, plant_dt, params):
+    """
+    Jedna symulacja na trasie odcinkowej zapisanej w route_path (.npy, route_file);
+    zwraca dziennik DISTANCE_LOG_DTYPE.
+    """
+    with span("route_profile"):
+        route = open_route(route_path, dt=plant_dt)
+    return CONTROLLERS[kind](vehicle_type, route, params)
+
+
+def _traced(func, *args):
+    """func(*args) z zapisami instrumentacji procesu roboczego: (dziennik, zapisy)."""
+    with instrumentation.trace() as records:
+        log = func(*args)
+    return log, records
+
+
+def _controller_pool_stats():
+    if _fuzzy_pool is None:
+        _init_worker()
+    return dict(_fuzzy_pool.stats(), pid=os.getpid())
+
+
+def controller_pool_stats():
+    """Koszt budowy vs resetu regulatorów rozmytych w jednym z procesów roboczych."""
+    return get_pool().submit(_controller_pool_stats).result()
+
+
+def get_pool(max_workers=None):
+    """Współdzielona pula procesów z regulatorem rozmytym gotowym w każdym procesie."""
+    global _pool, _pool_size
+    if _pool is None:
+        _pool_size = max_workers or min(4, os.cpu_count() or 1)
+        _pool = ProcessPoolExecutor(max_workers=_pool_size, initializer=_init_worker)
+    return _pool
+
+
+def pool_size():
+    """Liczba procesów roboczych współdzielonej puli."""
+    get_pool()
+    return _pool_size
+
+
+def warm_up():
+    """Uruchamia wszystkie procesy puli (i budowę regulatorów) z wyprzedzeniem."""
+    pool = get_pool()
+    for future in [pool.submit(os.getpid) for _ in range(_pool_size)]:
+        future.result()
+
+
+def run_parallel(vehicle_type, alpha_segments, vref_segments, plant_dt, controllers, progress=None):
+    """
+    Symulacje kilku regulatorów jednocześnie w puli procesów.
+    controllers - słownik nazwa -> (rodzaj z CONTROLLERS, parametry);
+    zwraca słownik nazwa -> dziennik symulacji. Czas odpowiedzi to czas najwolniejszej symulacji.
+    progress(ukończone, wszystkie) - wywoływana po każdej symulacji; wyjątek
+    zgłoszony w progress anuluje symulacje jeszcze nierozpoczęte.
+    """
+    pool = get_pool()
+    futures = {
+        pool.submit(_traced, run_controller, kind, vehicle_type, alpha_segments, vref_segments, plant_dt, params): name
+        for name, (kind, params) in controllers.items()
+    }
+    return _collect(futures, controllers, progress)
+
+
+def run_parallel_route(vehicle_type, route_path, plant_dt, controllers, progress=None):
+    """
+    run_parallel dla trasy odcinkowej z pliku route_path (run_route_controller) -
+    procesy robocze otwierają ten sam plik, trasa nie jest przesyłana między procesami.
+    """
+    pool = get_pool()
+    futures = {
+        pool.submit(_traced, run_route_controller, kind, vehicle_type, route_path, plant_dt, params): name
+        for name, (kind, params) in controllers.items()
+    }
+    return _collect(futures, controllers, progress)
+
+
+def _collect(futures, controllers, progress):
+    results = {}
+    try:
+        for future in as_completed(futures):
+            # Metryki z procesu roboczego trafiają do rejestru (i trace) procesu głównego
+            results[futures[future]], records = future.result()
+            instrumentation.replay(records)
+            if progress is not None:
+                progress(len(results), len(futures))
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    return {name: results[name] for name in controllers}
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Moduły aplikacji leżą w katalogu głównym repozytorium (jak w benchmarks/suite.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
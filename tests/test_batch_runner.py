@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from batch_runner import NpzChunkWriter, chunk_dtype, iter_npz_chunks, scenario_plant_dt
+
+
+def _chunk(scenario, controller, n, offset=0.0):
+    chunk = np.zeros(n, dtype=chunk_dtype())
+    chunk["scenario"] = scenario
+    chunk["controller"] = controller
+    chunk["time"] = offset + 0.01 * np.arange(n)
+    chunk["v"] = np.linspace(10, 20, n)
+    return chunk
+
+
+def test_npz_chunk_writer_round_trip(tmp_path):
+    path = str(tmp_path / "wyniki.npz")
+    chunks = [_chunk(0, 0, 5), _chunk(1, 1, 3, offset=1.0), _chunk(0, 1, 7)]
+    writer = NpzChunkWriter(path, ["gorka", "plaska"], ["classic", "fuzzy"])
+    for chunk in chunks:
+        writer.write(chunk)
+    writer.close()
+
+    read = list(iter_npz_chunks(path))
+    assert len(read) == len(chunks)
+    for written, loaded in zip(chunks, read):
+        assert loaded.dtype == chunk_dtype()
+        np.testing.assert_array_equal(loaded, written)
+
+    with np.load(path) as data:
+        assert list(data["scenarios"]) == ["gorka", "plaska"]
+        assert list(data["controllers"]) == ["classic", "fuzzy"]
+
+
+def test_scenario_plant_dt():
+    scenario = {"name": "a", "controllers": {"classic": {"dt": 0.015}, "fuzzy": {"dt": 0.1}}}
+    assert scenario_plant_dt(scenario, 0.01) == pytest.approx(0.005)
+    assert scenario_plant_dt({"name": "b", "controllers": {"classic": {"Kp": 1}}}, 0.01) == 0.01
+    with pytest.raises(ValueError, match="Scenariusz c"):
+        scenario_plant_dt({"name": "c", "controllers": {"classic": {"dt": 0.0005}}}, 0.01)
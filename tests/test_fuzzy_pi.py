@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from fuzzy_pi import FuzzyPIBatch, FuzzyPIController
+
+
+@pytest.fixture(scope="module")
+def controller():
+    return FuzzyPIController(compiled=True)
+
+
+def test_infer_batch_matches_simpful(controller):
+    assert controller.validate_native(n_samples=50) < 1e-9
+
+
+def test_surface_interpolation_error(controller):
+    assert controller.estimate_max_error(use_simpful=False) < 0.01
+
+
+def test_compiled_compute_follows_simpful(controller):
+    exact = FuzzyPIController()
+    compiled = FuzzyPIController(compiled=True, grid_resolution=len(controller.e_grid))
+    rng = np.random.default_rng(0)
+    for error in rng.uniform(-0.6, 0.6, 30):
+        u_exact = exact.compute(error, 20.0, 0.0, 0.1)
+        u_compiled = compiled.compute(error, 20.0, 0.0, 0.1)
+        assert u_compiled == pytest.approx(u_exact, abs=0.01)
+
+
+def test_batch_matches_single_controller(controller):
+    errors = np.array([0.3, -0.1, 0.05, 0.4])
+    batch = FuzzyPIBatch(n=len(errors), controller=controller)
+    singles = [FuzzyPIController(compiled=True, grid_resolution=len(controller.e_grid)) for _ in errors]
+    for step in range(5):
+        e = errors * (1 - 0.2 * step)
+        u_batch = batch.compute(e, np.full(len(e), 20.0), 0.1 * step, 0.1)
+        u_single = [c.compute(ei, 20.0, 0.1 * step, 0.1) for c, ei in zip(singles, e)]
+        np.testing.assert_allclose(u_batch, u_single, atol=1e-12)
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from route_file import open_route, parse_csv, parse_gpx, parse_route, save_route
+from route_profile import ROUTE_POINT_DTYPE
+
+GPX_TEMPLATE = """<?xml version="1.0"?>
+<gpx version="1.1" {ns}><trk><trkseg>
+<trkpt lat="50.000" lon="19.0"><ele>200</ele></trkpt>
+<trkpt lat="50.001" lon="19.0"><ele>210</ele></trkpt>
+<trkpt lat="50.002" lon="19.0"><ele>205</ele></trkpt>
+</trkseg></trk></gpx>"""
+
+
+@pytest.mark.parametrize("ns", [
+    'xmlns="http://www.topografix.com/GPX/1/1"',
+    'xmlns="http://www.topografix.com/GPX/1/0"',
+    "",
+])
+def test_parse_gpx_namespaces(ns):
+    points = parse_gpx(GPX_TEMPLATE.format(ns=ns), default_speed=80)
+    assert points.dtype == ROUTE_POINT_DTYPE
+    assert len(points) == 3
+    # 0.001° szerokości to ok. 111 m
+    assert points["distance"][1] == pytest.approx(111.2, abs=0.5)
+    assert points["grade"][0] > 0 > points["grade"][1]
+    assert np.all(points["speed_limit"] == 80)
+
+
+def test_parse_gpx_rejects_invalid_files():
+    with pytest.raises(ValueError):
+        parse_gpx("<gpx><trk>")
+    with pytest.raises(ValueError):
+        parse_gpx(GPX_TEMPLATE.format(ns="").replace('<trkpt lat="50.002" lon="19.0"><ele>205</ele></trkpt>', "")
+                  .replace('<trkpt lat="50.001" lon="19.0"><ele>210</ele></trkpt>', ""))
+
+
+def test_parse_csv_grade_and_speed():
+    points = parse_csv("distance_km;grade_pct;speed_kmh\n0;0;50\n1;10;70\n1;5;70\n2.5;-5;90\n")
+    # Powtórzona droga (odcinek zerowej długości) jest pomijana
+    np.testing.assert_allclose(points["distance"], [0, 1000, 2500])
+    np.testing.assert_allclose(points["grade"], np.degrees(np.arctan([0, 0.1, -0.05])), rtol=1e-6)
+    np.testing.assert_allclose(points["speed_limit"], [50, 70, 90])
+
+
+def test_parse_csv_elevation_and_default_speed():
+    points = parse_csv("distance_m,elevation_m\n0,100\n100,110\n200,110\n", default_speed=60)
+    assert points["grade"][0] == pytest.approx(np.degrees(np.arctan(0.1)), rel=1e-6)
+    assert points["grade"][1] == pytest.approx(0.0)
+    assert np.all(points["speed_limit"] == 60)
+
+
+@pytest.mark.parametrize("text", [
+    "distance_m,grade_deg\n0,1\n",
+    "grade_deg,speed_kmh\n0,50\n1,50\n",
+    "distance_m,speed_kmh\n0,50\n1,50\n",
+    "distance_m,grade_deg\n10,0\n5,0\n",
+])
+def test_parse_csv_rejects_invalid_files(text):
+    with pytest.raises(ValueError):
+        parse_csv(text)
+
+
+def test_parse_route_by_extension():
+    with pytest.raises(ValueError):
+        parse_route("", "trasa.kml")
+    assert len(parse_route("distance_m,grade_deg\n0,0\n100,2\n", "Trasa.CSV")) == 2
+
+
+@pytest.mark.parametrize("memmap_bytes", [0, 1 << 20])
+def test_save_and_open_route(tmp_path, memmap_bytes):
+    points = parse_csv("distance_m,grade_deg,speed_kmh\n0,0,50\n500,3,70\n1000,-2,90\n")
+    path = str(tmp_path / "trasa.npy")
+    save_route(points, path)
+    route = open_route(path, dt=0.1, memmap_bytes=memmap_bytes)
+    np.testing.assert_array_equal(route.points, points)
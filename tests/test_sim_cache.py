@@ -0,0 +1,89 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from sim_cache import SimulationCache, result_nbytes, scenario_key
+
+
+def _result(nbytes):
+    return {"v": np.zeros(nbytes // 8)}
+
+
+def test_scenario_key_ignores_order_and_number_types():
+    a = scenario_key(vehicle_type="osobowy", kp=1, segments=[{"time": 10, "v": 70}])
+    b = scenario_key(segments=[{"v": 70.0, "time": 10.0}], kp=1.0, vehicle_type="osobowy")
+    assert a == b
+    assert a != scenario_key(vehicle_type="osobowy", kp=1.5, segments=[{"time": 10, "v": 70}])
+
+
+def test_scenario_key_is_stable_between_runs():
+    # Klucze zapisanych na dysku wyników nie mogą się zmieniać między wersjami Pythona
+    assert scenario_key(a=1, b="x") == "499eec8fbedaa48a53d5de904c9d46753a9e3719495a147d97edccab283a3591"
+
+
+def test_scenario_key_rejects_unknown_types():
+    with pytest.raises(TypeError):
+        scenario_key(value=object())
+
+
+def test_eviction_by_count():
+    cache = SimulationCache(maxsize=2)
+    for key in "abc":
+        cache.put(key, _result(80))
+    assert cache.get("a") is None
+    assert cache.get("b") is not None and cache.get("c") is not None
+
+
+def test_eviction_by_bytes_keeps_recently_used():
+    cache = SimulationCache(maxsize=10, max_bytes=3000)
+    cache.put("a", _result(1000))
+    cache.put("b", _result(1000))
+    cache.get("a")
+    cache.put("c", _result(1500))
+    assert cache.stats()["bytes"] <= 3000
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_result_above_byte_limit_is_not_stored():
+    cache = SimulationCache(maxsize=10, max_bytes=1000)
+    cache.put("small", _result(400))
+    cache.put("big", _result(4000))
+    assert cache.get("big") is None
+    assert cache.get("small") is not None
+    assert cache.stats()["bytes"] == result_nbytes(_result(400))
+
+
+def test_replacing_entry_updates_bytes():
+    cache = SimulationCache(max_bytes=10000)
+    cache.put("a", _result(2000))
+    cache.put("a", _result(800))
+    assert cache.stats()["bytes"] == 800
+
+
+def test_disk_tier_round_trip_and_prune(tmp_path):
+    cache = SimulationCache(maxsize=1, disk_dir=str(tmp_path), max_disk_bytes=5000)
+    cache.put("a", {"v": np.arange(100.0), "dt": np.float64(0.1)})
+    cache.put("b", _result(800))
+    # "a" wypadł z pamięci, ale jest na dysku
+    result = cache.get("a")
+    np.testing.assert_array_equal(result["v"], np.arange(100.0))
+    assert float(result["dt"]) == 0.1
+    assert cache.stats()["disk_hits"] == 1
+
+    time.sleep(0.01)
+    cache.put("c", _result(3000))
+    files = sorted(os.listdir(tmp_path))
+    assert sum(os.path.getsize(tmp_path / name) for name in files) <= 5000
+    assert "b.npz" not in files and "c.npz" in files
+
+
+def test_peek_does_not_count():
+    cache = SimulationCache()
+    cache.put("a", _result(80))
+    assert cache.peek("a") is not None
+    assert cache.peek("missing") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["disk_hits"], stats["misses"]) == (0, 0, 0)
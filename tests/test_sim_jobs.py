@@ -0,0 +1,32 @@
+import threading
+
+from sim_jobs import DONE, JobQueue
+
+
+def _wait(queue, job_id, timeout=5.0):
+    queue.get(job_id).future.result(timeout=timeout)
+
+
+def test_deduplicated_job_result_released_after_all_subscribers():
+    queue = JobQueue(max_workers=1)
+    release = threading.Event()
+    first = queue.submit("k", lambda job: (release.wait(5), 42)[1])
+    second = queue.submit("k", lambda job: 0)
+    assert first == second
+    release.set()
+    _wait(queue, first)
+
+    assert queue.get(first).state == DONE
+    assert queue.take_result(first) == 42
+    assert queue.take_result(first) == 42
+    assert queue.get(first).result is None
+    assert queue.take_result(first) is None
+    assert queue.stats()["deduplicated"] == 1
+
+
+def test_failed_job_has_no_result():
+    queue = JobQueue(max_workers=1)
+    job_id = queue.submit("k", lambda job: 1 / 0)
+    _wait(queue, job_id)
+    assert queue.take_result(job_id) is None
+    assert queue.stats()["failed"] == 1
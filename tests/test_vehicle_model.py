@@ -0,0 +1,44 @@
+import warnings
+
+import pytest
+
+from vehicle_model import plant_step, sample_period_steps
+
+
+@pytest.mark.parametrize("controller_dts, max_dt, expected", [
+    ((0.01, 0.1), 0.01, 0.01),
+    ((0.015, 0.1), 0.01, 0.005),
+    ((0.007, 0.1), 0.01, 0.001),
+    ((0.5, 0.3), 0.01, 0.01),
+    ((0.1,), 0.04, 0.025),
+    ((0.002,), 0.01, 0.002),
+])
+def test_plant_step(controller_dts, max_dt, expected):
+    dt = plant_step(controller_dts, max_dt)
+    assert dt == pytest.approx(expected)
+    # Każdy regulator próbkowany dokładnie co swoje tp
+    for controller_dt in controller_dts:
+        steps = controller_dt / dt
+        assert steps == pytest.approx(round(steps))
+
+
+@pytest.mark.parametrize("controller_dt", [0.0005, 0.0015, 0.0])
+def test_plant_step_rejects_periods_off_grid(controller_dt):
+    with pytest.raises(ValueError):
+        plant_step((controller_dt, 0.1), 0.01)
+
+
+def test_sample_period_steps():
+    assert sample_period_steps(None, 0.01) == 1
+    assert sample_period_steps(0.1, 0.01) == 10
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert sample_period_steps(0.015, 0.005) == 3
+
+
+def test_sample_period_steps_warns_when_rounding():
+    with pytest.warns(UserWarning):
+        assert sample_period_steps(0.015, 0.01) == 2
+    # Okres krótszy niż krok obiektu - regulator w każdym kroku
+    with pytest.warns(UserWarning):
+        assert sample_period_steps(0.005, 0.01) == 1
@@ -1,57 +1,570 @@
+import math
+import warnings
+from functools import reduce
+
 import numpy as np
+from scipy.integrate import solve_ivp
+
+from instrumentation import span
+
+# Opcjonalna kompilacja JIT pętli symulacji (numba); bez niej kernel działa w czystym Pythonie
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
 
 # Stałe fizyczne
 G = 9.81  # przyspieszenie ziemskie [m/s^2]
 RHO = 1.225  # gęstość powietrza [kg/m^3]
 
-# Definicje pojazdów
+# Definicje pojazdów (Crr - współczynnik oporu toczenia; 0 - model bez oporu
+# toczenia, jak w porównaniu regulatorów - kolumna F_roll dziennika jest wtedy zerowa)
 VEHICLES = {
-    "osobowy":      {"mass": 1500, "A": 2.2, "Cd": 0.29, "F_max": 4500},
-    "sportowy":     {"mass": 1300, "A": 1.9, "Cd": 0.27, "F_max": 7500},
-    "van":          {"mass": 2200, "A": 2.8, "Cd": 0.33, "F_max": 5000},
-    "ciezarowka":   {"mass": 15000, "A": 5.0, "Cd": 0.6,  "F_max": 40000},
+    "osobowy":      {"mass": 1500, "A": 2.2, "Cd": 0.29, "F_max": 4500, "Crr": 0.0},
+    "sportowy":     {"mass": 1300, "A": 1.9, "Cd": 0.27, "F_max": 7500, "Crr": 0.0},
+    "van":          {"mass": 2200, "A": 2.8, "Cd": 0.33, "F_max": 5000, "Crr": 0.0},
+    "ciezarowka":   {"mass": 15000, "A": 5.0, "Cd": 0.6,  "F_max": 40000, "Crr": 0.0},
 }
 
-def simulate_vehicle(vehicle_type, alpha_func, v_ref_func, controller_func, t_final=30, dt=0.1):
+# Kolumny dziennika symulacji: stan, sterowanie i rozkład sił w każdej chwili
+SIM_LOG_DTYPE = np.dtype([
+    ("time", np.float64),
+    ("v", np.float64),          # prędkość [m/s]
+    ("u", np.float64),          # sygnał sterujący [-1, 1]
+    ("F_drive", np.float64),    # siła napędowa [N]
+    ("F_aero", np.float64),     # opór aerodynamiczny [N]
+    ("F_gravity", np.float64),  # składowa siły ciężkości wzdłuż drogi [N]
+    ("F_roll", np.float64),     # opór toczenia [N]
+    ("accel", np.float64),      # przyspieszenie wypadkowe [m/s^2]
+])
+
+# Dostępne metody całkowania w simulate_vehicle
+INTEGRATORS = ("euler", "rk4", "adaptive")
+
+
+def road_force(m, Crr, alpha):
+    """Siły niezależne od prędkości [N]: składowa ciężkości i opór toczenia przy nachyleniu alpha [rad]."""
+    return m * G * (np.sin(alpha) + Crr * np.cos(alpha))
+
+
+def acceleration(v, u, F_road, m, k_aero, F_max):
+    """Przyspieszenie pojazdu [m/s^2] z równania ruchu przy stałym u i nachyleniu."""
+    return (u * F_max - k_aero * v * v - F_road) / m
+
+
+def _rk4_step(v, u, F_road, dt, m, k_aero, F_max):
+    k1 = acceleration(v, u, F_road, m, k_aero, F_max)
+    k2 = acceleration(v + 0.5 * dt * k1, u, F_road, m, k_aero, F_max)
+    k3 = acceleration(v + 0.5 * dt * k2, u, F_road, m, k_aero, F_max)
+    k4 = acceleration(v + dt * k3, u, F_road, m, k_aero, F_max)
+    return v + dt / 6.0 * (k1 + 2 * k2 + 2 * k3 + k4)
+
+
+def new_log(time):
+    """Prealokowany dziennik symulacji (jeden blok pamięci) na siatce czasu."""
+    log = np.zeros(len(time), dtype=SIM_LOG_DTYPE)
+    log["time"] = time
+    return log
+
+
+def fill_forces(log, params, alpha):
     """
-    Symuluje ruch pojazdu z danym typem pojazdu i funkcjami nachylenia, prędkości zadanej oraz sterowania.
+    Uzupełnia kolumny sił i przyspieszenia dziennika na podstawie v i u
+    (operacje tablicowe w jednym przebiegu). alpha - nachylenie [rad] na siatce.
+    """
+    m = params['mass']
+    with span("fill_forces"):
+        np.multiply(log["u"], params['F_max'], out=log["F_drive"])
+        log["F_aero"] = 0.5 * RHO * params['Cd'] * params['A'] * log["v"]**2
+        log["F_gravity"] = m * G * np.sin(alpha)
+        log["F_roll"] = params['Crr'] * m * G * np.cos(alpha)
+        log["accel"] = (log["F_drive"] - log["F_aero"] - log["F_gravity"] - log["F_roll"]) / m
+    return log
+
+
+def _adaptive_span(route, v0, u, t_grid, m, Crr, k_aero, F_max, rtol, atol):
+    """
+    Całkuje przedział próbkowania regulatora t_grid[0]..t_grid[-1] solverem
+    o zmiennym kroku (RK45). Przedział jest dzielony na granicach odcinków trasy,
+    więc solver nigdy nie przechodzi przez skok nachylenia. Zwraca v w t_grid[1:].
+    """
+    t0, t1 = t_grid[0], t_grid[-1]
+    bounds = route.alpha_bounds
+    edges = np.concatenate(([t0], bounds[(bounds > t0) & (bounds < t1)], [t1]))
+    t_out = t_grid[1:]
+    out = np.empty(len(t_out))
+
+    for a, b in zip(edges[:-1], edges[1:]):
+        F_road = road_force(m, Crr, np.radians(route.alpha_at(0.5 * (a + b))))
+
+        def rhs(t, y):
+            dv = acceleration(y[0], u, F_road, m, k_aero, F_max)
+            # Pojazd zatrzymany nie toczy się do tyłu
+            return [dv if (y[0] > 0.0 or dv > 0.0) else 0.0]
+
+        mask = (t_out > a) & (t_out <= b)
+        t_eval = np.union1d(t_out[mask], [b])
+        sol = solve_ivp(rhs, (a, b), [v0], method="RK45", t_eval=t_eval, rtol=rtol, atol=atol)
+        out[mask] = np.maximum(sol.y[0][:mask.sum()], 0.0)
+        v0 = max(sol.y[0][-1], 0.0)
+
+    return out
+
+
+# Siatka, na której wybierany jest krok obiektu w plant_step [s]
+PLANT_DT_RESOLUTION = 0.001
+
+
+def sample_period_steps(controller_dt, dt):
+    """
+    Okres próbkowania regulatora wyrażony w krokach całkowania obiektu (co najmniej 1).
+    Okres niebędący wielokrotnością dt jest zaokrąglany z ostrzeżeniem - regulator
+    próbkowany byłby wtedy z innym okresem niż dt przekazane do compute().
+    """
+    if controller_dt is None:
+        return 1
+    steps = max(1, int(round(controller_dt / dt)))
+    if abs(steps * dt - controller_dt) > 1e-6 * controller_dt:
+        warnings.warn(f"Okres próbkowania {controller_dt} s nie jest wielokrotnością kroku obiektu {dt} s - "
+                      f"regulator próbkowany co {steps * dt:g} s (dobierz krok przez plant_step)", stacklevel=2)
+    return steps
+
+
+def plant_step(controller_dts, max_dt, resolution=PLANT_DT_RESOLUTION):
     """
+    Największy krok obiektu nie większy niż max_dt (wielokrotność resolution),
+    który dzieli wszystkie okresy próbkowania controller_dts - każdy regulator
+    jest wtedy próbkowany dokładnie co swoje tp. Okres spoza siatki resolution
+    zgłasza ValueError.
+    """
+    ticks = []
+    for controller_dt in controller_dts:
+        k = int(round(controller_dt / resolution))
+        if k < 1 or abs(k * resolution - controller_dt) > 1e-6 * controller_dt:
+            raise ValueError(f"Okres próbkowania {controller_dt} s musi być wielokrotnością {resolution} s")
+        ticks.append(k)
+    common = reduce(math.gcd, ticks)
+    limit = max(int(round(max_dt / resolution)), 1)
+    step = max(d for d in range(1, min(common, limit) + 1) if common % d == 0)
+    return step * resolution
+
+
+def controller_errors(log, v_ref, controller_dt=None, dt=None):
+    """
+    Chwile próbkowania regulatora i błędy prędkości, które dostał w simulate_vehicle
+    (v_ref[i] - v[i-1] co sample_period_steps kroków), odtworzone z dziennika.
+    v_ref - prędkość zadana [m/s] na siatce czasu dziennika.
+    """
+    dt = log["time"][1] - log["time"][0] if dt is None else dt
+    steps = np.arange(1, len(log), sample_period_steps(controller_dt, dt))
+    return log["time"][steps], v_ref[steps] - log["v"][steps - 1]
+
+
+def simulate_vehicle(vehicle_type, route, controller_func, controller_dt=None,
+                     method="euler", rtol=1e-6, atol=1e-8):
+    """
+    Symuluje ruch pojazdu z danym typem pojazdu na trasie route (RouteProfile)
+    z regulatorem controller_func(error, v_curr, t). Nachylenie i prędkość zadana
+    są odczytywane z tablic profilu trasy na jego siatce czasu.
+
+    Obiekt jest całkowany z krokiem route.dt, a regulator próbkowany co
+    controller_dt (ekstrapolator zerowego rzędu między próbkami); domyślnie
+    regulator jest wywoływany w każdym kroku.
+
+    method - metoda całkowania: "euler" (jawna metoda Eulera), "rk4"
+    (Runge-Kutta 4. rzędu ze stałym krokiem, podkroki na granicach odcinków
+    trasy) lub "adaptive" (RK45 ze zmiennym
+    krokiem z tolerancjami rtol/atol, podział na granicach odcinków trasy;
+    route.dt wyznacza wtedy tylko siatkę wyników).
+
+    Zwraca dziennik symulacji - tablicę strukturalną o kolumnach SIM_LOG_DTYPE
+    (czas, prędkość, sterowanie i rozkład sił).
+    """
+    if method not in INTEGRATORS:
+        raise ValueError(f"Nieznana metoda całkowania: {method} (dostępne: {', '.join(INTEGRATORS)})")
+
     params = VEHICLES[vehicle_type]
     m = params['mass']
     A = params['A']
     Cd = params['Cd']
     F_max = params['F_max']
+    Crr = params['Crr']
 
     # Czas
-    time = np.arange(0, t_final + dt, dt)
-    v = np.zeros_like(time)
-    u_out = np.zeros_like(time)
+    time = route.time
+    dt = route.dt
+    F_road = road_force(m, Crr, route.alpha)
+    v_ref = route.v_ref
+    k_aero = 0.5 * RHO * Cd * A
+    hold = sample_period_steps(controller_dt, dt)
+    log = new_log(time)
+    v = log["v"]
+    u_out = log["u"]
+    u = 0.0
+
+    if method == "rk4":
+        # Nachylenie w środku każdego kroku; krok przecinający granicę odcinka
+        # trasy jest dzielony na dwa podkroki w miejscu granicy
+        F_mid = road_force(m, Crr, np.radians(route.alpha_at(time[:-1] + 0.5 * dt)))
+        eps = 1e-9 * dt
+        splits = {}
+        for b in route.alpha_bounds[1:-1]:
+            k = int(np.searchsorted(time, b))
+            if 0 < k < len(time) and time[k-1] + eps < b < time[k] - eps:
+                splits[k] = b
 
     for i in range(1, len(time)):
         t = time[i]
-        alpha = np.radians(alpha_func(t))  # zamiana stopni na radiany
-        #print(f"t={t:.2f}, alpha={alpha_func(t):.2f}° ({alpha:.2f} rad)")
-        v_ref = v_ref_func(t)
         v_curr = v[i-1]
 
-        # Błąd
-        error = v_ref - v_curr
+        sample = (i - 1) % hold == 0
+        if sample:
+            # Błąd
+            error = v_ref[i] - v_curr
 
-        # Sygnał sterujący u(t) - przekazujemy dt do funkcji kontrolera
-        u = controller_func(error, v_curr, t)
-        u = np.clip(u, -1.0, 1.0)  # ograniczenie sygnału [-1, 1]
+            # Sygnał sterujący u(t) - przekazujemy dt do funkcji kontrolera
+            u = controller_func(error, v_curr, t)
+            u = min(max(u, -1.0), 1.0)  # ograniczenie sygnału [-1, 1]
         u_out[i] = u
 
-        # Siły
+        if method == "rk4":
+            if i in splits:
+                b = splits[i]
+                h1, h2 = b - time[i-1], time[i] - b
+                F1 = road_force(m, Crr, np.radians(route.alpha_at(time[i-1] + 0.5 * h1)))
+                F2 = road_force(m, Crr, np.radians(route.alpha_at(b + 0.5 * h2)))
+                v_mid = max(_rk4_step(v_curr, u, F1, h1, m, k_aero, F_max), 0.0)
+                v[i] = max(_rk4_step(v_mid, u, F2, h2, m, k_aero, F_max), 0.0)
+            else:
+                v[i] = max(_rk4_step(v_curr, u, F_mid[i-1], dt, m, k_aero, F_max), 0.0)
+            continue
+        if method == "adaptive":
+            # Cały okres próbkowania naraz - sterowanie jest w nim stałe
+            if sample:
+                j = min(i - 1 + hold, len(time) - 1)
+                v[i:j+1] = _adaptive_span(route, v_curr, u, time[i-1:j+1], m, Crr, k_aero, F_max, rtol, atol)
+            continue
+
+        # Siły (F_road - ciężkość i opór toczenia)
         F_aero = 0.5 * RHO * Cd * A * v_curr**2
-        F_gravity = m * G * np.sin(alpha)
-        #print(np.sin(alpha))
         F_drive = u * F_max
 
         # Równanie ruchu
-        dv = (F_drive - F_aero - F_gravity) / m
-        v[i] = v_curr + dv * dt
-        v[i] = max(v[i], 0.0) 
+        dv = (F_drive - F_aero - F_road[i]) / m
+        v[i] = max(v_curr + dv * dt, 0.0)
+
+    return fill_forces(log, params, route.alpha)
+
+
+# Metody całkowania dostępne w simulate_vehicle_stream
+STREAM_INTEGRATORS = ("euler", "rk4")
+
+
+def simulate_vehicle_stream(vehicle_type, route, controller_func, controller_dt=None,
+                            method="euler", chunk_size=10000):
+    """
+    Strumieniowa wersja simulate_vehicle: generator kolejnych porcji dziennika
+    symulacji (SIM_LOG_DTYPE) o co najwyżej chunk_size wierszach. Stan pojazdu,
+    regulatora i ekstrapolatora jest przenoszony między porcjami, a profil trasy
+    odczytywany porcjami (route.alpha_at, route.v_ref_at) - zużycie pamięci nie
+    zależy od długości trasy (route może mieć tabulate=False).
+    Połączone porcje są identyczne z wynikiem simulate_vehicle.
+
+    method - "euler" lub "rk4" (solver adaptacyjny całkuje całe okresy
+    próbkowania i nie jest dostępny w trybie strumieniowym).
+    """
+    if method not in STREAM_INTEGRATORS:
+        raise ValueError(f"Metoda całkowania niedostępna strumieniowo: {method} "
+                         f"(dostępne: {', '.join(STREAM_INTEGRATORS)})")
+
+    params = VEHICLES[vehicle_type]
+    m = params['mass']
+    F_max = params['F_max']
+    Crr = params['Crr']
+    k_aero = 0.5 * RHO * params['Cd'] * params['A']
+    dt = route.dt
+    hold = sample_period_steps(controller_dt, dt)
+    bounds = route.alpha_bounds[1:-1]
+    eps = 1e-9 * dt
+
+    # Stan przenoszony między porcjami
+    v_prev = 0.0
+    u = 0.0
+
+    for start in range(0, route.n_samples, chunk_size):
+        steps = np.arange(start, min(start + chunk_size, route.n_samples))
+        time = steps * dt
+        t_prev = (steps - 1) * dt
+        alpha = np.radians(route.alpha_at(time))
+        F_road = road_force(m, Crr, alpha)
+        v_ref = route.v_ref_at(time)
+        log = new_log(time)
+        v = log["v"]
+        u_out = log["u"]
+
+        if method == "rk4":
+            # Jak w simulate_vehicle: nachylenie w środku kroku, podział kroku na granicy odcinka
+            F_mid = road_force(m, Crr, np.radians(route.alpha_at(t_prev + 0.5 * dt)))
+            splits = {}
+            for b in bounds:
+                k = int(np.searchsorted(time, b))
+                if k < len(time) and steps[k] > 0 and t_prev[k] + eps < b < time[k] - eps:
+                    splits[k] = b
+
+        for k, i in enumerate(steps):
+            if i == 0:
+                continue
+            v_curr = v[k-1] if k > 0 else v_prev
+
+            if (i - 1) % hold == 0:
+                error = v_ref[k] - v_curr
+                u = controller_func(error, v_curr, time[k])
+                u = min(max(u, -1.0), 1.0)
+            u_out[k] = u
+
+            if method == "rk4":
+                if k in splits:
+                    b = splits[k]
+                    h1, h2 = b - t_prev[k], time[k] - b
+                    F1 = road_force(m, Crr, np.radians(route.alpha_at(t_prev[k] + 0.5 * h1)))
+                    F2 = road_force(m, Crr, np.radians(route.alpha_at(b + 0.5 * h2)))
+                    v_mid = max(_rk4_step(v_curr, u, F1, h1, m, k_aero, F_max), 0.0)
+                    v[k] = max(_rk4_step(v_mid, u, F2, h2, m, k_aero, F_max), 0.0)
+                else:
+                    v[k] = max(_rk4_step(v_curr, u, F_mid[k], dt, m, k_aero, F_max), 0.0)
+                continue
+
+            dv = (u * F_max - k_aero * v_curr**2 - F_road[k]) / m
+            v[k] = max(v_curr + dv * dt, 0.0)
+
+        v_prev = v[-1]
+        yield fill_forces(log, params, alpha)
+
+
+@njit(cache=True)
+def _classic_pi_kernel(m, k_aero, F_max, F_road, v_ref, dt, Kp, Ti, controller_dt, hold, u_min, u_max, v, u_out):
+    """
+    Pętla pojazd + klasyczny PI na tablicach, w całości bez wywołań funkcji
+    Pythona - kompilowana przez numba, jeśli jest dostępna. Odpowiada
+    simulate_vehicle z ClassicPIController.compute(..., dt=controller_dt)
+    próbkowanym co hold kroków. Wyniki zapisuje do v i u_out.
+    """
+    n = len(F_road)
+    Ki = Kp * controller_dt / Ti if Ti != 0 else 0.0
+    integral = 0.0
+    u = 0.0
+
+    for i in range(1, n):
+        v_curr = v[i-1]
+
+        if (i - 1) % hold == 0:
+            error = v_ref[i] - v_curr
+            integral += error * controller_dt
+            u = Kp * error + Ki * integral
+            u = min(max(u, u_min), u_max)
+            u = min(max(u, -1.0), 1.0)
+        u_out[i] = u
+
+        dv = (u * F_max - k_aero * v_curr * v_curr - F_road[i]) / m
+        v[i] = max(v_curr + dv * dt, 0.0)
+
+
+def simulate_classic_pi(vehicle_type, route, Kp=1, Ti=1, controller_dt=0.01, output_limit=(-1, 1)):
+    """
+    Szybka ścieżka simulate_vehicle dla klasycznego regulatora PI: cała pętla
+    w kernelu _classic_pi_kernel (JIT z numba lub czysty Python). Regulator
+    jest próbkowany co controller_dt, obiekt całkowany z krokiem route.dt.
+    Zwraca dziennik symulacji jak simulate_vehicle.
+    """
+    params = VEHICLES[vehicle_type]
+    k_aero = 0.5 * RHO * params['Cd'] * params['A']
+    log = new_log(route.time)
+    _classic_pi_kernel(
+        float(params['mass']), k_aero, float(params['F_max']),
+        road_force(params['mass'], params['Crr'], route.alpha), route.v_ref, float(route.dt),
+        float(Kp), float(Ti), float(controller_dt),
+        sample_period_steps(controller_dt, route.dt),
+        float(output_limit[0]), float(output_limit[1]),
+        log["v"], log["u"],
+    )
+    return fill_forces(log, params, route.alpha)
+
+
+# Dziennik symulacji trasy odcinkowej (DistanceRoute): pola SIM_LOG_DTYPE oraz
+# położenie i profil trasy odczytany w miejscu pojazdu
+DISTANCE_LOG_DTYPE = np.dtype(SIM_LOG_DTYPE.descr + [
+    ("position", np.float64),   # przebyta droga [m]
+    ("alpha_deg", np.float64),  # nachylenie w położeniu pojazdu [°]
+    ("v_ref", np.float64),      # prędkość zadana w położeniu pojazdu [m/s]
+])
+
+
+def _distance_log(route, params, v, u, position, segment):
+    """Dziennik DISTANCE_LOG_DTYPE z przebiegów v, u, drogi i indeksów odcinków."""
+    _, alpha_seg, vref_seg = route.segment_arrays()
+    log = np.zeros(len(route.time), dtype=DISTANCE_LOG_DTYPE)
+    log["time"] = route.time
+    log["v"] = v
+    log["u"] = u
+    log["position"] = position
+    alpha = alpha_seg[segment]
+    log["alpha_deg"] = np.degrees(alpha)
+    log["v_ref"] = vref_seg[segment]
+    return fill_forces(log, params, alpha)
+
+
+def simulate_vehicle_distance(vehicle_type, route, controller_func, controller_dt=None):
+    """
+    Symulacja na trasie odcinkowej (DistanceRoute): położenie całkowane razem
+    z prędkością (Euler), nachylenie i prędkość zadana odczytywane z odcinka,
+    na którym jest pojazd na początku kroku. Indeks odcinka przesuwany
+    przyrostowo (droga nie maleje) - koszt odczytu nie zależy od liczby odcinków.
+    Regulator jak w simulate_vehicle. Zwraca dziennik DISTANCE_LOG_DTYPE.
+    """
+    params = VEHICLES[vehicle_type]
+    m = params['mass']
+    F_max = params['F_max']
+    k_aero = 0.5 * RHO * params['Cd'] * params['A']
+    bounds, alpha_seg, vref_seg = route.segment_arrays()
+    F_road_seg = road_force(m, params['Crr'], alpha_seg)
+    last = len(alpha_seg) - 1
+
+    dt = route.dt
+    time = route.time
+    n = len(time)
+    hold = sample_period_steps(controller_dt, dt)
+    v = np.zeros(n)
+    u_out = np.zeros(n)
+    position = np.zeros(n)
+    segment = np.zeros(n, dtype=np.int64)
+    seg = 0
+    u = 0.0
+
+    for i in range(1, n):
+        v_curr = v[i-1]
+        s_curr = position[i-1]
+        while seg < last and s_curr >= bounds[seg+1]:
+            seg += 1
+        segment[i] = seg
+
+        if (i - 1) % hold == 0:
+            error = vref_seg[seg] - v_curr
+            u = controller_func(error, v_curr, time[i])
+            u = min(max(u, -1.0), 1.0)
+        u_out[i] = u
+
+        dv = (u * F_max - k_aero * v_curr * v_curr - F_road_seg[seg]) / m
+        v[i] = max(v_curr + dv * dt, 0.0)
+        position[i] = s_curr + v_curr * dt
+
+    return _distance_log(route, params, v, u_out, position, segment)
+
+
+@njit(cache=True)
+def _classic_pi_distance_kernel(m, k_aero, F_max, bounds, F_road_seg, vref_seg, dt, Kp, Ti, controller_dt, hold,
+                                u_min, u_max, v, u_out, position, segment):
+    """Pętla simulate_vehicle_distance z klasycznym PI (jak _classic_pi_kernel)."""
+    n = len(v)
+    last = len(F_road_seg) - 1
+    Ki = Kp * controller_dt / Ti if Ti != 0 else 0.0
+    integral = 0.0
+    u = 0.0
+    seg = 0
+
+    for i in range(1, n):
+        v_curr = v[i-1]
+        s_curr = position[i-1]
+        while seg < last and s_curr >= bounds[seg+1]:
+            seg += 1
+        segment[i] = seg
+
+        if (i - 1) % hold == 0:
+            error = vref_seg[seg] - v_curr
+            integral += error * controller_dt
+            u = Kp * error + Ki * integral
+            u = min(max(u, u_min), u_max)
+            u = min(max(u, -1.0), 1.0)
+        u_out[i] = u
+
+        dv = (u * F_max - k_aero * v_curr * v_curr - F_road_seg[seg]) / m
+        v[i] = max(v_curr + dv * dt, 0.0)
+        position[i] = s_curr + v_curr * dt
+
+
+def simulate_classic_pi_distance(vehicle_type, route, Kp=1, Ti=1, controller_dt=0.01, output_limit=(-1, 1)):
+    """Szybka ścieżka simulate_vehicle_distance dla klasycznego PI (kernel JIT jak simulate_classic_pi)."""
+    params = VEHICLES[vehicle_type]
+    k_aero = 0.5 * RHO * params['Cd'] * params['A']
+    bounds, alpha_seg, vref_seg = route.segment_arrays()
+    n = len(route.time)
+    v = np.zeros(n)
+    u_out = np.zeros(n)
+    position = np.zeros(n)
+    segment = np.zeros(n, dtype=np.int64)
+    _classic_pi_distance_kernel(
+        float(params['mass']), k_aero, float(params['F_max']), bounds,
+        road_force(params['mass'], params['Crr'], alpha_seg), vref_seg, float(route.dt),
+        float(Kp), float(Ti), float(controller_dt), sample_period_steps(controller_dt, route.dt),
+        float(output_limit[0]), float(output_limit[1]),
+        v, u_out, position, segment,
+    )
+    return _distance_log(route, params, v, u_out, position, segment)
+
+
+def vehicle_arrays(vehicles):
+    """
+    Parametry N pojazdów jako tablice (N,). Elementy listy to nazwy z VEHICLES
+    albo słowniki z kluczami mass, A, Cd, F_max, Crr.
+    """
+    params = [VEHICLES[v] if isinstance(v, str) else v for v in vehicles]
+    return {key: np.array([p[key] for p in params], dtype=float)
+            for key in ("mass", "A", "Cd", "F_max", "Crr")}
+
+
+def simulate_batch(vehicles, alpha_deg, v_ref, controller_func, t_final=30, dt=0.1, controller_dt=None):
+    """
+    Symuluje N niezależnych scenariuszy jednocześnie (krok po kroku dla całej partii).
+
+    vehicles - lista N nazw pojazdów lub słowników parametrów,
+    alpha_deg, v_ref - nachylenie [°] i prędkość zadana [m/s] na siatce czasu:
+        skalary, tablice (T,) wspólne dla partii (np. RouteProfile.alpha_deg)
+        lub (N, T) dla każdego scenariusza,
+    controller_func(error, v_curr, t) - regulator działający na tablicach (N,),
+        np. ClassicPIBatch, próbkowany co controller_dt (jak w simulate_vehicle).
+
+    Zwraca time (T,) oraz v i u_out o kształcie (N, T) - wiersz = scenariusz.
+    """
+    params = vehicle_arrays(vehicles)
+    m = params['mass']
+    F_max = params['F_max']
+    k_aero = 0.5 * RHO * params['Cd'] * params['A']
+    n = len(m)
+
+    time = np.arange(0, t_final + dt, dt)
+    alpha = np.broadcast_to(np.radians(alpha_deg), (n, len(time)))
+    F_road = road_force(m[:, None], params['Crr'][:, None], alpha)
+    v_ref = np.broadcast_to(v_ref, (n, len(time)))
+
+    hold = sample_period_steps(controller_dt, dt)
+    v = np.zeros((n, len(time)))
+    u_out = np.zeros((n, len(time)))
+    u = np.zeros(n)
+
+    for i in range(1, len(time)):
+        v_curr = v[:, i-1]
+
+        if (i - 1) % hold == 0:
+            error = v_ref[:, i] - v_curr
+            u = np.clip(controller_func(error, v_curr, time[i]), -1.0, 1.0)
+        u_out[:, i] = u
+
+        dv = (u * F_max - k_aero * v_curr**2 - F_road[:, i]) / m
+        v[:, i] = np.maximum(v_curr + dv * dt, 0.0)
 
-    #print(f"v={v_curr:.2f}, v_ref={v_ref:.2f}, u={u:.2f}")
     return time, v, u_out